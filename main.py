@@ -4,17 +4,80 @@ Alang - Your AI Coding Assistant
 A terminal-based AI assistant powered by Google Gemini
 """
 
+import time
+
+STARTED = time.perf_counter()
+
 import sys
+import json
 import argparse
 from pathlib import Path
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from alang.app import AlangApp
+# Heavier modules (Textual, the Gemini SDK) are imported only by the commands that need them
 from alang.config import Config
 
 
+def compact_database(config: Config, args: argparse.Namespace) -> None:
+    """Apply the retention policy to the database and print what was removed"""
+    if args.no_archive:
+        archive_path = None
+    elif args.archive:
+        archive_path = Path(args.archive)
+    else:
+        archive_path = config.archive_path()
+    
+    from alang.database import Database
+    
+    database = Database(config.ensure_data_directory() / "alang.db")
+    try:
+        stats = database.compact(
+            max_age_days=args.max_age_days if args.max_age_days is not None else config.retention_days,
+            max_sessions=args.max_sessions if args.max_sessions is not None else config.max_sessions,
+            archive_path=archive_path
+        )
+    finally:
+        database.close()
+    
+    print(json.dumps(stats, indent=2))
+
+
+def serve(config: Config, args: argparse.Namespace) -> None:
+    """Run, start, stop or inspect the background daemon"""
+    from alang import daemon
+    
+    socket_path = config.socket_path()
+    if args.stop:
+        print("Daemon stopped" if daemon.stop(socket_path) else "No daemon is running")
+        return
+    
+    if args.status:
+        status = daemon.ping(socket_path)
+        print(json.dumps(status, indent=2) if status else "No daemon is running")
+        return
+    
+    config.validate()
+    if args.detach:
+        argv = [sys.executable, str(Path(sys.argv[0]).resolve())]
+        argv += [arg for arg in sys.argv[1:] if arg != "--detach"]
+        log_path = config.ensure_data_directory() / "daemon.log"
+        status = daemon.spawn(argv, socket_path, log_path)
+        if not status:
+            raise RuntimeError(f"Daemon did not start; see {log_path}")
+        print(f"Daemon {status['pid']} listening on {socket_path}")
+        return
+    
+    import asyncio
+    import logging
+    logging.basicConfig(
+        level=logging.DEBUG if config.debug else logging.INFO,
+        format="%(asctime)s %(name)s %(levelname)s %(message)s"
+    )
+    asyncio.run(daemon.AlangDaemon(config, socket_path).serve())
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Alang - Your AI Coding Assistant",
@@ -24,6 +87,12 @@ Examples:
   alang                           # Start interactive mode
   alang --debug                   # Start with debug logging
   alang --config custom.json     # Use custom config file
+  alang --session 3               # Resume session 3
+  alang --profile-startup         # Report import and initialization timings
+  alang batch prompts.jsonl --concurrency 8 --out results.jsonl
+  alang serve --detach            # Keep a warm client running in the background
+  alang ask "What does main.py do?"  # One-shot question, answered by the daemon if running
+  alang db compact --max-age-days 90  # Archive sessions idle for 90 days
         """
     )
     
@@ -39,6 +108,102 @@ Examples:
         help="Enable debug mode"
     )
     
+    parser.add_argument(
+        "--session", "-s",
+        type=int,
+        help="Resume an existing session by ID"
+    )
+    
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import and initialization timings in the chat and on exit"
+    )
+    
+    parser.add_argument(
+        "--no-attach",
+        action="store_true",
+        help="Don't send requests through a running daemon (alang serve)"
+    )
+    
+    subparsers = parser.add_subparsers(dest="command")
+    
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Run a JSONL file of prompts without the interactive UI"
+    )
+    batch_parser.add_argument("input", help="JSONL file with one prompt per line")
+    batch_parser.add_argument(
+        "--concurrency", "-n",
+        type=int,
+        default=4,
+        help="Number of requests in flight at once (default: 4)"
+    )
+    batch_parser.add_argument(
+        "--out", "-o",
+        default="-",
+        help="JSONL file for results (default: stdout)"
+    )
+    
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run a daemon that keeps the client, database and tool caches warm"
+    )
+    serve_parser.add_argument(
+        "--detach",
+        action="store_true",
+        help="Run the daemon in the background (output goes to daemon.log in the data directory)"
+    )
+    serve_parser.add_argument(
+        "--stop",
+        action="store_true",
+        help="Stop the running daemon"
+    )
+    serve_parser.add_argument(
+        "--status",
+        action="store_true",
+        help="Show the running daemon's status"
+    )
+    
+    ask_parser = subparsers.add_parser(
+        "ask",
+        help="Ask a one-shot question and print the reply"
+    )
+    ask_parser.add_argument("message", nargs="+", help='Question to ask, or "-" to read it from stdin')
+    ask_parser.add_argument(
+        "--session", "-s",
+        type=int,
+        dest="ask_session",
+        help="Continue a stored session and record the exchange in it"
+    )
+    
+    db_parser = subparsers.add_parser("db", help="Maintain the Alang database")
+    db_subparsers = db_parser.add_subparsers(dest="db_command", required=True)
+    compact_parser = db_subparsers.add_parser(
+        "compact",
+        help="Remove or archive old and empty sessions and reclaim disk space"
+    )
+    compact_parser.add_argument(
+        "--max-age-days",
+        type=int,
+        help="Remove sessions idle for longer than this (default: retention_days from config)"
+    )
+    compact_parser.add_argument(
+        "--max-sessions",
+        type=int,
+        help="Keep only this many most recent sessions (default: max_sessions from config)"
+    )
+    compact_parser.add_argument(
+        "--archive",
+        type=str,
+        help="SQLite file receiving removed sessions (default: archive.db in the data directory)"
+    )
+    compact_parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="Delete removed sessions without archiving them"
+    )
+    
     args = parser.parse_args()
     
     try:
@@ -46,13 +211,50 @@ Examples:
         config = Config.load(args.config)
         config.debug = args.debug
         
+        if args.command == "db":
+            compact_database(config, args)
+            return
+        
+        if args.command == "serve":
+            serve(config, args)
+            return
+        
+        if args.command == "ask":
+            import asyncio
+            from alang.daemon import ask
+            message = sys.stdin.read() if args.message == ["-"] else " ".join(args.message)
+            if not asyncio.run(ask(config, message, args.ask_session, attach=not args.no_attach)):
+                sys.exit(1)
+            return
+        
         # Validate configuration
         config.validate()
         
+        if args.command == "batch":
+            from alang.batch import run_batch_file
+            summary = run_batch_file(config, args.input, args.out, max(1, args.concurrency))
+            print(json.dumps(summary), file=sys.stderr)
+            return
+        
+        timings = {"interpreter_ms": (time.perf_counter() - STARTED) * 1000}
+        imported = time.perf_counter()
+        from alang.app import AlangApp
+        timings["import_app_ms"] = (time.perf_counter() - imported) * 1000
+        
         # Create and run the app
-        app = AlangApp(config)
+        app = AlangApp(
+            config,
+            session_id=args.session,
+            profile_startup=args.profile_startup,
+            startup_timings=timings,
+            started=STARTED,
+            attach=not args.no_attach
+        )
         app.run()
         
+        if args.profile_startup:
+            print(json.dumps({name: round(value, 1) for name, value in timings.items()}), file=sys.stderr)
+        
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
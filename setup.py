@@ -43,6 +43,9 @@ setup(
         "rich>=13.0.0",
     ],
     extras_require={
+        "zstd": [
+            "zstandard>=0.21.0",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "black>=23.0.0",
@@ -3,6 +3,7 @@
 Simple command-line version of Alang that works in any terminal
 """
 
+import argparse
 import sys
 from pathlib import Path
 
@@ -10,10 +11,35 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from alang.config import Config
-from alang.gemini_client import GeminiClient
+from alang.daemon import attach
+
+
+def create_client(config: Config):
+    """Create an in-process Gemini client, importing the SDK on first use"""
+    from alang.cache import ResponseCache
+    from alang.gemini_client import GeminiClient
+    
+    response_cache = ResponseCache(config.response_cache_size) if config.response_cache else None
+    return GeminiClient(
+        config.gemini_api_key,
+        config.model,
+        max_history_tokens=config.max_history_tokens,
+        response_cache=response_cache,
+        context_cache_ttl=config.context_cache_ttl,
+        max_retries=config.max_retries,
+        requests_per_minute=config.requests_per_minute
+    )
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Simple command-line version of Alang")
+    parser.add_argument(
+        "--no-attach",
+        action="store_true",
+        help="Run in-process even when a background daemon (alang serve) is running"
+    )
+    args = parser.parse_args()
+    
     print("🤖 Alang - AI Coding Assistant")
     print("=" * 50)
     print("Type 'quit' or 'exit' to end the conversation")
@@ -25,10 +51,13 @@ def main():
         config = Config.load()
         config.validate()
         
-        # Initialize Gemini client
-        client = GeminiClient(config.gemini_api_key, config.model)
-        
-        print(f"\n✅ Connected to Gemini using model: {config.model}")
+        # Use the running daemon as a thin client, else a client of our own
+        client = None if args.no_attach else attach(config)
+        if client:
+            print(f"\n✅ Attached to daemon {client.status['pid']} using model: {config.model}")
+        else:
+            client = create_client(config)
+            print(f"\n✅ Connected to Gemini using model: {config.model}")
         print("💬 Start chatting with your AI assistant!\n")
         
         while True:
@@ -45,6 +74,8 @@ def main():
                     print("  help  - Show this help message")
                     print("  quit  - Exit the application")
                     print("  clear - Clear conversation history")
+                    print("  pin <file> - Keep a file in context for the session")
+                    print("  unpin - Remove all pinned context")
                     print("  Any other text will be sent to the AI assistant\n")
                     continue
                 
@@ -53,14 +84,26 @@ def main():
                     print("🧹 Conversation history cleared!\n")
                     continue
                 
+                if user_input.lower().startswith('pin '):
+                    path = user_input[4:].strip()
+                    client.pin_file(path)
+                    where = "cached on the server" if client.cached_content else "sent inline"
+                    print(f"📌 Pinned {path} ({where})\n")
+                    continue
+                
+                if user_input.lower() == 'unpin':
+                    client.unpin_all()
+                    print("📌 Removed all pinned context\n")
+                    continue
+                
                 if not user_input:
                     continue
                 
                 # Get AI response
                 print("🤖 Alang: ", end="", flush=True)
-                response = client.generate_response(user_input)
-                print(response)
-                print()
+                for chunk in client.stream_response(user_input):
+                    print(chunk, end="", flush=True)
+                print("\n")
                 
             except KeyboardInterrupt:
                 print("\n👋 Goodbye! Happy coding!")
@@ -8,14 +8,17 @@ from textual.widgets import Header, Footer, Input, TextArea, Static, LoadingIndi
 from textual.reactive import reactive
 from textual.binding import Binding
 from textual.message import Message
-from rich.markdown import Markdown
+from itertools import islice
+from typing import Dict, List, Optional
 import asyncio
 import logging
+import time
 
+from .cache import ResponseCache
 from .config import Config
-from .gemini_client import GeminiClient
 from .database import Database
-from .widgets import ChatContainer, InputArea
+from .tools import ExecuteCommandTool, OutputBuffer, ToolRegistry
+from .widgets import ChatContainer, InputArea, MessageSubmitted
 
 
 class AlangApp(App):
@@ -71,18 +74,53 @@ class AlangApp(App):
         Binding("ctrl+k", "command_palette", "Commands"),
         Binding("ctrl+l", "clear_chat", "Clear"),
         Binding("ctrl+s", "send_message", "Send"),
-        Binding("escape", "focus_input", "Focus Input"),
+        Binding("escape", "cancel_generation", "Stop / Focus Input"),
     ]
     
     TITLE = "🤖 Alang - AI Coding Assistant"
     
-    def __init__(self, config: Config):
+    # Messages loaded when resuming a session
+    RESUME_PAGE_SIZE = 200
+    
+    def __init__(self, config: Config, session_id: Optional[int] = None, profile_startup: bool = False,
+                 startup_timings: Optional[Dict[str, float]] = None, started: Optional[float] = None,
+                 attach: bool = False):
+        """Initialize the application
+        
+        Args:
+            config: Alang configuration
+            session_id: Session to resume
+            profile_startup: Report startup timings in the chat once services are up
+            startup_timings: Timings in milliseconds measured before the app was
+                created; the app adds its own to this dictionary
+            started: time.perf_counter() value startup is measured from
+            attach: Send requests through a running daemon (alang serve) if
+                there is one, instead of starting a client in-process
+        """
         super().__init__()
         self.config = config
         self.gemini_client = None
         self.database = None
         self.current_session_id = None
+        self.resume_session_id = session_id
         self.is_thinking = reactive(False)
+        self.attach = attach
+        
+        self.profile_startup = profile_startup
+        self.startup_timings = startup_timings if startup_timings is not None else {}
+        self._started = started if started is not None else time.perf_counter()
+        self._services_ready: Optional[asyncio.Event] = None
+        self._services_task: Optional[asyncio.Task] = None
+        self._services_future: Optional[asyncio.Future] = None
+        self._loop_for_callbacks: Optional[asyncio.AbstractEventLoop] = None
+        
+        # In-flight generations keyed by normalized message text
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._current_task: Optional[asyncio.Task] = None
+        
+        self.command_tool = ExecuteCommandTool(config.command_timeout, config.command_output_limit)
+        self.tool_registry = ToolRegistry(data_directory=config.ensure_data_directory())
+        self.tool_registry.register(self.command_tool)
         
         # Setup logging
         if config.debug:
@@ -103,31 +141,140 @@ class AlangApp(App):
         yield Footer()
     
     def on_mount(self) -> None:
-        """Initialize the application when mounted"""
-        self._initialize_services()
-        self._load_welcome_message()
+        """Initialize the application when mounted
+        
+        Services start in a worker thread so the UI is interactive at once;
+        anything that needs them waits for _services_ready.
+        """
+        self._services_ready = asyncio.Event()
+        self._loop_for_callbacks = asyncio.get_running_loop()
+        self._services_task = asyncio.create_task(self._start_services())
+        self.call_after_refresh(self._record_timing, "first_frame_ms")
+        
+        # A resumed session shows its history first, so the welcome waits for it
+        if self.resume_session_id is None:
+            self._load_welcome_message()
     
-    def _initialize_services(self) -> None:
-        """Initialize Gemini client and database"""
+    async def _start_services(self) -> None:
+        """Initialize services off the event loop, then load the session"""
+        self._services_future = asyncio.ensure_future(asyncio.to_thread(self._initialize_services))
         try:
-            # Initialize Gemini client
-            self.gemini_client = GeminiClient(
-                api_key=self.config.gemini_api_key,
-                model=self.config.model
-            )
-            
-            # Initialize database
-            data_dir = self.config.ensure_data_directory()
-            self.database = Database(data_dir / "alang.db")
-            
-            # Create or get current session
-            self.current_session_id = self.database.create_session("Default Session")
-            
-            self.logger.info("Services initialized successfully")
-            
+            # Shielded so shutdown can still wait for the thread to finish
+            await asyncio.shield(self._services_future)
         except Exception as e:
             self.logger.error(f"Failed to initialize services: {e}")
             self._show_error(f"Failed to initialize: {e}")
+        
+        try:
+            if self.resume_session_id is not None:
+                if self.database and self.current_session_id == self.resume_session_id:
+                    self._load_session_history()
+                self._load_welcome_message()
+        finally:
+            self._services_ready.set()
+        self._record_timing("ready_ms")
+        
+        if self.profile_startup:
+            timings = ", ".join(f"{name} {value:.0f} ms" for name, value in self.startup_timings.items())
+            self.logger.info(f"Startup timings: {timings}")
+            self.query_one("#chat-container", ChatContainer).add_message("system", f"⏱ Startup: {timings}")
+        
+        if self.database and (self.config.retention_days or self.config.max_sessions):
+            asyncio.create_task(self._apply_retention())
+    
+    def _record_timing(self, name: str) -> None:
+        """Record the time since startup under a name"""
+        self.startup_timings[name] = (time.perf_counter() - self._started) * 1000
+    
+    async def _wait_for_services(self) -> None:
+        """Wait until services are initialized, successfully or not"""
+        if self._services_ready:
+            await self._services_ready.wait()
+    
+    async def _apply_retention(self) -> None:
+        """Prune old sessions per the configured retention policy, off the event loop"""
+        try:
+            stats = await asyncio.to_thread(
+                self.database.compact,
+                max_age_days=self.config.retention_days,
+                max_sessions=self.config.max_sessions,
+                archive_path=self.config.archive_path(),
+                keep_session_id=self.current_session_id,
+                vacuum=False
+            )
+            self.logger.info(f"Retention applied: {stats}")
+        except Exception as e:
+            self.logger.error(f"Failed to apply retention policy: {e}")
+    
+    async def on_unmount(self) -> None:
+        """Release network connections and the database when the application exits"""
+        for task in list(self._inflight.values()):
+            task.cancel()
+        
+        # Let a still-running initialization finish so what it opened gets closed
+        if self._services_task:
+            self._services_task.cancel()
+        if self._services_future:
+            await asyncio.wait([self._services_future])
+        
+        if self.gemini_client:
+            await self.gemini_client.aclose()
+        
+        # Commit any queued writes before exiting
+        if self.database:
+            self.database.close()
+    
+    def _initialize_services(self) -> None:
+        """Initialize Gemini client and database; runs in a worker thread"""
+        started = time.perf_counter()
+        
+        # Initialize database
+        data_dir = self.config.ensure_data_directory()
+        self.database = Database(data_dir / "alang.db")
+        self.database.on_write_error = self._report_write_error
+        self.startup_timings["database_ms"] = (time.perf_counter() - started) * 1000
+        
+        # Initialize Gemini client: a thin one if a daemon is running, else the
+        # real one, importing the SDK on first use
+        started = time.perf_counter()
+        self.gemini_client = self._attach_to_daemon() if self.attach else None
+        if self.gemini_client is None:
+            from .gemini_client import GeminiClient
+            
+            response_cache = None
+            if self.config.response_cache:
+                response_cache = ResponseCache(self.config.response_cache_size, self.database)
+            
+            self.gemini_client = GeminiClient(
+                api_key=self.config.gemini_api_key,
+                model=self.config.model,
+                max_history_tokens=self.config.max_history_tokens,
+                response_cache=response_cache,
+                context_cache_ttl=self.config.context_cache_ttl,
+                max_retries=self.config.max_retries,
+                requests_per_minute=self.config.requests_per_minute,
+                tool_registry=self.tool_registry,
+                tool_mode=self.config.tools
+            )
+        self.gemini_client.on_tool_execution = self._record_tool_execution
+        self.startup_timings["gemini_client_ms"] = (time.perf_counter() - started) * 1000
+        
+        # Resume the requested session or start a new one
+        if self.resume_session_id and self.database.get_session(self.resume_session_id):
+            self.current_session_id = self.resume_session_id
+        else:
+            # Reuse a session left empty by an earlier launch instead of piling up new ones
+            self.current_session_id = self.database.claim_empty_session()
+            if self.current_session_id is None:
+                self.current_session_id = self.database.create_session("Default Session")
+        
+        self.logger.info("Services initialized successfully")
+    
+    def _attach_to_daemon(self):
+        """Get a client for the running daemon, or None if there is none or it serves another context"""
+        from .daemon import attach
+        
+        return attach(self.config)
     
     def _load_welcome_message(self) -> None:
         """Load welcome message"""
@@ -142,6 +289,10 @@ Your AI coding assistant is ready to help you with:
 
 Just type your message below and press Enter to get started!
 
+Use `/pin <file>` to keep a file in context for the whole session and `/unpin` to drop it.
+Use `/search <words>` to find earlier messages in any session.
+Use `/run <command>` to run a shell command and watch its output live.
+
 ---
 
 **Keyboard Shortcuts:**
@@ -149,11 +300,35 @@ Just type your message below and press Enter to get started!
 - `Ctrl+K` - Command palette
 - `Ctrl+L` - Clear chat
 - `Ctrl+S` - Send message
-- `Escape` - Focus input field"""
+- `Escape` - Stop the current reply or command, or focus the input field"""
         
         chat_container = self.query_one("#chat-container", ChatContainer)
         chat_container.add_message("assistant", welcome_text)
     
+    def _load_session_history(self) -> None:
+        """Replay a resumed session into the chat and the client's history"""
+        # Only the latest page is needed to fill the screen and the history budget
+        messages = self.database.get_messages(self.current_session_id, limit=self.RESUME_PAGE_SIZE)
+        
+        chat_container = self.query_one("#chat-container", ChatContainer)
+        for msg in messages:
+            chat_container.add_message(msg["role"], msg["content"], message_id=msg["id"])
+        
+        # Older messages are only fetched when the user scrolls up to them
+        chat_container.set_history_loader(self._load_older_messages)
+        
+        self.gemini_client.load_history(messages)
+    
+    def _load_older_messages(self, before_id: int) -> List[Dict]:
+        """Fetch the page of session messages preceding a message id"""
+        page = islice(
+            self.database.iter_messages(
+                self.current_session_id, before_id=before_id, page_size=ChatContainer.PAGE_SIZE
+            ),
+            ChatContainer.PAGE_SIZE
+        )
+        return list(reversed(list(page)))
+    
     def _show_error(self, error_message: str) -> None:
         """Show error message to user"""
         chat_container = self.query_one("#chat-container", ChatContainer)
@@ -170,32 +345,80 @@ Just type your message below and press Enter to get started!
         # Clear input
         input_area.clear()
         
+        if message.startswith("/"):
+            await self._run_command(message.strip())
+            return
+        
+        self._submit(message)
+    
+    def _submit(self, message: str) -> asyncio.Task:
+        """Start generating a reply, or join the identical request already running
+        
+        Args:
+            message: User message
+            
+        Returns:
+            The task producing the reply
+        """
+        key = " ".join(message.split())
+        task = self._inflight.get(key)
+        if task and not task.done():
+            self.notify("Already answering that message")
+            return task
+        
+        task = asyncio.create_task(self._generate_reply(message))
+        self._inflight[key] = task
+        self._current_task = task
+        
+        def forget(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if self._current_task is finished:
+                self._current_task = None
+        
+        task.add_done_callback(forget)
+        return task
+    
+    async def _generate_reply(self, message: str) -> None:
+        """Show a user message and stream the assistant's reply into the chat"""
         # Add user message to chat
         chat_container = self.query_one("#chat-container", ChatContainer)
         chat_container.add_message("user", message)
         
+        # A message typed right after launch waits for the client
+        await self._wait_for_services()
+        if not self.gemini_client:
+            chat_container.add_message("system", "❌ Error: Gemini client is not available")
+            return
+        
         # Save to database
         if self.database:
-            self.database.save_message(self.current_session_id, "user", message)
+            self.database.save_message(self.current_session_id, "user", message, wait=False)
         
         # Set thinking state
         self.is_thinking = True
         chat_container.set_thinking(True)
         
         try:
-            # Generate response
-            response = await asyncio.to_thread(
-                self.gemini_client.generate_response, 
-                message
-            )
-            
-            # Add response to chat
-            chat_container.add_message("assistant", response)
+            # Stream the response, rendering each chunk as it arrives
+            response = ""
+            reply = None
+            async for chunk in self.gemini_client.astream_response(message):
+                if reply is None:
+                    chat_container.set_thinking(False)
+                    reply = chat_container.add_message("assistant", chunk)
+                else:
+                    chat_container.append_to_message(reply, chunk)
+                response += chunk
             
             # Save to database
             if self.database:
-                self.database.save_message(self.current_session_id, "assistant", response)
+                self.database.save_message(self.current_session_id, "assistant", response, wait=False)
             
+        except asyncio.CancelledError:
+            chat_container.add_message("system", "⏹ Generation stopped")
+            raise
+        
         except Exception as e:
             self.logger.error(f"Error generating response: {e}")
             chat_container.add_message("system", f"❌ Error: {str(e)}")
@@ -204,7 +427,96 @@ Just type your message below and press Enter to get started!
             self.is_thinking = False
             chat_container.set_thinking(False)
     
-    def action_clear_chat(self) -> None:
+    async def _run_command(self, command: str) -> None:
+        """Run a slash command typed into the input area"""
+        chat_container = self.query_one("#chat-container", ChatContainer)
+        await self._wait_for_services()
+        name, _, argument = command.partition(" ")
+        argument = argument.strip()
+        
+        try:
+            if name == "/pin" and argument:
+                await asyncio.to_thread(self.gemini_client.pin_file, argument)
+                where = "cached on the server" if self.gemini_client.cached_content else "sent inline"
+                chat_container.add_message("system", f"📌 Pinned `{argument}` ({where})")
+            elif name == "/unpin":
+                await asyncio.to_thread(self.gemini_client.unpin_all)
+                chat_container.add_message("system", "📌 Removed all pinned context")
+            elif name == "/run" and argument:
+                # Runs in the background so the UI stays live; Escape stops it
+                task = asyncio.create_task(self._run_shell(argument))
+                self._current_task = task
+                task.add_done_callback(self._forget_current_task)
+            elif name == "/search" and argument:
+                results = await asyncio.to_thread(self.database.search_messages, argument)
+                lines = [f"🔍 {len(results)} results for `{argument}`"]
+                for result in results:
+                    lines.append(f"- session {result['session_id']}, {result['role']} at {result['timestamp']}: {result['snippet']}")
+                chat_container.add_message("system", "\n".join(lines))
+            else:
+                chat_container.add_message(
+                    "system",
+                    f"Unknown command: {command}\n\nAvailable: `/pin <file>`, `/unpin`, `/search <words>`, `/run <command>`"
+                )
+        except Exception as e:
+            self.logger.error(f"Command failed: {e}")
+            chat_container.add_message("system", f"❌ Error: {str(e)}")
+    
+    async def _run_shell(self, command: str) -> None:
+        """Run a shell command, streaming its output into the chat"""
+        chat_container = self.query_one("#chat-container", ChatContainer)
+        header = f"$ {command}\n"
+        record = chat_container.add_message("command", header)
+        output = OutputBuffer(self.config.command_output_limit)
+        
+        def show(stream: str, text: str) -> None:
+            output.write(text)
+            chat_container.update_message(record, header + output.getvalue())
+        
+        try:
+            result = await self.command_tool.execute_async(command, on_output=show)
+        except asyncio.CancelledError:
+            chat_container.update_message(record, header + output.getvalue() + "\n⏹ Command stopped")
+            raise
+        
+        if "return_code" in result:
+            status = f"{'✅' if result['success'] else '❌'} Exit code {result['return_code']}"
+        else:
+            status = f"❌ {result['error']}"
+        chat_container.update_message(record, header + output.getvalue() + "\n" + status)
+        
+        # The command may have changed files behind memoized tool results and the search index
+        self.tool_registry.invalidate()
+        
+        if self.database:
+            self.database.save_tool_execution(
+                self.current_session_id, self.command_tool.name, {"command": command}, result, result["success"],
+                wait=False
+            )
+    
+    def _record_tool_execution(self, name: str, args: Dict, result: Dict) -> None:
+        """Store a tool call made by the model; runs on the tool's worker thread"""
+        if self.database:
+            self.database.save_tool_execution(
+                self.current_session_id, name, args, result, result.get("success", False), wait=False
+            )
+    
+    def _report_write_error(self, description: str, error: BaseException) -> None:
+        """Tell the user a background save failed; runs on the database writer thread"""
+        if not self._loop_for_callbacks or self._loop_for_callbacks.is_closed():
+            # The app has already stopped; the error is still in the log
+            return
+        # Not call_from_thread: it blocks until the UI runs the callback, and
+        # the UI may itself be waiting on the writer in flush() or close()
+        self._loop_for_callbacks.call_soon_threadsafe(
+            lambda: self.notify(f"Failed to save {description}: {error}", title="Database error", severity="error")
+        )
+    
+    def _forget_current_task(self, finished: asyncio.Task) -> None:
+        if self._current_task is finished:
+            self._current_task = None
+    
+    async def action_clear_chat(self) -> None:
         """Clear the chat"""
         chat_container = self.query_one("#chat-container", ChatContainer)
         chat_container.clear_messages()
@@ -213,12 +525,20 @@ Just type your message below and press Enter to get started!
         if self.gemini_client:
             self.gemini_client.clear_history()
         
-        # Create new session
+        # Create new session; waiting on the writer's commit happens off the event loop
         if self.database:
-            self.current_session_id = self.database.create_session("New Session")
+            self.current_session_id = await asyncio.to_thread(self.database.create_session, "New Session")
         
         self._load_welcome_message()
     
+    def action_cancel_generation(self) -> None:
+        """Stop every reply being generated and any running command, or focus the input when idle"""
+        running = {task for task in (*self._inflight.values(), self._current_task) if task and not task.done()}
+        if not running:
+            self.action_focus_input()
+        for task in running:
+            task.cancel()
+    
     def action_focus_input(self) -> None:
         """Focus the input area"""
         input_area = self.query_one("#input-area", InputArea)
@@ -228,6 +548,6 @@ Just type your message below and press Enter to get started!
         """Show command palette (placeholder)"""
         self.notify("Command palette coming soon!")
     
-    def on_input_area_submitted(self, message: str) -> None:
+    async def on_message_submitted(self, event: MessageSubmitted) -> None:
         """Handle message submission from input area"""
-        asyncio.create_task(self.action_send_message())
+        await self.action_send_message()
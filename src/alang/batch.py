@@ -0,0 +1,172 @@
+"""
+Headless batch mode for Alang - run a JSONL file of prompts concurrently
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, Tuple
+
+from .cache import ResponseCache
+from .config import Config
+from .gemini_client import GeminiClient
+
+
+def read_prompts(input_file: IO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Read prompt records from a JSONL stream
+    
+    Each line is either a JSON object with a "prompt" (or "message") key and
+    an optional "id", or a bare JSON string. Blank lines are skipped. A line
+    that is not a valid prompt yields a record with an "error" key instead,
+    so one bad line doesn't abort the batch.
+    
+    Args:
+        input_file: Open text stream
+    
+    Yields:
+        Tuples of (index, record)
+    """
+    index = 0
+    for line_num, line in enumerate(input_file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            data = None
+            error = f"Line {line_num}: invalid JSON: {e}"
+        else:
+            if isinstance(data, str):
+                data = {"prompt": data}
+            error = None
+        
+        if error is None and not isinstance(data, dict):
+            error = f"Line {line_num}: expected a JSON object or string"
+        elif error is None and not isinstance(data.get("prompt", data.get("message")), str):
+            error = f"Line {line_num}: expected a 'prompt' string"
+        
+        record_id = data.get("id", index) if isinstance(data, dict) else index
+        if error:
+            yield index, {"id": record_id, "error": error}
+        else:
+            yield index, {"id": record_id, "prompt": data.get("prompt", data.get("message"))}
+        index += 1
+
+
+async def run_batch(client: GeminiClient, input_file: IO, output_file: IO, concurrency: int = 4) -> Dict[str, Any]:
+    """Run every prompt through the client with a bounded worker pool
+    
+    Results are written as JSON lines in input order, each one as soon as it
+    and every result before it are done.
+    
+    Args:
+        client: Gemini client shared by all workers
+        input_file: JSONL stream of prompts
+        output_file: Stream receiving JSONL results
+        concurrency: Number of requests in flight at once
+    
+    Returns:
+        Summary with counts and latency statistics
+    """
+    # Bounded so a huge input file is read only as fast as workers drain it
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    finished: Dict[int, Dict[str, Any]] = {}
+    next_index = 0
+    latencies = []
+    requests = 0
+    errors = 0
+    
+    def write_ready() -> None:
+        nonlocal next_index
+        while next_index in finished:
+            output_file.write(json.dumps(finished.pop(next_index), ensure_ascii=False) + "\n")
+            next_index += 1
+        output_file.flush()
+    
+    async def worker() -> None:
+        nonlocal requests, errors
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            
+            requests += 1
+            index, record = item
+            started = time.perf_counter()
+            result: Dict[str, Any] = {"index": index, "id": record["id"]}
+            if "error" in record:
+                result["error"] = record["error"]
+                errors += 1
+                finished[index] = result
+                write_ready()
+                continue
+            
+            try:
+                result["response"] = await client.agenerate_response(record["prompt"], history=[], raise_errors=True)
+            except Exception as e:
+                result["error"] = str(e)
+                errors += 1
+            latency_ms = (time.perf_counter() - started) * 1000
+            result["latency_ms"] = round(latency_ms, 1)
+            latencies.append(latency_ms)
+            
+            finished[index] = result
+            write_ready()
+    
+    started = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for item in read_prompts(input_file):
+            await queue.put(item)
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "latency_p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+        "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None
+    }
+
+
+def run_batch_file(config: Config, input_path: str, output_path: str = "-", concurrency: int = 4) -> Dict[str, Any]:
+    """Run a JSONL prompt file with a client built from configuration
+    
+    Args:
+        config: Alang configuration
+        input_path: Path to the JSONL prompt file
+        output_path: Path for JSONL results, or "-" for stdout
+        concurrency: Number of requests in flight at once
+    
+    Returns:
+        Batch summary
+    """
+    response_cache = ResponseCache(config.response_cache_size) if config.response_cache else None
+    client = GeminiClient(
+        config.gemini_api_key,
+        config.model,
+        response_cache=response_cache,
+        max_retries=config.max_retries,
+        requests_per_minute=config.requests_per_minute
+    )
+    
+    async def run() -> Dict[str, Any]:
+        try:
+            with open(input_path, "r", encoding="utf-8") as input_file:
+                if output_path == "-":
+                    return await run_batch(client, input_file, sys.stdout, concurrency)
+                Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+                with open(output_path, "w", encoding="utf-8") as output_file:
+                    return await run_batch(client, input_file, output_file, concurrency)
+        finally:
+            await client.aclose()
+    
+    return asyncio.run(run())
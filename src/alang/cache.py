@@ -0,0 +1,248 @@
+"""
+Response and tool result caches for Alang
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Stat fields that change whenever a file or directory's contents do
+StatSignature = Optional[Tuple[int, int, int]]
+
+# Modification times this close to a call's start are too coarse to trust
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+class ResponseCache:
+    """LRU cache of model responses, optionally persisted in the database"""
+    
+    def __init__(self, max_entries: int = 256, database=None):
+        """Initialize response cache
+        
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            database: Optional Database used to persist responses across runs
+        """
+        self.max_entries = max_entries
+        self.database = database
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(model: str, config: Dict[str, Any], contents: List[Dict]) -> str:
+        """Build a cache key for a request
+        
+        Args:
+            model: Model name
+            config: Generation parameters
+            contents: Full request contents, including history
+        
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = json.dumps(
+            {"model": model, "config": config, "contents": contents},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response
+        
+        Args:
+            key: Cache key from make_key
+        
+        Returns:
+            Cached response text or None
+        """
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+        
+        if self.database:
+            response = self.database.get_cached_response(key)
+            if response is not None:
+                self._store(key, response)
+                with self._lock:
+                    self.hits += 1
+                return response
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, response: str) -> None:
+        """Cache a response
+        
+        Args:
+            key: Cache key from make_key
+            response: Response text
+        """
+        self._store(key, response)
+        
+        if self.database:
+            self.database.save_cached_response(key, response)
+    
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+        
+        if self.database:
+            self.database.clear_response_cache()
+    
+    def _store(self, key: str, response: str) -> None:
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics
+        
+        Returns:
+            Dictionary with entry, hit and miss counts
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class ToolResultCache:
+    """LRU cache of read-only tool results, validated against file stats
+    
+    Each result is stored with the paths it was computed from and their
+    (mtime, size, inode) at the time. A lookup re-stats those paths and
+    drops the entry if any of them changed, so a hit costs a few stat calls
+    instead of the tool's I/O. Results are bounded by their total size.
+    """
+    
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        """Initialize tool result cache
+        
+        Args:
+            max_bytes: Upper bound on the serialized size of cached results
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], Tuple[Tuple[str, StatSignature], ...], int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+        """Build a cache key for a tool call
+        
+        Args:
+            tool_name: Name of the tool
+            arguments: Call arguments with defaults filled in
+        
+        Returns:
+            Key identifying the call from the current working directory
+        """
+        return json.dumps(
+            {"tool": tool_name, "cwd": os.getcwd(), "arguments": arguments},
+            sort_keys=True,
+            default=str
+        )
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result if none of the files it depends on changed
+        
+        Args:
+            key: Cache key from make_key
+        
+        Returns:
+            Cached result or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        
+        if entry is not None and all(_stat_signature(path) == signature for path, signature in entry[1]):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return entry[0]
+        
+        with self._lock:
+            if entry is not None and self._entries.get(key) is entry:
+                self._remove(key)
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, result: Dict[str, Any], paths: List[str], started_ns: int) -> None:
+        """Cache a result
+        
+        Paths modified after the call started (or within the filesystem's
+        timestamp granularity before it) may have changed mid-call without
+        changing their stat afterwards, so such results are not cached.
+        
+        Args:
+            key: Cache key from make_key
+            result: Tool result
+            paths: Files and directories the result was computed from
+            started_ns: time.time_ns() when the call started
+        """
+        dependencies = tuple((path, _stat_signature(path)) for path in paths)
+        if any(signature and signature[0] >= started_ns - RACY_WINDOW_NS for _, signature in dependencies):
+            return
+        
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes // 4:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, dependencies, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+    
+    def clear(self) -> None:
+        """Remove all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def _remove(self, key: str) -> None:
+        self._size -= self._entries.pop(key)[2]
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics
+        
+        Returns:
+            Dictionary with entry, byte, hit and miss counts
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def _stat_signature(path: str) -> StatSignature:
+    """Get the (mtime, size, inode) of a path, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
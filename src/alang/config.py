@@ -16,6 +16,18 @@ class Config:
         self.model: str = "gemini-1.5-pro"
         self.data_directory: str = "~/.alang"
         self.debug: bool = False
+        self.max_history_tokens: int = 32000
+        self.response_cache: bool = False
+        self.response_cache_size: int = 256
+        self.context_cache_ttl: int = 3600
+        self.max_retries: int = 3
+        self.requests_per_minute: int = 0
+        self.retention_days: int = 0
+        self.max_sessions: int = 0
+        self.archive_sessions: bool = True
+        self.command_timeout: float = 30.0
+        self.command_output_limit: int = 64000
+        self.tools: str = "read-only"
         
     @classmethod
     def load(cls, config_path: Optional[str] = None) -> "Config":
@@ -38,6 +50,18 @@ class Config:
                 config.model = data.get("model", "gemini-1.5-pro")
                 config.data_directory = data.get("data_directory", "~/.alang")
                 config.debug = data.get("debug", False)
+                config.max_history_tokens = data.get("max_history_tokens", 32000)
+                config.response_cache = data.get("response_cache", False)
+                config.response_cache_size = data.get("response_cache_size", 256)
+                config.context_cache_ttl = data.get("context_cache_ttl", 3600)
+                config.max_retries = data.get("max_retries", 3)
+                config.requests_per_minute = data.get("requests_per_minute", 0)
+                config.retention_days = data.get("retention_days", 0)
+                config.max_sessions = data.get("max_sessions", 0)
+                config.archive_sessions = data.get("archive_sessions", True)
+                config.command_timeout = data.get("command_timeout", 30.0)
+                config.command_output_limit = data.get("command_output_limit", 64000)
+                config.tools = data.get("tools", "read-only")
                 
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Warning: Failed to load config file {config_file}: {e}")
@@ -55,6 +79,21 @@ class Config:
         if os.getenv("ALANG_DEBUG"):
             config.debug = os.getenv("ALANG_DEBUG").lower() in ("true", "1", "yes")
         
+        if os.getenv("ALANG_MAX_HISTORY_TOKENS"):
+            config.max_history_tokens = int(os.getenv("ALANG_MAX_HISTORY_TOKENS"))
+        
+        if os.getenv("ALANG_REQUESTS_PER_MINUTE"):
+            config.requests_per_minute = int(os.getenv("ALANG_REQUESTS_PER_MINUTE"))
+        
+        if os.getenv("ALANG_COMMAND_TIMEOUT"):
+            config.command_timeout = float(os.getenv("ALANG_COMMAND_TIMEOUT"))
+        
+        if os.getenv("ALANG_TOOLS"):
+            config.tools = os.getenv("ALANG_TOOLS").lower()
+        
+        if os.getenv("ALANG_RESPONSE_CACHE"):
+            config.response_cache = os.getenv("ALANG_RESPONSE_CACHE").lower() in ("true", "1", "yes")
+        
         return config
     
     def validate(self) -> None:
@@ -64,6 +103,8 @@ class Config:
                 "Gemini API key is required. Set it in config file or GEMINI_API_KEY environment variable. "
                 "Get your API key from: https://makersuite.google.com/app/apikey"
             )
+        if self.tools not in ("read-only", "all", "off"):
+            raise ValueError(f"Invalid tools setting '{self.tools}'; use 'read-only', 'all' or 'off'")
     
     def ensure_data_directory(self) -> Path:
         """Ensure data directory exists and return Path object"""
@@ -78,6 +119,16 @@ class Config:
         
         return data_dir
     
+    def socket_path(self) -> Path:
+        """Get the Unix socket the background daemon listens on"""
+        return self.ensure_data_directory() / "alang.sock"
+    
+    def archive_path(self) -> Optional[Path]:
+        """Get the file that receives sessions removed by retention, if archiving is on"""
+        if not self.archive_sessions:
+            return None
+        return self.ensure_data_directory() / "archive.db"
+    
     def save(self, config_path: Optional[str] = None) -> None:
         """Save configuration to file"""
         if config_path:
@@ -92,7 +143,19 @@ class Config:
             "gemini_api_key": self.gemini_api_key,
             "model": self.model,
             "data_directory": self.data_directory,
-            "debug": self.debug
+            "debug": self.debug,
+            "max_history_tokens": self.max_history_tokens,
+            "response_cache": self.response_cache,
+            "response_cache_size": self.response_cache_size,
+            "context_cache_ttl": self.context_cache_ttl,
+            "max_retries": self.max_retries,
+            "requests_per_minute": self.requests_per_minute,
+            "retention_days": self.retention_days,
+            "max_sessions": self.max_sessions,
+            "archive_sessions": self.archive_sessions,
+            "command_timeout": self.command_timeout,
+            "command_output_limit": self.command_output_limit,
+            "tools": self.tools
         }
         
         with open(config_file, 'w') as f:
@@ -104,5 +167,17 @@ class Config:
             "gemini_api_key": self.gemini_api_key,
             "model": self.model,
             "data_directory": self.data_directory,
-            "debug": self.debug
+            "debug": self.debug,
+            "max_history_tokens": self.max_history_tokens,
+            "response_cache": self.response_cache,
+            "response_cache_size": self.response_cache_size,
+            "context_cache_ttl": self.context_cache_ttl,
+            "max_retries": self.max_retries,
+            "requests_per_minute": self.requests_per_minute,
+            "retention_days": self.retention_days,
+            "max_sessions": self.max_sessions,
+            "archive_sessions": self.archive_sessions,
+            "command_timeout": self.command_timeout,
+            "command_output_limit": self.command_output_limit,
+            "tools": self.tools
         }
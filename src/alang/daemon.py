@@ -0,0 +1,625 @@
+"""
+Background daemon holding a warm Gemini client, and the thin client that talks to it
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from .config import Config
+from .gemini_client import ConversationHistory
+
+
+# Longest line accepted on the socket; requests carry the client's history
+MAX_LINE_SIZE = 64 * 1024 * 1024
+
+# Seconds a thin client waits for the daemon to answer a ping
+CONNECT_TIMEOUT = 0.5
+
+# Seconds `serve --detach` waits for the new daemon to come up
+SPAWN_TIMEOUT = 15.0
+
+# Messages of a stored session sent as history with `ask --session`
+SESSION_HISTORY_LIMIT = 200
+
+# Settings an "ask" request must share with the daemon; tools resolve paths
+# against the daemon's working directory and run with its tools mode
+CLIENT_CONTEXT_KEYS = ("working_directory", "model", "tools")
+
+# (emit, session id) of the request being served; tool calls run in worker
+# threads, which inherit it through asyncio.to_thread
+_current_request: contextvars.ContextVar = contextvars.ContextVar("alang_current_request", default=None)
+
+
+class AlangDaemon:
+    """Long-lived process serving requests with a warm client, database and tool caches
+    
+    Each connection carries one request: a JSON object on a single line.
+    The daemon answers with JSON lines: {"chunk": text} as a reply streams,
+    {"tool": name, "arguments": ..., "result": ...} for every tool the model
+    runs, and finally {"done": true, ...} or {"error": message}. Closing the
+    connection early cancels the request.
+    
+    Requests:
+        {"op": "ask", "message": text, "history": [...]} answers with the
+            given history, or none; {"session_id": id} instead uses a stored
+            session's history and records the exchange in it. Every ask
+            carries the client's working_directory, model and tools mode,
+            and is refused unless they match the daemon's
+        {"op": "ping"} reports the daemon's status
+        {"op": "shutdown"} stops the daemon
+    """
+    
+    def __init__(self, config: Config, socket_path: Optional[Path] = None):
+        """Initialize the daemon
+        
+        Args:
+            config: Alang configuration
+            socket_path: Unix socket to listen on; defaults to Config.socket_path()
+        """
+        self.config = config
+        self.socket_path = Path(socket_path) if socket_path else config.socket_path()
+        self.database = None
+        self.client = None
+        self.tool_registry = None
+        self.started = time.time()
+        self.requests = 0
+        self.logger = logging.getLogger(__name__)
+        self._stopped: Optional[asyncio.Event] = None
+    
+    def initialize(self) -> None:
+        """Open the database and create the client; blocking, so run it in a thread"""
+        from .cache import ResponseCache
+        from .database import Database
+        from .gemini_client import GeminiClient
+        from .tools import ExecuteCommandTool, ToolRegistry
+        
+        data_dir = self.config.ensure_data_directory()
+        self.database = Database(data_dir / "alang.db")
+        
+        self.tool_registry = ToolRegistry(data_directory=data_dir)
+        self.tool_registry.register(ExecuteCommandTool(self.config.command_timeout, self.config.command_output_limit))
+        
+        response_cache = None
+        if self.config.response_cache:
+            response_cache = ResponseCache(self.config.response_cache_size, self.database)
+        
+        self.client = GeminiClient(
+            api_key=self.config.gemini_api_key,
+            model=self.config.model,
+            max_history_tokens=self.config.max_history_tokens,
+            response_cache=response_cache,
+            context_cache_ttl=self.config.context_cache_ttl,
+            max_retries=self.config.max_retries,
+            requests_per_minute=self.config.requests_per_minute,
+            tool_registry=self.tool_registry,
+            tool_mode=self.config.tools
+        )
+        self.client.on_tool_execution = self._on_tool_execution
+    
+    async def close(self) -> None:
+        """Release network connections and the database"""
+        if self.client:
+            await self.client.aclose()
+        if self.database:
+            self.database.close()
+    
+    async def serve(self) -> None:
+        """Listen on the socket until a shutdown request or SIGTERM/SIGINT"""
+        if ping(self.socket_path):
+            raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+        if self.socket_path.exists():
+            # Left behind by a daemon that did not exit cleanly
+            self.socket_path.unlink()
+        
+        await asyncio.to_thread(self.initialize)
+        
+        self._stopped = asyncio.Event()
+        # The daemon acts with the owner's API key and files, so the socket is
+        # created owner-only rather than narrowed after it is already reachable
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle, path=str(self.socket_path), limit=MAX_LINE_SIZE)
+        finally:
+            os.umask(umask)
+        
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, self._stopped.set)
+            except (RuntimeError, NotImplementedError):
+                # Not the main thread; the embedding program handles signals
+                pass
+        
+        self.logger.info(f"Listening on {self.socket_path}")
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            try:
+                self.socket_path.unlink()
+            except OSError:
+                pass
+            await self.close()
+            self.logger.info("Daemon stopped")
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one connection's request"""
+        def emit(event: Dict[str, Any]) -> None:
+            if not writer.is_closing():
+                writer.write(json.dumps(event).encode("utf-8") + b"\n")
+        
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                emit({"error": f"Invalid request: {e}"})
+                return
+            if not isinstance(request, dict):
+                emit({"error": "Invalid request: expected a JSON object"})
+                return
+            
+            # The client hanging up is the only thing it can send now
+            task = asyncio.create_task(self.dispatch(request, emit))
+            hangup = asyncio.create_task(reader.read(1))
+            await asyncio.wait([task, hangup], return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                self.logger.info("Client disconnected; cancelling its request")
+                task.cancel()
+            hangup.cancel()
+            await asyncio.gather(task, hangup, return_exceptions=True)
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # The daemon is shutting down; end the connection quietly
+            pass
+        finally:
+            writer.close()
+    
+    async def dispatch(self, request: Dict[str, Any], emit: Callable[[Dict[str, Any]], None]) -> None:
+        """Answer a request through an event callback
+        
+        Args:
+            request: Request dictionary with an "op" key
+            emit: Called on the event loop with each response event
+        """
+        op = request.get("op")
+        if op == "ask":
+            self.requests += 1
+            await self.ask(request, emit)
+        elif op == "ping":
+            emit({"done": True, **self.status()})
+        elif op == "shutdown":
+            emit({"done": True})
+            self._stopped.set()
+        else:
+            emit({"error": f"Unknown op '{op}'"})
+    
+    async def ask(self, request: Dict[str, Any], emit: Callable[[Dict[str, Any]], None]) -> None:
+        """Stream a reply to an "ask" request
+        
+        Args:
+            request: Request with "message" and optionally "history" or "session_id"
+            emit: Called on the event loop with each response event
+        """
+        message = request.get("message")
+        if not isinstance(message, str) or not message.strip():
+            emit({"error": "Request has no message"})
+            return
+        
+        mismatch = context_mismatch(self.status(), request)
+        if mismatch:
+            emit({"error": f"Client does not match the daemon: {mismatch}; restart it with alang serve or use --no-attach"})
+            return
+        
+        session_id = request.get("session_id")
+        history = request.get("history") or []
+        if session_id is not None:
+            if not await asyncio.to_thread(self.database.get_session, session_id):
+                emit({"error": f"Session {session_id} not found"})
+                return
+            stored = await asyncio.to_thread(self.database.get_messages, session_id, SESSION_HISTORY_LIMIT)
+            session_history = ConversationHistory(self.config.max_history_tokens)
+            session_history.load(stored)
+            history = session_history.messages
+        
+        loop = asyncio.get_running_loop()
+        token = _current_request.set((lambda event: loop.call_soon_threadsafe(emit, event), session_id))
+        parts = []
+        try:
+            async for chunk in self.client.astream_response(message, history=history, raise_errors=True):
+                parts.append(chunk)
+                emit({"chunk": chunk})
+        except Exception as e:
+            emit({"error": str(e)})
+            return
+        finally:
+            _current_request.reset(token)
+        
+        response = "".join(parts)
+        if session_id is not None:
+            self.database.save_message(session_id, "user", message, wait=False)
+            self.database.save_message(session_id, "assistant", response, wait=False)
+        emit({"done": True, "response": response})
+    
+    def _on_tool_execution(self, name: str, args: Dict, result: Dict) -> None:
+        """Forward a tool call to the client that caused it; runs on the tool's worker thread"""
+        current = _current_request.get()
+        if current is None:
+            return
+        emit, session_id = current
+        emit({"tool": name, "arguments": args, "result": result})
+        if session_id is not None:
+            self.database.save_tool_execution(session_id, name, args, result, result.get("success", False), wait=False)
+    
+    def status(self) -> Dict[str, Any]:
+        """Get the daemon's status"""
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "model": self.config.model,
+            "tools": self.config.tools,
+            "working_directory": os.path.realpath(os.getcwd())
+        }
+
+
+class RemoteGeminiClient:
+    """Stand-in for GeminiClient that forwards requests to a running daemon
+    
+    Conversation history is tracked here and sent with every request, so
+    any number of clients can share one daemon. Each request also carries
+    the client's context, which the daemon checks against its own before
+    running tools; their calls are reported to on_tool_execution.
+    """
+    
+    def __init__(self, socket_path: Path, max_history_tokens: int = 32000, status: Optional[Dict[str, Any]] = None,
+                 context: Optional[Dict[str, Any]] = None):
+        """Initialize the client
+        
+        Args:
+            socket_path: Socket of the running daemon
+            max_history_tokens: Token budget for conversation history
+            status: The daemon's answer to a ping, if already known
+            context: The client's settings from client_context()
+        """
+        self.socket_path = Path(socket_path)
+        self.history = ConversationHistory(max_history_tokens)
+        self.status = status or {}
+        self.context = context or {}
+        self.cached_content = None
+        # Called with (tool name, arguments, result) for every tool the model runs
+        self.on_tool_execution: Optional[Callable[[str, Dict, Dict], None]] = None
+    
+    async def astream_response(self, message: str, history: Optional[List[Dict]] = None,
+                               raise_errors: bool = False) -> AsyncIterator[str]:
+        """Stream a reply from the daemon
+        
+        Args:
+            message: User message
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used and the new turn is recorded
+            raise_errors: Raise errors instead of yielding them as text
+        
+        Yields:
+            Response text chunks
+        """
+        parts = []
+        try:
+            async for event in request_events(self.socket_path, self._request(message, history)):
+                if "chunk" in event:
+                    parts.append(event["chunk"])
+                    yield event["chunk"]
+                elif "tool" in event and self.on_tool_execution:
+                    self.on_tool_execution(event["tool"], event["arguments"], event["result"])
+        except Exception as e:
+            if raise_errors:
+                raise
+            yield f"\n\nError: {str(e)}" if parts else f"Error: {str(e)}"
+            return
+        
+        if parts and history is None:
+            self.history.add_turn(message, "".join(parts))
+    
+    def stream_response(self, message: str, history: Optional[List[Dict]] = None) -> Iterator[str]:
+        """Stream a reply from the daemon over a blocking socket
+        
+        Args:
+            message: User message
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used and the new turn is recorded
+        
+        Yields:
+            Response text chunks
+        """
+        parts = []
+        try:
+            for event in iter_events(self.socket_path, self._request(message, history)):
+                if "chunk" in event:
+                    parts.append(event["chunk"])
+                    yield event["chunk"]
+                elif "tool" in event and self.on_tool_execution:
+                    self.on_tool_execution(event["tool"], event["arguments"], event["result"])
+        except Exception as e:
+            yield f"\n\nError: {str(e)}" if parts else f"Error: {str(e)}"
+            return
+        
+        if parts and history is None:
+            self.history.add_turn(message, "".join(parts))
+    
+    async def agenerate_response(self, message: str, history: Optional[List[Dict]] = None,
+                                 raise_errors: bool = False) -> str:
+        """Get a whole reply from the daemon"""
+        return "".join([chunk async for chunk in self.astream_response(message, history, raise_errors)])
+    
+    def _request(self, message: str, history: Optional[List[Dict]]) -> Dict[str, Any]:
+        """Build an "ask" request carrying the client's context"""
+        return {
+            "op": "ask",
+            "message": message,
+            "history": self.history.messages if history is None else history,
+            **self.context
+        }
+    
+    def pin_file(self, path: str) -> None:
+        """Pinning is per client process, so it is unavailable through a shared daemon"""
+        raise RuntimeError("Pinned context is not available while attached to a daemon; start alang with --no-attach")
+    
+    def unpin_all(self) -> None:
+        """Pinning is per client process, so it is unavailable through a shared daemon"""
+        raise RuntimeError("Pinned context is not available while attached to a daemon; start alang with --no-attach")
+    
+    def get_conversation_history(self) -> List[Dict]:
+        """Get current conversation history"""
+        return list(self.history.messages)
+    
+    def load_history(self, messages: List[Dict]) -> None:
+        """Rebuild conversation history from stored messages"""
+        self.history.load(messages)
+    
+    def clear_history(self) -> None:
+        """Clear conversation history"""
+        self.history.clear()
+    
+    def get_model_info(self) -> Dict:
+        """Get information about the daemon's model"""
+        return {
+            "name": self.status.get("model"),
+            "daemon": str(self.socket_path),
+            "history_length": len(self.history.messages),
+            "history_tokens": self.history.token_count()
+        }
+    
+    async def aclose(self) -> None:
+        """Nothing to release; every request uses its own connection"""
+
+
+def client_context(config: Config) -> Dict[str, Any]:
+    """Get the settings a client's requests must share with the daemon serving them"""
+    return {
+        "working_directory": os.path.realpath(os.getcwd()),
+        "model": config.model,
+        "tools": config.tools
+    }
+
+
+def context_mismatch(status: Dict[str, Any], context: Dict[str, Any]) -> Optional[str]:
+    """Describe how a client's context differs from a daemon's status, or None if it matches"""
+    differences = [
+        f"{key} is {context.get(key)!r} here but {status.get(key)!r} in the daemon"
+        for key in CLIENT_CONTEXT_KEYS
+        if context.get(key) != status.get(key)
+    ]
+    return "; ".join(differences) or None
+
+
+def attach(config: Config, socket_path: Optional[Path] = None) -> Optional[RemoteGeminiClient]:
+    """Get a client for the running daemon
+    
+    Args:
+        config: Alang configuration
+        socket_path: Daemon socket; defaults to Config.socket_path()
+    
+    Returns:
+        A thin client, or None if no daemon is running or it serves a
+        different working directory, model or tools mode
+    """
+    socket_path = Path(socket_path) if socket_path else config.socket_path()
+    status = matching_daemon(config, socket_path)
+    if not status:
+        return None
+    logging.getLogger(__name__).info(f"Attached to daemon {status['pid']} on {socket_path}")
+    return RemoteGeminiClient(socket_path, config.max_history_tokens, status, client_context(config))
+
+
+def matching_daemon(config: Config, socket_path: Path) -> Optional[Dict[str, Any]]:
+    """Get the status of the daemon on a socket, or None if none is running or it serves another context"""
+    status = ping(socket_path)
+    if not status:
+        return None
+    mismatch = context_mismatch(status, client_context(config))
+    if mismatch:
+        logging.getLogger(__name__).warning(f"Not attaching to daemon {status.get('pid')}: {mismatch}")
+        return None
+    return status
+
+
+async def request_events(socket_path: Path, request: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Send a request to the daemon and yield its response events
+    
+    Args:
+        socket_path: Socket of the running daemon
+        request: Request dictionary
+    
+    Yields:
+        Events up to and including the final "done" event
+    
+    Raises:
+        RuntimeError: If the daemon answers with an error
+        ConnectionError: If the daemon cannot be reached or hangs up
+    """
+    reader, writer = await asyncio.open_unix_connection(str(socket_path), limit=MAX_LINE_SIZE)
+    try:
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("The daemon closed the connection")
+            event = json.loads(line)
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            yield event
+            if event.get("done"):
+                return
+    finally:
+        writer.close()
+
+
+def iter_events(socket_path: Path, request: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Blocking variant of request_events, for synchronous clients"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as stream:
+            while True:
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("The daemon closed the connection")
+                event = json.loads(line)
+                if "error" in event:
+                    raise RuntimeError(event["error"])
+                yield event
+                if event.get("done"):
+                    return
+
+
+def ping(socket_path: Path, timeout: float = CONNECT_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """Get the status of the daemon on a socket, or None if none is answering"""
+    return _request_once(socket_path, {"op": "ping"}, timeout)
+
+
+def stop(socket_path: Path, timeout: float = CONNECT_TIMEOUT) -> bool:
+    """Ask the daemon on a socket to shut down; returns False if none was running"""
+    return _request_once(socket_path, {"op": "shutdown"}, timeout) is not None
+
+
+def spawn(argv: List[str], socket_path: Path, log_path: Path, timeout: float = SPAWN_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """Start a daemon as a detached process and wait until it answers
+    
+    Args:
+        argv: Command line running the daemon in the foreground
+        socket_path: Socket the daemon will listen on
+        log_path: File receiving the daemon's output
+        timeout: Seconds to wait for it to come up
+    
+    Returns:
+        The new daemon's status, or None if it did not come up in time
+    """
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+    
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        status = ping(socket_path)
+        if status:
+            return status
+        time.sleep(0.1)
+    return None
+
+
+async def ask(config: Config, message: str, session_id: Optional[int] = None, attach: bool = True,
+              socket_path: Optional[Path] = None, output=None) -> bool:
+    """Answer a one-shot question, through the daemon when one is running
+    
+    Without a daemon the request is served in-process, paying for the
+    client's startup.
+    
+    Args:
+        config: Alang configuration
+        message: Question to ask
+        session_id: Stored session whose history to use and extend
+        attach: Use a running daemon
+        socket_path: Daemon socket; defaults to Config.socket_path()
+        output: Stream receiving the reply; defaults to stdout
+    
+    Returns:
+        Whether the reply completed without error
+    """
+    output = output or sys.stdout
+    socket_path = Path(socket_path) if socket_path else config.socket_path()
+    request = {"op": "ask", "message": message, "session_id": session_id, **client_context(config)}
+    
+    def write(event: Dict[str, Any]) -> None:
+        if "chunk" in event:
+            output.write(event["chunk"])
+            output.flush()
+        elif "error" in event:
+            print(f"Error: {event['error']}", file=sys.stderr)
+    
+    if attach and matching_daemon(config, socket_path):
+        try:
+            async for event in request_events(socket_path, request):
+                write(event)
+        except (RuntimeError, ConnectionError) as e:
+            write({"error": str(e)})
+            return False
+        output.write("\n")
+        return True
+    
+    config.validate()
+    daemon = AlangDaemon(config, socket_path)
+    await asyncio.to_thread(daemon.initialize)
+    succeeded = True
+    
+    def record(event: Dict[str, Any]) -> None:
+        nonlocal succeeded
+        succeeded = succeeded and "error" not in event
+        write(event)
+    
+    try:
+        await daemon.ask(request, record)
+    finally:
+        await daemon.close()
+    output.write("\n")
+    return succeeded
+
+
+def _request_once(socket_path: Path, request: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+    """Send a request over a blocking socket and return the first event, or None on failure"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+    except (OSError, AttributeError):
+        # AttributeError: no AF_UNIX on this platform
+        return None
+    
+    try:
+        event = json.loads(line) if line else None
+    except json.JSONDecodeError:
+        return None
+    return event if event and "error" not in event else None
@@ -3,31 +3,254 @@ Database management for Alang using SQLite
 """
 
 import sqlite3
+import itertools
 import json
+import logging
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import Callable, Iterator, List, Dict, Optional, Any
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Connection settings applied to every connection
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",  # Safe with WAL; fsync at checkpoints, not every commit
+    "PRAGMA cache_size = -20000",  # 20 MB page cache
+    "PRAGMA mmap_size = 268435456",  # Memory-map up to 256 MB of the file
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+# Payloads at least this many bytes are stored compressed
+COMPRESS_THRESHOLD = 4096
+
+# Minutes an empty session stays untouched before it may be reused or removed;
+# until then it may belong to an instance that just opened it
+EMPTY_SESSION_GRACE_MINUTES = 60
+
+
+def compress_text(text: str, threshold: int = COMPRESS_THRESHOLD):
+    """Compress text for storage if it is large enough to be worth it
+    
+    Args:
+        text: Text to store
+        threshold: Minimum size in bytes to compress
+        
+    Returns:
+        Tuple of (stored value, encoding); encoding is None for plain text
+    """
+    data = text.encode("utf-8")
+    if len(data) < threshold:
+        return text, None
+    
+    if zstandard:
+        return zstandard.ZstdCompressor(level=3).compress(data), "zstd"
+    return zlib.compress(data, 6), "zlib"
+
+
+def decompress_text(value, encoding: Optional[str]) -> str:
+    """Restore text stored by compress_text
+    
+    Args:
+        value: Stored value
+        encoding: Encoding marker stored alongside it
+        
+    Returns:
+        Original text
+    """
+    if value is None or encoding is None:
+        return value
+    if encoding == "zstd":
+        if not zstandard:
+            raise RuntimeError("zstandard is required to read zstd-compressed rows")
+        return zstandard.ZstdDecompressor().decompress(value).decode("utf-8")
+    if encoding == "zlib":
+        return zlib.decompress(value).decode("utf-8")
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def _connect(db_path: Path, **kwargs) -> sqlite3.Connection:
+    """Open a connection with Alang's pragmas applied"""
+    conn = sqlite3.connect(db_path, **kwargs)
+    conn.row_factory = sqlite3.Row  # Enable dict-like access
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # Lets the LIKE search fallback see decompressed text
+    conn.create_function("alang_text", 2, decompress_text, deterministic=True)
+    return conn
+
+
+class DatabaseWriter:
+    """Background thread that applies queued writes in group commits
+    
+    Writes queued while a commit is in progress are applied together in the
+    next transaction, so a burst of saves costs one commit instead of many and
+    callers never wait on disk I/O unless they ask for the result.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, db_path: Path, max_batch: int = 256):
+        """Start the writer thread
+        
+        Args:
+            db_path: Path to SQLite database file
+            max_batch: Maximum number of writes per transaction
+        """
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="alang-db-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, write: Callable[[sqlite3.Connection], Any], transactional: bool = True) -> Future:
+        """Queue a write
+        
+        Args:
+            write: Function applying the write to a connection
+            transactional: Run inside a group-commit transaction; pass False for
+                work that manages its own transactions, such as VACUUM or ATTACH
+            
+        Returns:
+            Future resolved with the function's result once committed
+        """
+        future: Future = Future()
+        self._queue.put((write, future, transactional))
+        return future
+    
+    def flush(self) -> None:
+        """Wait until every write queued so far is committed"""
+        self.submit(lambda conn: None).result()
+    
+    def close(self) -> None:
+        """Commit outstanding writes and stop the thread"""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+    
+    def _run(self) -> None:
+        conn = _connect(self.db_path, isolation_level=None)
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                
+                if self._STOP in batch:
+                    stopping = True
+                    batch = [item for item in batch if item is not self._STOP]
+                
+                # Group consecutive transactional writes; run the rest alone
+                pending = []
+                for write, future, transactional in batch:
+                    if transactional:
+                        pending.append((write, future))
+                        continue
+                    if pending:
+                        self._commit_batch(conn, pending)
+                        pending = []
+                    self._run_alone(conn, write, future)
+                if pending:
+                    self._commit_batch(conn, pending)
+        finally:
+            conn.close()
+    
+    def _run_alone(self, conn: sqlite3.Connection, write: Callable[[sqlite3.Connection], Any], future: Future) -> None:
+        """Run a write outside any transaction"""
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(write(conn))
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            future.set_exception(e)
+    
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List) -> None:
+        """Apply a batch of writes in one transaction"""
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for write, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                # A savepoint per write keeps one failure from undoing the rest
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((future, write(conn), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for write, future in batch:
+                if not future.done():
+                    if not future.running():
+                        future.set_running_or_notify_cancel()
+                    future.set_exception(e)
+            return
+        
+        # Resolve only after the commit, so a result means the write is durable
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
 
 
 class Database:
     """SQLite database for storing sessions and messages"""
     
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, compress_threshold: int = COMPRESS_THRESHOLD):
         """Initialize database
         
         Args:
             db_path: Path to SQLite database file
+            compress_threshold: Message and tool result size in bytes above which
+                they are stored compressed
         """
         self.db_path = db_path
+        self.compress_threshold = compress_threshold
         self.conn = None
+        self.writer = None
+        self.fts_enabled = False
+        self.logger = logging.getLogger(__name__)
+        # Called with (what was being saved, error) when a write queued without
+        # waiting fails; runs on the writer thread
+        self.on_write_error: Optional[Callable[[str, BaseException], None]] = None
         self._initialize()
     
     def _initialize(self):
         """Initialize database and create tables"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row  # Enable dict-like access
+        # Reads use this connection; all writes go through the writer thread
+        self.conn = _connect(self.db_path, check_same_thread=False)
+        
+        # Lets compact() return free pages to the OS; only takes effect on new files
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
+        # WAL lets readers proceed while the writer commits
+        self.conn.execute("PRAGMA journal_mode = WAL")
         
         self._create_tables()
+        self.writer = DatabaseWriter(self.db_path)
     
     def _create_tables(self):
         """Create necessary tables"""
@@ -50,10 +273,12 @@ class Database:
                 session_id INTEGER NOT NULL,
                 role TEXT NOT NULL,
                 content TEXT NOT NULL,
+                encoding TEXT,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
             )
         """)
+        self._add_column(cursor, "messages", "encoding", "TEXT")
         
         # Create tools table (for tool execution history)
         cursor.execute("""
@@ -63,19 +288,108 @@ class Database:
                 tool_name TEXT NOT NULL,
                 arguments TEXT,
                 result TEXT,
+                result_encoding TEXT,
                 success BOOLEAN,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
             )
         """)
+        self._add_column(cursor, "tool_executions", "result_encoding", "TEXT")
+        
+        # Create response cache table (for opt-in caching of model responses)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
         
         # Create indexes for better performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id)")
+        # Composite index serves both session filtering and keyset pagination by id
+        cursor.execute("DROP INDEX IF EXISTS idx_messages_session_id")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_id_id ON messages(session_id, id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_tool_executions_session_id ON tool_executions(session_id)")
         
+        self._create_search_index(cursor)
+        
         self.conn.commit()
     
+    def _create_search_index(self, cursor):
+        """Create the full-text index over messages
+        
+        The index keeps its own copy of each message's plain text. Triggers
+        index uncompressed rows and drop deleted ones; save_message indexes
+        compressed rows itself. Nothing in the schema calls an application
+        function, so any SQLite client can write and delete messages.
+        """
+        existing = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone()
+        
+        # Older versions read the text through an external-content table,
+        # which needed Alang's decompression function in every connection
+        if existing and "content_rowid" in existing["sql"]:
+            for trigger in ("messages_fts_insert", "messages_fts_delete", "messages_fts_update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE messages_fts")
+            cursor.execute("DROP VIEW IF EXISTS messages_text")
+            existing = None
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                    content,
+                    tokenize = 'porter unicode61'
+                )
+            """)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to a LIKE scan
+            self.fts_enabled = False
+            return
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+            WHEN new.encoding IS NULL BEGIN
+                INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                DELETE FROM messages_fts WHERE rowid = old.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content, encoding ON messages BEGIN
+                DELETE FROM messages_fts WHERE rowid = old.id;
+                INSERT INTO messages_fts (rowid, content)
+                SELECT new.id, new.content WHERE new.encoding IS NULL;
+            END
+        """)
+        
+        # Index messages saved before the search index existed
+        if not existing:
+            cursor.execute(
+                "INSERT INTO messages_fts (rowid, content) SELECT id, content FROM messages WHERE encoding IS NULL"
+            )
+            rows = cursor.execute("SELECT id, content, encoding FROM messages WHERE encoding IS NOT NULL").fetchall()
+            for row in rows:
+                try:
+                    text = decompress_text(row["content"], row["encoding"])
+                except (RuntimeError, ValueError, zlib.error) as e:
+                    self.logger.warning(f"Message {row['id']} left out of the search index: {e}")
+                    continue
+                cursor.execute("INSERT INTO messages_fts (rowid, content) VALUES (?, ?)", (row["id"], text))
+        
+        self.fts_enabled = True
+    
+    def _add_column(self, cursor, table: str, column: str, definition: str):
+        """Add a column to a table created by an older version, if missing"""
+        columns = [row["name"] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
     def create_session(self, name: str) -> int:
         """Create a new session
         
@@ -85,13 +399,14 @@ class Database:
         Returns:
             Session ID
         """
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO sessions (name) VALUES (?)",
-            (name,)
-        )
-        self.conn.commit()
-        return cursor.lastrowid
+        def write(conn):
+            cursor = conn.execute(
+                "INSERT INTO sessions (name) VALUES (?)",
+                (name,)
+            )
+            return cursor.lastrowid
+        
+        return self.writer.submit(write).result()
     
     def get_sessions(self) -> List[Dict[str, Any]]:
         """Get all sessions
@@ -142,6 +457,35 @@ class Database:
             }
         return None
     
+    def claim_empty_session(self, grace_minutes: int = EMPTY_SESSION_GRACE_MINUTES) -> Optional[int]:
+        """Take over the most recently used session left empty by an earlier launch
+        
+        Only sessions untouched for grace_minutes qualify, and the claim
+        stamps updated_at in the same transaction that finds the session, so
+        two instances starting at once never take the same one.
+        
+        Args:
+            grace_minutes: Minutes a session must have been idle
+            
+        Returns:
+            Session ID or None
+        """
+        def write(conn):
+            row = conn.execute("""
+                SELECT id FROM sessions s
+                WHERE NOT EXISTS (SELECT 1 FROM messages m WHERE m.session_id = s.id)
+                  AND NOT EXISTS (SELECT 1 FROM tool_executions t WHERE t.session_id = s.id)
+                  AND updated_at < datetime('now', ?)
+                ORDER BY updated_at DESC, id DESC
+                LIMIT 1
+            """, (f"-{grace_minutes} minutes",)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (row["id"],))
+            return row["id"]
+        
+        return self.writer.submit(write).result()
+    
     def update_session(self, session_id: int, name: str) -> bool:
         """Update session name
         
@@ -152,13 +496,14 @@ class Database:
         Returns:
             True if successful, False otherwise
         """
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "UPDATE sessions SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (name, session_id)
-        )
-        self.conn.commit()
-        return cursor.rowcount > 0
+        def write(conn):
+            cursor = conn.execute(
+                "UPDATE sessions SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (name, session_id)
+            )
+            return cursor.rowcount > 0
+        
+        return self.writer.submit(write).result()
     
     def delete_session(self, session_id: int) -> bool:
         """Delete a session and all its messages
@@ -169,73 +514,197 @@ class Database:
         Returns:
             True if successful, False otherwise
         """
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-        self.conn.commit()
-        return cursor.rowcount > 0
+        def write(conn):
+            cursor = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            return cursor.rowcount > 0
+        
+        return self.writer.submit(write).result()
     
-    def save_message(self, session_id: int, role: str, content: str) -> int:
+    def save_message(self, session_id: int, role: str, content: str, wait: bool = True) -> Optional[int]:
         """Save a message
         
         Args:
             session_id: Session ID
             role: Message role (user/assistant/system)
             content: Message content
+            wait: Wait for the commit; pass False to queue the write and return at once
             
         Returns:
-            Message ID
+            Message ID, or None when not waiting
         """
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
-            (session_id, role, content)
-        )
+        stored, encoding = compress_text(content, self.compress_threshold)
         
-        # Update session timestamp
-        cursor.execute(
-            "UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (session_id,)
-        )
+        def write(conn):
+            cursor = conn.execute(
+                "INSERT INTO messages (session_id, role, content, encoding) VALUES (?, ?, ?, ?)",
+                (session_id, role, stored, encoding)
+            )
+            
+            # The index trigger only sees plain rows; compressed ones are indexed here
+            if encoding and self.fts_enabled:
+                conn.execute(
+                    "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+                    (cursor.lastrowid, content)
+                )
+            
+            # Update session timestamp
+            conn.execute(
+                "UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (session_id,)
+            )
+            return cursor.lastrowid
         
-        self.conn.commit()
-        return cursor.lastrowid
+        if not wait:
+            self._submit_unwaited(write, f"{role} message for session {session_id}")
+            return None
+        return self.writer.submit(write).result()
     
     def get_messages(self, session_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get messages for a session
         
         Args:
             session_id: Session ID
-            limit: Optional limit on number of messages
+            limit: Optional limit; keeps the most recent messages
             
         Returns:
-            List of message dictionaries
+            List of message dictionaries, oldest first
         """
-        cursor = self.conn.cursor()
+        if limit:
+            messages = list(itertools.islice(self.iter_messages(session_id, page_size=limit), limit))
+            messages.reverse()
+            return messages
         
-        query = """
-            SELECT id, role, content, timestamp 
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id, role, content, encoding, timestamp 
             FROM messages 
             WHERE session_id = ? 
-            ORDER BY timestamp ASC
+            ORDER BY id ASC
+        """, (session_id,))
+        
+        messages = []
+        for row in cursor.fetchall():
+            messages.append(self._message_from_row(row))
+        
+        return messages
+    
+    def iter_messages(self, session_id: int, before_id: Optional[int] = None,
+                      page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """Iterate over a session's messages from newest to oldest
+        
+        Pages are fetched lazily with keyset pagination on the (session_id, id)
+        index, so reaching the latest messages costs the same however long the
+        session is, and only one page is held in memory at a time.
+        
+        Args:
+            session_id: Session ID
+            before_id: Only yield messages older than this message ID
+            page_size: Number of rows fetched per query
+            
+        Yields:
+            Message dictionaries, newest first
+        """
+        while True:
+            cursor = self.conn.cursor()
+            if before_id is None:
+                cursor.execute("""
+                    SELECT id, role, content, encoding, timestamp 
+                    FROM messages 
+                    WHERE session_id = ? 
+                    ORDER BY id DESC 
+                    LIMIT ?
+                """, (session_id, page_size))
+            else:
+                cursor.execute("""
+                    SELECT id, role, content, encoding, timestamp 
+                    FROM messages 
+                    WHERE session_id = ? AND id < ? 
+                    ORDER BY id DESC 
+                    LIMIT ?
+                """, (session_id, before_id, page_size))
+            
+            rows = cursor.fetchall()
+            for row in rows:
+                yield self._message_from_row(row)
+            
+            if len(rows) < page_size:
+                return
+            before_id = rows[-1]["id"]
+    
+    def _message_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a messages row to a dictionary"""
+        return {
+            "id": row["id"],
+            "role": row["role"],
+            "content": decompress_text(row["content"], row["encoding"]),
+            "timestamp": row["timestamp"]
+        }
+    
+    def search_messages(self, query: str, session_id: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Search message history
+        
+        Args:
+            query: Words to search for; a trailing * matches any word with that prefix
+            session_id: Optional session to restrict the search to
+            limit: Maximum number of results
+            
+        Returns:
+            List of matching message dictionaries, best match first, each with a
+            'snippet' of the content around the match
         """
+        cursor = self.conn.cursor()
         
-        if limit:
-            query += f" LIMIT {limit}"
+        if self.fts_enabled:
+            terms = []
+            for word in query.split():
+                prefix = word.endswith("*")
+                word = word.rstrip("*").replace('"', '""')
+                if word:
+                    # Quote each word so punctuation can't be read as FTS syntax
+                    terms.append(f'"{word}"*' if prefix else f'"{word}"')
+            if not terms:
+                return []
+            
+            sql = """
+                SELECT m.id, m.session_id, m.role, m.timestamp,
+                       snippet(messages_fts, 0, '**', '**', '…', 16) AS snippet
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ?
+            """
+            params: List[Any] = [" ".join(terms)]
+        else:
+            sql = """
+                SELECT m.id, m.session_id, m.role, m.timestamp,
+                       substr(alang_text(m.content, m.encoding), 1, 200) AS snippet
+                FROM messages m
+                WHERE alang_text(m.content, m.encoding) LIKE ?
+            """
+            params = [f"%{query}%"]
         
-        cursor.execute(query, (session_id,))
+        if session_id is not None:
+            sql += " AND m.session_id = ?"
+            params.append(session_id)
         
-        messages = []
+        sql += " ORDER BY rank LIMIT ?" if self.fts_enabled else " ORDER BY m.id DESC LIMIT ?"
+        params.append(limit)
+        
+        cursor.execute(sql, params)
+        
+        results = []
         for row in cursor.fetchall():
-            messages.append({
+            results.append({
                 "id": row["id"],
+                "session_id": row["session_id"],
                 "role": row["role"],
-                "content": row["content"],
+                "snippet": row["snippet"],
                 "timestamp": row["timestamp"]
             })
         
-        return messages
+        return results
     
-    def save_tool_execution(self, session_id: int, tool_name: str, arguments: Dict, result: Dict, success: bool) -> int:
+    def save_tool_execution(self, session_id: int, tool_name: str, arguments: Dict, result: Dict, success: bool,
+                            wait: bool = True) -> Optional[int]:
         """Save a tool execution record
         
         Args:
@@ -244,32 +713,40 @@ class Database:
             arguments: Tool arguments
             result: Tool execution result
             success: Whether the execution was successful
+            wait: Wait for the commit; pass False to queue the write and return at once
             
         Returns:
-            Tool execution ID
+            Tool execution ID, or None when not waiting
         """
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """INSERT INTO tool_executions 
-               (session_id, tool_name, arguments, result, success) 
-               VALUES (?, ?, ?, ?, ?)""",
-            (
-                session_id,
-                tool_name,
-                json.dumps(arguments),
-                json.dumps(result),
-                success
-            )
-        )
+        arguments_json = json.dumps(arguments)
+        result_json, result_encoding = compress_text(json.dumps(result), self.compress_threshold)
         
-        # Update session timestamp
-        cursor.execute(
-            "UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (session_id,)
-        )
+        def write(conn):
+            cursor = conn.execute(
+                """INSERT INTO tool_executions 
+                   (session_id, tool_name, arguments, result, result_encoding, success) 
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (
+                    session_id,
+                    tool_name,
+                    arguments_json,
+                    result_json,
+                    result_encoding,
+                    success
+                )
+            )
+            
+            # Update session timestamp
+            conn.execute(
+                "UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (session_id,)
+            )
+            return cursor.lastrowid
         
-        self.conn.commit()
-        return cursor.lastrowid
+        if not wait:
+            self._submit_unwaited(write, f"{tool_name} call for session {session_id}")
+            return None
+        return self.writer.submit(write).result()
     
     def get_tool_executions(self, session_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get tool executions for a session
@@ -284,16 +761,18 @@ class Database:
         cursor = self.conn.cursor()
         
         query = """
-            SELECT id, tool_name, arguments, result, success, timestamp 
+            SELECT id, tool_name, arguments, result, result_encoding, success, timestamp 
             FROM tool_executions 
             WHERE session_id = ? 
-            ORDER BY timestamp DESC
+            ORDER BY id DESC
         """
+        params: List[Any] = [session_id]
         
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params.append(limit)
         
-        cursor.execute(query, (session_id,))
+        cursor.execute(query, params)
         
         executions = []
         for row in cursor.fetchall():
@@ -301,13 +780,178 @@ class Database:
                 "id": row["id"],
                 "tool_name": row["tool_name"],
                 "arguments": json.loads(row["arguments"]),
-                "result": json.loads(row["result"]),
+                "result": json.loads(decompress_text(row["result"], row["result_encoding"])),
                 "success": row["success"],
                 "timestamp": row["timestamp"]
             })
         
         return executions
     
+    def get_cached_response(self, key: str) -> Optional[str]:
+        """Get a cached model response
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached response text or None
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT response FROM response_cache WHERE key = ?", (key,))
+        
+        row = cursor.fetchone()
+        return row["response"] if row else None
+    
+    def save_cached_response(self, key: str, response: str) -> None:
+        """Save a model response to the cache
+        
+        Args:
+            key: Cache key
+            response: Response text
+        """
+        def write(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, response) VALUES (?, ?)",
+                (key, response)
+            )
+        
+        self._submit_unwaited(write, "cached response")
+    
+    def clear_response_cache(self) -> None:
+        """Remove all cached model responses"""
+        self.writer.submit(lambda conn: conn.execute("DELETE FROM response_cache")).result()
+    
+    def compact(self, max_age_days: int = 0, max_sessions: int = 0, archive_path: Optional[Path] = None,
+                keep_session_id: Optional[int] = None, vacuum: bool = True,
+                empty_grace_minutes: int = EMPTY_SESSION_GRACE_MINUTES) -> Dict[str, Any]:
+        """Apply the retention policy and reclaim disk space
+        
+        Removes sessions without messages that have been idle for
+        empty_grace_minutes, sessions not updated within max_age_days and all
+        but the max_sessions most recent sessions. Removed sessions that have
+        messages are first copied to archive_path, if given.
+        
+        Args:
+            max_age_days: Remove sessions idle for longer than this (0 keeps all)
+            max_sessions: Keep at most this many sessions (0 keeps all)
+            archive_path: Optional SQLite file receiving removed sessions
+            keep_session_id: Session that is never removed, e.g. the one in use
+            vacuum: Return freed pages to the filesystem afterwards
+            empty_grace_minutes: Minutes an empty session is kept, since another
+                running instance may have just opened it
+            
+        Returns:
+            Dictionary with counts of removed and archived rows and bytes reclaimed
+        """
+        def write(conn):
+            size_before = self.db_path.stat().st_size if self.db_path.exists() else 0
+            
+            # ATTACH is not allowed inside a transaction, so it comes first and
+            # the archive copy commits or rolls back with the deletes
+            if archive_path:
+                conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS compact_ids (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM compact_ids")
+                
+                # Sessions that never got a message and no instance has touched lately
+                conn.execute("""
+                    INSERT OR IGNORE INTO compact_ids
+                    SELECT id FROM sessions s
+                    WHERE NOT EXISTS (SELECT 1 FROM messages m WHERE m.session_id = s.id)
+                      AND NOT EXISTS (SELECT 1 FROM tool_executions t WHERE t.session_id = s.id)
+                      AND updated_at < datetime('now', ?)
+                """, (f"-{empty_grace_minutes} minutes",))
+                if max_age_days > 0:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO compact_ids SELECT id FROM sessions WHERE updated_at < datetime('now', ?)",
+                        (f"-{max_age_days} days",)
+                    )
+                    conn.execute(
+                        "DELETE FROM response_cache WHERE created_at < datetime('now', ?)",
+                        (f"-{max_age_days} days",)
+                    )
+                if max_sessions > 0:
+                    conn.execute("""
+                        INSERT OR IGNORE INTO compact_ids
+                        SELECT id FROM sessions ORDER BY updated_at DESC, id DESC LIMIT -1 OFFSET ?
+                    """, (max_sessions,))
+                if keep_session_id is not None:
+                    conn.execute("DELETE FROM compact_ids WHERE id = ?", (keep_session_id,))
+                
+                archived = 0
+                if archive_path:
+                    archived = self._archive_sessions(conn)
+                
+                messages_removed = conn.execute(
+                    "DELETE FROM messages WHERE session_id IN (SELECT id FROM compact_ids)"
+                ).rowcount
+                tool_executions_removed = conn.execute(
+                    "DELETE FROM tool_executions WHERE session_id IN (SELECT id FROM compact_ids)"
+                ).rowcount
+                sessions_removed = conn.execute(
+                    "DELETE FROM sessions WHERE id IN (SELECT id FROM compact_ids)"
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                if archive_path:
+                    conn.execute("DETACH DATABASE archive")
+            
+            if vacuum:
+                if self.fts_enabled:
+                    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+                if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                    # The pragma frees pages one step at a time, so drain it
+                    conn.execute("PRAGMA incremental_vacuum").fetchall()
+                else:
+                    # One-off full rebuild switches files created before
+                    # incremental auto-vacuum was enabled
+                    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            
+            size_after = self.db_path.stat().st_size if self.db_path.exists() else 0
+            return {
+                "sessions_removed": sessions_removed,
+                "sessions_archived": archived,
+                "messages_removed": messages_removed,
+                "tool_executions_removed": tool_executions_removed,
+                "bytes_reclaimed": max(0, size_before - size_after)
+            }
+        
+        return self.writer.submit(write, transactional=False).result()
+    
+    def _archive_sessions(self, conn: sqlite3.Connection) -> int:
+        """Copy the sessions listed in compact_ids, with their rows, to the attached archive
+        
+        Returns:
+            Number of archived sessions
+        """
+        for table in ("sessions", "messages", "tool_executions"):
+            conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+        
+        # Sessions without messages aren't worth keeping
+        archived = conn.execute("""
+            INSERT INTO archive.sessions
+            SELECT * FROM main.sessions
+            WHERE id IN (SELECT id FROM compact_ids)
+              AND EXISTS (SELECT 1 FROM main.messages m WHERE m.session_id = sessions.id)
+        """).rowcount
+        conn.execute("""
+            INSERT INTO archive.messages
+            SELECT * FROM main.messages WHERE session_id IN (SELECT id FROM compact_ids)
+        """)
+        conn.execute("""
+            INSERT INTO archive.tool_executions
+            SELECT * FROM main.tool_executions WHERE session_id IN (SELECT id FROM compact_ids)
+        """)
+        return archived
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics
         
@@ -347,10 +991,38 @@ class Database:
             }
         }
     
+    def _submit_unwaited(self, write: Callable[[sqlite3.Connection], Any], description: str) -> None:
+        """Queue a write nobody waits for, logging and reporting it if it fails
+        
+        Args:
+            write: Function applying the write to a connection
+            description: What is being saved, for the error report
+        """
+        def report(future: Future) -> None:
+            error = None if future.cancelled() else future.exception()
+            if error is None:
+                return
+            self.logger.error(f"Failed to save {description}: {error}")
+            if self.on_write_error:
+                try:
+                    self.on_write_error(description, error)
+                except Exception as e:
+                    self.logger.warning(f"Failed to report write error: {e}")
+        
+        self.writer.submit(write).add_done_callback(report)
+    
+    def flush(self) -> None:
+        """Wait until all queued writes are committed and visible to reads"""
+        self.writer.flush()
+    
     def close(self):
         """Close database connection"""
+        if self.writer:
+            self.writer.close()
+            self.writer = None
         if self.conn:
             self.conn.close()
+            self.conn = None
     
     def __del__(self):
         """Cleanup on deletion"""
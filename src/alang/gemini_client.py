@@ -2,25 +2,123 @@
 Gemini API client for Alang
 """
 
-import google.genai as genai
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, List, Dict, Optional, Tuple
+import asyncio
+import itertools
 import logging
+import time
+
+from .cache import ResponseCache
+from .retry import RateLimiter, RetryPolicy
+from .tools import ToolRegistry
+
+
+# Shown when the model still wants tools after max_tool_rounds
+TOOL_LIMIT_MESSAGE = (
+    "I reached the limit of {rounds} rounds of tool calls before finishing. "
+    "Ask me to continue, or narrow the request."
+)
+
+
+class ConversationHistory:
+    """Conversation turns kept within an approximate token budget"""
+    
+    def __init__(self, max_tokens: int = 32000):
+        """Initialize conversation history
+        
+        Args:
+            max_tokens: Token budget for the history sent with each request
+        """
+        self.max_tokens = max_tokens
+        self.messages: List[Dict] = []
+        self._token_counts: List[int] = []
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Estimate the token count of text (roughly four characters per token)"""
+        return len(text) // 4 + 1
+    
+    def add_turn(self, message: str, response: str) -> None:
+        """Record a completed user/model exchange
+        
+        Args:
+            message: User message
+            response: Model response
+        """
+        self._append("user", message)
+        self._append("assistant", response)
+        self._trim()
+    
+    def load(self, messages: List[Dict]) -> None:
+        """Replace the history with stored messages, e.g. from Database.get_messages
+        
+        Args:
+            messages: Message dictionaries with 'role' and 'content' keys
+        """
+        self.clear()
+        for msg in messages:
+            if msg["role"] in ("user", "assistant"):
+                self._append(msg["role"], msg["content"])
+        self._trim()
+    
+    def clear(self) -> None:
+        """Remove all turns"""
+        self.messages = []
+        self._token_counts = []
+    
+    def token_count(self) -> int:
+        """Get the estimated token count of the whole history"""
+        return sum(self._token_counts)
+    
+    def _append(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+        self._token_counts.append(self.estimate_tokens(content))
+    
+    def _trim(self) -> None:
+        """Drop the oldest turns until the history fits the token budget
+        
+        The opening exchange usually states the task, so it is kept along
+        with the latest exchange; turns in between go oldest first.
+        """
+        total = self.token_count()
+        opening = 2 if [msg["role"] for msg in self.messages[:2]] == ["user", "assistant"] else 0
+        while total > self.max_tokens and len(self.messages) > opening + 2:
+            # Drop a whole exchange so user and model turns still alternate
+            drop = 2 if self.messages[opening]["role"] == "user" else 1
+            total -= sum(self._token_counts[opening:opening + drop])
+            del self.messages[opening:opening + drop]
+            del self._token_counts[opening:opening + drop]
 
 
 class GeminiClient:
     """Client for interacting with Google Gemini API"""
     
-    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash"):
+    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash", max_history_tokens: int = 32000,
+                 response_cache: Optional[ResponseCache] = None, context_cache_ttl: int = 3600,
+                 max_retries: int = 3, requests_per_minute: int = 0,
+                 tool_registry: Optional[ToolRegistry] = None, tool_mode: str = "read-only",
+                 max_tool_rounds: int = 8):
         """Initialize Gemini client
         
         Args:
             api_key: Google Gemini API key
             model: Model name to use
+            max_history_tokens: Token budget for tracked conversation history
+            response_cache: Optional cache for responses to identical requests
+            context_cache_ttl: Lifetime in seconds of server-side cached pinned context
+            max_retries: Retries for rate-limited or failed requests
+            requests_per_minute: Client-side request rate limit (0 disables it)
+            tool_registry: Tools the model may call; None disables function calling
+            tool_mode: "read-only", "all" or "off", see ToolRegistry.get_declarations
+            max_tool_rounds: Maximum model turns spent calling tools per message
         """
         self.api_key = api_key
         self.model_name = model
         
         # Configure the API
+        # The SDK takes a large share of startup time, so it is loaded with the first client
+        import google.genai as genai
         self.client = genai.Client(api_key=api_key)
         
         # Initialize the model
@@ -34,6 +132,29 @@ class GeminiClient:
             "max_output_tokens": 8192,
         }
         
+        # Conversation history sent with requests that don't pass their own
+        self.history = ConversationHistory(max_history_tokens)
+        
+        self.response_cache = response_cache
+        
+        # Pinned context, cached server-side when the API accepts it
+        self.pinned_contents: List[Dict] = []
+        self.context_cache_ttl = context_cache_ttl
+        self.cached_content: Optional[str] = None
+        self._cached_content_expires = 0.0
+        
+        # Retries and a rate limiter shared by every caller of this client
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute > 0 else None
+        
+        # Function calling: the model's tool calls are run locally and fed back
+        self.tool_registry = tool_registry
+        self.tool_mode = tool_mode
+        self.max_tool_rounds = max_tool_rounds
+        self.tool_declarations = tool_registry.get_declarations(tool_mode) if tool_registry else []
+        # Called with (tool name, arguments, result) after every tool execution
+        self.on_tool_execution: Optional[Callable[[str, Dict, Dict], None]] = None
+        
         self.logger = logging.getLogger(__name__)
     
     def generate_response(self, message: str, history: Optional[List[Dict]] = None) -> str:
@@ -41,39 +162,31 @@ class GeminiClient:
         
         Args:
             message: User message
-            history: Optional conversation history
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used and the new turn is recorded
             
         Returns:
             Generated response text
         """
         try:
-            # Create contents list
-            contents = []
-            
-            # Add history if provided
-            if history:
-                for msg in history:
-                    role = "user" if msg["role"] == "user" else "model"
-                    contents.append({
-                        "role": role,
-                        "parts": [{"text": msg["content"]}]
-                    })
-            
-            # Add current message
-            contents.append({
-                "role": "user",
-                "parts": [{"text": message}]
-            })
+            self._ensure_context_cache()
+            contents = self._build_contents(message, history)
+            request_length = len(contents)
             
-            # Generate response using the new API
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=contents,
-                config=self.config
-            )
+            cache_key, cached = self._cache_lookup(contents)
+            if cached is not None:
+                if history is None:
+                    self.history.add_turn(message, cached)
+                return cached
+            
+            # Generate response using the new API, running any tool calls
+            response_text = self._generate(contents)
             
-            if response.text:
-                return response.text
+            if response_text:
+                if history is None:
+                    self.history.add_turn(message, response_text)
+                self._cache_store(cache_key, response_text, used_tools=len(contents) > request_length)
+                return response_text
             else:
                 return "I apologize, but I couldn't generate a response. Please try again."
                 
@@ -81,20 +194,513 @@ class GeminiClient:
             self.logger.error(f"Error generating response: {e}")
             return f"Error: {str(e)}"
     
+    def stream_response(self, message: str, history: Optional[List[Dict]] = None) -> Iterator[str]:
+        """Generate a response from Gemini, yielding text chunks as they arrive
+        
+        Args:
+            message: User message
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used and the new turn is recorded
+            
+        Yields:
+            Response text chunks
+        """
+        parts = []
+        try:
+            self._ensure_context_cache()
+            contents = self._build_contents(message, history)
+            request_length = len(contents)
+            
+            cache_key, cached = self._cache_lookup(contents)
+            if cached is not None:
+                if history is None:
+                    self.history.add_turn(message, cached)
+                yield cached
+                return
+            
+            for text in self._stream(contents):
+                parts.append(text)
+                yield text
+                    
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {e}")
+            yield f"\n\nError: {str(e)}" if parts else f"Error: {str(e)}"
+            return
+        
+        if not parts:
+            yield "I apologize, but I couldn't generate a response. Please try again."
+            return
+        
+        response_text = "".join(parts)
+        if history is None:
+            self.history.add_turn(message, response_text)
+        self._cache_store(cache_key, response_text, used_tools=len(contents) > request_length)
+    
+    async def agenerate_response(self, message: str, history: Optional[List[Dict]] = None,
+                                 raise_errors: bool = False) -> str:
+        """Generate a response from Gemini without blocking the event loop
+        
+        Uses the SDK's async surface, which shares this client's HTTP
+        connection pool, so many requests can be in flight at once.
+        
+        Args:
+            message: User message
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used and the new turn is recorded
+            raise_errors: Raise API errors instead of returning them as text
+            
+        Returns:
+            Generated response text
+        """
+        try:
+            await self._aensure_context_cache()
+            contents = self._build_contents(message, history)
+            request_length = len(contents)
+            
+            cache_key, cached = self._cache_lookup(contents)
+            if cached is not None:
+                if history is None:
+                    self.history.add_turn(message, cached)
+                return cached
+            
+            response_text = await self._agenerate(contents)
+            
+            if response_text:
+                if history is None:
+                    self.history.add_turn(message, response_text)
+                self._cache_store(cache_key, response_text, used_tools=len(contents) > request_length)
+                return response_text
+            else:
+                return "I apologize, but I couldn't generate a response. Please try again."
+                
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            if raise_errors:
+                raise
+            return f"Error: {str(e)}"
+    
+    async def astream_response(self, message: str, history: Optional[List[Dict]] = None,
+                               raise_errors: bool = False) -> AsyncIterator[str]:
+        """Async variant of stream_response for use on an event loop
+        
+        Args:
+            message: User message
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used and the new turn is recorded
+            raise_errors: Raise API errors instead of yielding them as text
+            
+        Yields:
+            Response text chunks
+        """
+        parts = []
+        try:
+            await self._aensure_context_cache()
+            contents = self._build_contents(message, history)
+            request_length = len(contents)
+            
+            cache_key, cached = self._cache_lookup(contents)
+            if cached is not None:
+                if history is None:
+                    self.history.add_turn(message, cached)
+                yield cached
+                return
+            
+            async for text in self._astream(contents):
+                parts.append(text)
+                yield text
+                    
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {e}")
+            if raise_errors:
+                raise
+            yield f"\n\nError: {str(e)}" if parts else f"Error: {str(e)}"
+            return
+        
+        if not parts:
+            yield "I apologize, but I couldn't generate a response. Please try again."
+            return
+        
+        response_text = "".join(parts)
+        if history is None:
+            self.history.add_turn(message, response_text)
+        self._cache_store(cache_key, response_text, used_tools=len(contents) > request_length)
+    
+    def _generate(self, contents: List[Any]) -> Optional[str]:
+        """Send a request, running the model's tool calls until it answers in text
+        
+        The last of max_tool_rounds + 1 requests forbids further calls, so
+        the model has to answer with what it has gathered.
+        
+        Args:
+            contents: Request contents; tool turns are appended to it
+        
+        Returns:
+            The final response text
+        """
+        for round_number in range(self.max_tool_rounds + 1):
+            final = round_number == self.max_tool_rounds
+            response = self.retry_policy.call(
+                self.client.models.generate_content,
+                model=self.model,
+                contents=contents,
+                config=self._request_config(allow_calls=not final),
+                limiter=self.rate_limiter
+            )
+            calls = self._function_calls(response)
+            if not calls:
+                return _response_text(response)
+            if final:
+                return self._tool_limit_text(_response_text(response))
+            contents.append(response.candidates[0].content)
+            contents.append(self._call_tools(calls))
+    
+    async def _agenerate(self, contents: List[Any]) -> Optional[str]:
+        """Async variant of _generate; tools run in a worker thread"""
+        for round_number in range(self.max_tool_rounds + 1):
+            final = round_number == self.max_tool_rounds
+            response = await self.retry_policy.acall(
+                self.client.aio.models.generate_content,
+                model=self.model,
+                contents=contents,
+                config=self._request_config(allow_calls=not final),
+                limiter=self.rate_limiter
+            )
+            calls = self._function_calls(response)
+            if not calls:
+                return _response_text(response)
+            if final:
+                return self._tool_limit_text(_response_text(response))
+            contents.append(response.candidates[0].content)
+            contents.append(await asyncio.to_thread(self._call_tools, calls))
+    
+    def _stream(self, contents: List[Any]) -> Iterator[str]:
+        """Stream a request's text, running the model's tool calls between rounds
+        
+        Args:
+            contents: Request contents; tool turns are appended to it
+        
+        Yields:
+            Response text chunks from every round
+        """
+        streamed = False
+        for round_number in range(self.max_tool_rounds + 1):
+            final = round_number == self.max_tool_rounds
+            first, stream = self.retry_policy.call(
+                self._open_stream, contents, not final, limiter=self.rate_limiter
+            )
+            calls, model_parts = [], []
+            for chunk in itertools.chain([first] if first else [], stream):
+                text = _response_text(chunk)
+                if text:
+                    streamed = True
+                    yield text
+                calls.extend(self._function_calls(chunk))
+                model_parts.extend(_response_parts(chunk))
+            
+            if not calls:
+                return
+            if final:
+                yield ("\n\n" if streamed else "") + self._tool_limit_text(None)
+                return
+            contents.append(_model_content(model_parts))
+            contents.append(self._call_tools(calls))
+    
+    async def _astream(self, contents: List[Any]) -> AsyncIterator[str]:
+        """Async variant of _stream; tools run in a worker thread"""
+        streamed = False
+        for round_number in range(self.max_tool_rounds + 1):
+            final = round_number == self.max_tool_rounds
+            first, stream = await self.retry_policy.acall(
+                self._aopen_stream, contents, not final, limiter=self.rate_limiter
+            )
+            calls, model_parts = [], []
+            async for chunk in _prepend(first, stream):
+                text = _response_text(chunk)
+                if text:
+                    streamed = True
+                    yield text
+                calls.extend(self._function_calls(chunk))
+                model_parts.extend(_response_parts(chunk))
+            
+            if not calls:
+                return
+            if final:
+                yield ("\n\n" if streamed else "") + self._tool_limit_text(None)
+                return
+            contents.append(_model_content(model_parts))
+            contents.append(await asyncio.to_thread(self._call_tools, calls))
+    
+    def _tool_limit_text(self, text: Optional[str]) -> str:
+        """Get the answer for a model that still wants tools after the last round
+        
+        Calls can only be forbidden outright when tools are declared per
+        request; declarations inside cached context always allow them.
+        """
+        self.logger.warning(f"Model still calling tools after {self.max_tool_rounds} rounds")
+        notice = TOOL_LIMIT_MESSAGE.format(rounds=self.max_tool_rounds)
+        return f"{text}\n\n{notice}" if text else notice
+    
+    def _function_calls(self, response: Any) -> List[Any]:
+        """Get the function calls in a response or chunk, if tools are enabled"""
+        if not self.tool_declarations:
+            return []
+        return getattr(response, "function_calls", None) or []
+    
+    def _call_tools(self, calls: List[Any]) -> Dict:
+        """Run the model's function calls and build the turn carrying their results
+        
+        Independent calls from one model turn run concurrently and all their
+        results go back to the model in a single request.
+        
+        Args:
+            calls: FunctionCall objects from one model turn
+        
+        Returns:
+            User content with one function response part per call
+        """
+        requests = [(call.name, dict(call.args or {})) for call in calls]
+        results: List[Dict] = [{}] * len(requests)
+        
+        allowed = [i for i, (name, _) in enumerate(requests) if self.tool_registry.is_allowed(name, self.tool_mode)]
+        for i, result in zip(allowed, self.tool_registry.execute_calls([requests[i] for i in allowed])):
+            results[i] = result
+        
+        parts = []
+        for i, (call, (name, args)) in enumerate(zip(calls, requests)):
+            if i not in allowed:
+                results[i] = {"success": False, "error": f"Tool '{name}' is not available"}
+            self.logger.debug(f"Tool call {name}({args}) -> success={results[i].get('success')}")
+            
+            if self.on_tool_execution:
+                try:
+                    self.on_tool_execution(name, args, results[i])
+                except Exception as e:
+                    self.logger.warning(f"Failed to record tool execution: {e}")
+            
+            parts.append({
+                "function_response": {
+                    "id": call.id,
+                    "name": name,
+                    "response": results[i]
+                }
+            })
+        
+        return {"role": "user", "parts": parts}
+    
+    def _open_stream(self, contents: List[Dict], allow_calls: bool = True) -> Tuple[Any, Iterator[Any]]:
+        """Start a streaming request and wait for its first chunk
+        
+        Errors such as rate limiting surface before the first chunk, so
+        retrying this call never repeats text already shown to the user.
+        """
+        stream = iter(self.client.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=self._request_config(allow_calls)
+        ))
+        return next(stream, None), stream
+    
+    async def _aopen_stream(self, contents: List[Dict], allow_calls: bool = True) -> Tuple[Any, AsyncIterator[Any]]:
+        """Async variant of _open_stream"""
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=self._request_config(allow_calls)
+        )
+        stream = stream.__aiter__()
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return first, stream
+    
+    async def aclose(self) -> None:
+        """Close the async HTTP connection pool"""
+        await asyncio.to_thread(self._delete_context_cache)
+        await self.client.aio.aclose()
+    
+    def pin_context(self, text: str, label: str = "") -> None:
+        """Pin a block of text as context for every following request
+        
+        The pinned blocks are uploaded once as server-side cached content, so
+        later turns reference the cache instead of re-sending the tokens. If the
+        API rejects the cache (e.g. the context is below the model's minimum
+        cacheable size) the blocks are sent inline with each request instead.
+        
+        Args:
+            text: Text to pin
+            label: Optional label, such as the file name
+        """
+        if label:
+            text = f"Pinned context: {label}\n\n{text}"
+        self.pinned_contents.append({
+            "role": "user",
+            "parts": [{"text": text}]
+        })
+        self._refresh_context_cache()
+    
+    def pin_file(self, path: str) -> None:
+        """Pin the contents of a file as context
+        
+        Args:
+            path: Path to the file
+        """
+        self.pin_context(Path(path).read_text(encoding="utf-8"), label=path)
+    
+    def unpin_all(self) -> None:
+        """Remove all pinned context and its server-side cache"""
+        self.pinned_contents = []
+        self._delete_context_cache()
+    
+    def _refresh_context_cache(self) -> None:
+        """(Re)create the server-side cache for the pinned contents"""
+        self._delete_context_cache()
+        if not self.pinned_contents:
+            return
+        
+        try:
+            cache = self.client.caches.create(
+                model=self.model,
+                config={
+                    "contents": self.pinned_contents,
+                    "ttl": f"{self.context_cache_ttl}s",
+                    "display_name": "alang-pinned-context",
+                    **({"tools": [{"function_declarations": self.tool_declarations}]} if self.tool_declarations else {})
+                }
+            )
+            self.cached_content = cache.name
+            self._cached_content_expires = time.monotonic() + self.context_cache_ttl
+        except Exception as e:
+            self.logger.warning(f"Context caching unavailable, sending pinned context inline: {e}")
+    
+    def _delete_context_cache(self) -> None:
+        """Delete the server-side cache, if any"""
+        if not self.cached_content:
+            return
+        
+        name, self.cached_content = self.cached_content, None
+        try:
+            self.client.caches.delete(name=name)
+        except Exception as e:
+            self.logger.debug(f"Failed to delete cached content {name}: {e}")
+    
+    def _context_cache_expired(self) -> bool:
+        """Check whether the pinned context cache is missing or about to expire"""
+        if not self.pinned_contents or not self.cached_content:
+            return False
+        # Recreate shortly before the TTL runs out so no request hits an expired cache
+        return time.monotonic() > self._cached_content_expires - 60
+    
+    def _ensure_context_cache(self) -> None:
+        """Recreate the pinned context cache if it has expired"""
+        if self._context_cache_expired():
+            self._refresh_context_cache()
+    
+    async def _aensure_context_cache(self) -> None:
+        """Recreate the pinned context cache if it has expired, off the event loop"""
+        if self._context_cache_expired():
+            await asyncio.to_thread(self._refresh_context_cache)
+    
+    def _request_config(self, allow_calls: bool = True) -> Dict[str, Any]:
+        """Get the generation config for a request, referencing cached context
+        
+        Tool declarations travel inside the cached context when there is
+        one, since the API rejects requests that set both.
+        
+        Args:
+            allow_calls: Let the model call the declared tools; when False
+                it must answer in text
+        """
+        if self.cached_content:
+            return {**self.config, "cached_content": self.cached_content}
+        if self.tool_declarations:
+            config = {**self.config, "tools": [{"function_declarations": self.tool_declarations}]}
+            if not allow_calls:
+                config["tool_config"] = {"function_calling_config": {"mode": "NONE"}}
+            return config
+        return self.config
+    
+    def _build_contents(self, message: str, history: Optional[List[Dict]] = None) -> List[Dict]:
+        """Build the request contents from history and the new message
+        
+        Args:
+            message: User message
+            history: Optional explicit history; when omitted the tracked
+                conversation history is used
+            
+        Returns:
+            List of content dictionaries
+        """
+        contents = []
+        
+        # Pinned context goes inline when it isn't cached server-side
+        if not self.cached_content:
+            contents.extend(self.pinned_contents)
+        
+        if history is None:
+            history = self.history.messages
+        
+        # Add history
+        if history:
+            for msg in history:
+                role = "user" if msg["role"] == "user" else "model"
+                contents.append({
+                    "role": role,
+                    "parts": [{"text": msg["content"]}]
+                })
+        
+        # Add current message
+        contents.append({
+            "role": "user",
+            "parts": [{"text": message}]
+        })
+        
+        return contents
+    
+    def _cache_lookup(self, contents: List[Dict]) -> Tuple[Optional[str], Optional[str]]:
+        """Look up a request in the response cache
+        
+        Args:
+            contents: Full request contents
+            
+        Returns:
+            Tuple of (cache key, cached response); both None when caching is off
+        """
+        # With tools enabled, only answers that called no tool are ever stored
+        if not self.response_cache:
+            return None, None
+        
+        cache_key = ResponseCache.make_key(self.model, self._request_config(), contents)
+        return cache_key, self.response_cache.get(cache_key)
+    
+    def _cache_store(self, cache_key: Optional[str], response: str, used_tools: bool = False) -> None:
+        """Store a successful response under its cache key
+        
+        Answers that called tools depend on local files and commands the
+        key can't capture, so they are never stored.
+        """
+        if self.response_cache and cache_key and not used_tools:
+            self.response_cache.put(cache_key, response)
+    
     def get_conversation_history(self) -> List[Dict]:
         """Get current conversation history
         
         Returns:
             List of message dictionaries
         """
-        # For the new API, we'll need to track history differently
-        # For now, return empty list - this will be implemented when we add history tracking
-        return []
+        return list(self.history.messages)
+    
+    def load_history(self, messages: List[Dict]) -> None:
+        """Rebuild conversation history from stored messages
+        
+        Args:
+            messages: Message dictionaries, e.g. from Database.get_messages
+        """
+        self.history.load(messages)
     
     def clear_history(self) -> None:
         """Clear conversation history"""
-        # For the new API, this will be implemented when we add history tracking
-        pass
+        self.history.clear()
     
     def get_model_info(self) -> Dict:
         """Get information about the current model
@@ -105,5 +711,42 @@ class GeminiClient:
         return {
             "name": self.model_name,
             "api_key": "***" + self.api_key[-4:] if self.api_key else None,
-            "history_length": 0  # Will be updated when we implement history tracking
+            "history_length": len(self.history.messages),
+            "history_tokens": self.history.token_count(),
+            "pinned_blocks": len(self.pinned_contents),
+            "cached_content": self.cached_content,
+            "tools": [declaration["name"] for declaration in self.tool_declarations]
         }
+
+
+def _response_text(response: Any) -> Optional[str]:
+    """Get the text of a response or chunk
+    
+    Reading .text on a response that also carries function calls makes the
+    SDK log a warning, so the text parts are joined directly in that case.
+    """
+    if not getattr(response, "function_calls", None):
+        return response.text
+    return "".join(part.text for part in _response_parts(response) if part.text and not part.thought) or None
+
+
+def _response_parts(response: Any) -> List[Any]:
+    """Get the content parts of a response or chunk's first candidate"""
+    candidates = getattr(response, "candidates", None)
+    if not candidates or not candidates[0].content:
+        return []
+    return candidates[0].content.parts or []
+
+
+async def _prepend(first: Any, stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Yield an already-received first chunk, if any, then the rest of a stream"""
+    if first:
+        yield first
+    async for chunk in stream:
+        yield chunk
+
+
+def _model_content(parts: List[Any]) -> Any:
+    """Wrap the parts of a streamed model turn for sending back to the model"""
+    from google.genai import types
+    return types.Content(role="model", parts=parts)
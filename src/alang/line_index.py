@@ -0,0 +1,103 @@
+"""
+Sparse line-offset index for reading windows of large files
+"""
+
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Tuple
+
+
+# Bytes between checkpoints; locating a line scans at most one chunk
+CHUNK_SIZE = 1024 * 1024
+
+# Number of files whose indexes are kept
+CACHE_SIZE = 32
+
+
+class LineIndex:
+    """Newline counts at fixed byte checkpoints of a file
+    
+    The index holds one integer per CHUNK_SIZE bytes, so even a multi-GB
+    file costs a few kilobytes, and locating any line scans at most one
+    chunk of the memory-mapped file.
+    """
+    
+    def __init__(self, data: mmap.mmap):
+        """Build the index
+        
+        Args:
+            data: Memory-mapped file contents
+        """
+        self.size = len(data)
+        # lines_before[i] is the number of newlines in data[:i * CHUNK_SIZE]
+        self.lines_before = array("Q", [0])
+        newlines = 0
+        for start in range(0, self.size, CHUNK_SIZE):
+            newlines += data[start:start + CHUNK_SIZE].count(b"\n")
+            self.lines_before.append(newlines)
+        
+        ends_with_newline = self.size > 0 and data[self.size - 1:self.size] == b"\n"
+        self.total_lines = newlines + (1 if self.size and not ends_with_newline else 0)
+    
+    def line_start(self, data: mmap.mmap, line: int) -> int:
+        """Get the byte offset where a zero-based line starts
+        
+        Args:
+            data: The memory-mapped file the index was built from
+            line: Zero-based line number
+        
+        Returns:
+            Byte offset, or the file size if the line is past the end
+        """
+        if line <= 0:
+            return 0
+        chunk = bisect_right(self.lines_before, line - 1) - 1
+        if chunk >= len(self.lines_before) - 1:
+            return self.size
+        return skip_lines(data, chunk * CHUNK_SIZE, line - self.lines_before[chunk])
+
+
+def skip_lines(data: mmap.mmap, position: int, count: int) -> int:
+    """Get the offset just past the count-th newline at or after position, or the end of data"""
+    for _ in range(count):
+        position = data.find(b"\n", position)
+        if position == -1:
+            return len(data)
+        position += 1
+    return position
+
+
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], LineIndex]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_line_index(path: str, data: mmap.mmap, stat: os.stat_result) -> LineIndex:
+    """Get the line index of a file, reusing the cached one while mtime and size match
+    
+    Args:
+        path: File path, used as the cache key
+        data: Memory-mapped file contents
+        stat: Stat of the file when it was mapped
+    
+    Returns:
+        Line index for the file
+    """
+    key = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            return cached[1]
+    
+    index = LineIndex(data)
+    with _cache_lock:
+        _cache[key] = (version, index)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
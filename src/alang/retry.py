@@ -0,0 +1,183 @@
+"""
+Retry and rate limiting for Alang API calls
+"""
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+try:
+    import httpx
+    TRANSIENT_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+except ImportError:
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+
+T = TypeVar("T")
+
+# HTTP status codes worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token-bucket rate limiter shared by every caller of a client"""
+    
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        """Initialize rate limiter
+        
+        Args:
+            requests_per_minute: Sustained request rate
+            burst: Maximum number of requests allowed back to back
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(requests_per_minute // 10)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: each waiter reserves its own future slot,
+            # so callers are served in arrival order without polling
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self) -> None:
+        """Wait on the event loop until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RetryPolicy:
+    """Retries transient API failures with jittered exponential backoff"""
+    
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0):
+        """Initialize retry policy
+        
+        Args:
+            max_retries: Number of retries after the first attempt
+            base_delay: Backoff ceiling in seconds for the first retry
+            max_delay: Upper bound on any single delay
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.logger = logging.getLogger(__name__)
+    
+    def is_retryable(self, error: BaseException) -> bool:
+        """Check whether an error is transient"""
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+    
+    def get_delay(self, attempt: int, error: BaseException) -> float:
+        """Get the delay before the next attempt
+        
+        Honors a server-provided Retry-After, otherwise uses full jitter over
+        an exponentially growing window.
+        
+        Args:
+            attempt: Zero-based number of the failed attempt
+            error: The error that failed it
+        
+        Returns:
+            Delay in seconds
+        """
+        retry_after = _get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def call(self, func: Callable[..., T], *args: Any, limiter: Optional[RateLimiter] = None, **kwargs: Any) -> T:
+        """Call a function, retrying transient failures
+        
+        Args:
+            func: Function to call
+            limiter: Optional rate limiter consulted before every attempt
+        
+        Returns:
+            The function's result
+        """
+        attempt = 0
+        while True:
+            if limiter:
+                limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = self.get_delay(attempt, e)
+                self.logger.warning(f"Transient API error ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+    
+    async def acall(self, func: Callable[..., Awaitable[T]], *args: Any, limiter: Optional[RateLimiter] = None,
+                    **kwargs: Any) -> T:
+        """Await a coroutine function, retrying transient failures
+        
+        Args:
+            func: Coroutine function to call
+            limiter: Optional rate limiter consulted before every attempt
+        
+        Returns:
+            The coroutine's result
+        """
+        attempt = 0
+        while True:
+            if limiter:
+                await limiter.acquire_async()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = self.get_delay(attempt, e)
+                self.logger.warning(f"Transient API error ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+def _get_retry_after(error: BaseException) -> Optional[float]:
+    """Extract a server-requested retry delay from an API error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+    
+    # Gemini reports quota back-off as a RetryInfo detail, e.g. "retryDelay": "17s"
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            match = re.fullmatch(r"(\d+(?:\.\d+)?)s", delay or "")
+            if match:
+                return float(match.group(1))
+    
+    return None
@@ -0,0 +1,381 @@
+"""
+Persistent trigram index for searching file contents
+"""
+
+import fnmatch
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from .walker import looks_binary, walk_files
+
+
+# Files larger than this are left out of the index and of search results
+MAX_INDEXED_SIZE = 4 * 1024 * 1024
+
+# Changed files committed per transaction while (re)indexing
+COMMIT_EVERY = 500
+
+# Upper bound on trigrams in one MATCH expression
+MAX_QUERY_TRIGRAMS = 32
+
+# Seconds after a tree's files were read during which changed files are
+# only noted, and scanned directly, rather than read into the index
+UPDATE_INTERVAL = 10.0
+
+# mtime_ns recorded for files noted as changed but not read yet
+UNREAD = -1
+
+
+class SearchIndex:
+    """Trigram index of file contents, updated incrementally by mtime and size
+    
+    Contents are indexed in a contentless FTS5 trigram table, so the index
+    holds only postings, not copies of the files. A contentless table cannot
+    delete rows without their original text, so a changed file gets a fresh
+    document id and its old postings are ignored until the next rebuild.
+    
+    Queries use the index only to narrow the candidate files; every
+    candidate is re-read and matched for real, so results never depend on
+    the index being exact.
+    """
+    
+    def __init__(self, index_path: Path):
+        """Initialize search index
+        
+        Args:
+            index_path: SQLite file holding the index
+        """
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Root -> time.monotonic() at the start of its last complete update
+        # that read changed files; only exact roots count, since a parent's
+        # walk skips ignored subtrees
+        self._updated: Dict[str, float] = {}
+        
+        self.conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA busy_timeout = 5000")
+        self._init_schema()
+    
+    def _init_schema(self):
+        """Create index tables"""
+        cursor = self.conn.cursor()
+        
+        # doc_id is NULL for files that could not be indexed and are scanned on
+        # every query; searchable is 0 for binary files, which never match
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                doc_id INTEGER,
+                searchable INTEGER NOT NULL DEFAULT 1
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS file_trigrams USING fts5(
+                    body,
+                    tokenize = 'trigram',
+                    content = '',
+                    detail = 'none'
+                )
+            """)
+            self.enabled = True
+        except sqlite3.OperationalError as e:
+            # SQLite older than 3.34 has no trigram tokenizer; fall back to scanning
+            self.logger.warning(f"Trigram search index unavailable: {e}")
+            self.enabled = False
+        
+        self.conn.commit()
+    
+    def _get_meta(self, key: str) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+    
+    def _set_meta(self, key: str, value: int):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    
+    def update(self, root: str, deadline: Optional[float] = None,
+               max_age: float = UPDATE_INTERVAL) -> Dict[str, int]:
+        """Bring the index for a directory tree up to date
+        
+        The tree is always walked and stat-ed, so files that disappeared
+        are dropped and new or changed ones are seen. Changed files are read
+        into the index at most once per max_age seconds; in between they are
+        recorded as unread, and candidates() returns them for a direct scan,
+        so a burst of edits costs one re-read instead of one per query.
+        
+        Args:
+            root: Directory to index
+            deadline: time.monotonic() value at which to stop early; files
+                not reached yet keep their previous state in the index
+            max_age: Seconds after a complete update during which changed
+                files are not read; 0 always reads them
+        
+        Returns:
+            Counts of scanned, indexed, deferred (noted as unread) and
+            removed files, and whether the walk completed
+        """
+        root = os.path.abspath(root)
+        with self._lock:
+            started = time.monotonic()
+            read_changes = started - self._updated.get(root, float("-inf")) >= max_age
+            
+            known = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in self.conn.execute(
+                    "SELECT path, mtime_ns, size FROM files WHERE path >= ? AND path < ?",
+                    _prefix_range(root)
+                )
+            }
+            
+            scanned = indexed = deferred = 0
+            complete = True
+            stale = self._get_meta("stale_docs")
+            walk = walk_files(root, max_file_size=MAX_INDEXED_SIZE, deadline=deadline)
+            try:
+                for path, stat in walk:
+                    scanned += 1
+                    previous = known.pop(path, None)
+                    if previous == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    if not read_changes:
+                        if previous is None or previous[0] != UNREAD:
+                            stale += self._mark_unread(path, stat)
+                            deferred += 1
+                        continue
+                    
+                    stale += self._index_file(path, stat)
+                    indexed += 1
+                    if indexed % COMMIT_EVERY == 0:
+                        self._set_meta("stale_docs", stale)
+                        self.conn.commit()
+                    if deadline is not None and time.monotonic() > deadline:
+                        complete = False
+                        break
+            finally:
+                walk.close()
+            # The walk itself also stops at the deadline
+            if deadline is not None and time.monotonic() > deadline:
+                complete = False
+            
+            # Files not reached by an interrupted walk may still exist
+            removed = 0
+            if complete:
+                for path in known:
+                    stale += self._remove_file(path)
+                removed = len(known)
+            self._set_meta("stale_docs", stale)
+            self.conn.commit()
+            
+            if complete and self.enabled and stale > max(1000, self._count_docs()):
+                self._rebuild()
+            if complete and read_changes:
+                self._updated[root] = started
+            
+            return {"scanned": scanned, "indexed": indexed, "deferred": deferred, "removed": removed,
+                    "complete": complete}
+    
+    def invalidate(self) -> None:
+        """Make the next update read changed files at once, e.g. after the app wrote them"""
+        with self._lock:
+            self._updated.clear()
+    
+    def _index_file(self, path: str, stat: os.stat_result) -> int:
+        """(Re)index one file and return the number of postings it made stale"""
+        doc_id = None
+        searchable = 1
+        if self.enabled:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                if looks_binary(data):
+                    searchable = 0
+                else:
+                    body = data.decode("utf-8")
+                    doc_id = self._get_meta("next_doc_id") + 1
+                    self._set_meta("next_doc_id", doc_id)
+                    self.conn.execute("INSERT INTO file_trigrams (rowid, body) VALUES (?, ?)", (doc_id, body))
+            except UnicodeDecodeError:
+                searchable = 0
+            except OSError:
+                # Unreadable now; leave it to be scanned (and skipped) at query time
+                pass
+        
+        stale = self._remove_file(path)
+        self.conn.execute(
+            "INSERT INTO files (path, mtime_ns, size, doc_id, searchable) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, doc_id, searchable)
+        )
+        return stale
+    
+    def _mark_unread(self, path: str, stat: os.stat_result) -> int:
+        """Record a changed file to be scanned directly until it is read into the index"""
+        stale = self._remove_file(path)
+        self.conn.execute(
+            "INSERT INTO files (path, mtime_ns, size, doc_id, searchable) VALUES (?, ?, ?, NULL, 1)",
+            (path, UNREAD, stat.st_size)
+        )
+        return stale
+    
+    def _remove_file(self, path: str) -> int:
+        """Forget a file and return the number of postings it made stale"""
+        row = self.conn.execute("SELECT doc_id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return 0
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return 1 if row[0] is not None else 0
+    
+    def _count_docs(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM files WHERE doc_id IS NOT NULL").fetchone()[0]
+    
+    def _rebuild(self):
+        """Drop stale postings by re-indexing every live file from scratch"""
+        self.logger.info("Rebuilding search index to drop stale entries")
+        self.conn.execute("INSERT INTO file_trigrams (file_trigrams) VALUES ('delete-all')")
+        self.conn.execute("UPDATE files SET doc_id = NULL")
+        self._set_meta("next_doc_id", 0)
+        self._set_meta("stale_docs", 0)
+        
+        paths = [row[0] for row in self.conn.execute("SELECT path FROM files WHERE searchable")]
+        for i, path in enumerate(paths, 1):
+            try:
+                self._index_file(path, os.stat(path))
+            except OSError:
+                self._remove_file(path)
+            if i % COMMIT_EVERY == 0:
+                self.conn.commit()
+        self.conn.commit()
+    
+    def candidates(self, root: str, literals: List[str], file_pattern: str = "*") -> List[str]:
+        """Get the files under a directory that may contain every literal
+        
+        Args:
+            root: Directory to search
+            literals: Strings that any matching file must contain
+                (case-insensitively); strings shorter than three characters
+                cannot narrow the search and are ignored
+            file_pattern: Glob matched against file names, or against paths
+                relative to root when it contains a separator
+        
+        Returns:
+            Sorted absolute paths of candidate files
+        """
+        root = os.path.abspath(root)
+        match_expr = _match_expression(literals) if self.enabled else None
+        
+        with self._lock:
+            if match_expr:
+                rows = self.conn.execute("""
+                    SELECT path FROM files
+                    WHERE path >= ? AND path < ? AND searchable
+                      AND (doc_id IS NULL OR doc_id IN (
+                          SELECT rowid FROM file_trigrams WHERE file_trigrams MATCH ?
+                      ))
+                    ORDER BY path
+                """, (*_prefix_range(root), match_expr))
+            else:
+                rows = self.conn.execute("""
+                    SELECT path FROM files
+                    WHERE path >= ? AND path < ? AND searchable
+                    ORDER BY path
+                """, _prefix_range(root))
+            paths = [row[0] for row in rows]
+        
+        if file_pattern in ("*", "**", "**/*"):
+            return paths
+        return [path for path in paths if matches_file_pattern(path, root, file_pattern)]
+    
+    def close(self):
+        """Close the index"""
+        with self._lock:
+            self.conn.close()
+
+
+def _prefix_range(root: str) -> Tuple[str, str]:
+    """Get bounds selecting every path below root with an index range scan"""
+    prefix = root.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def matches_file_pattern(path: str, root: str, file_pattern: str) -> bool:
+    """Check a file against a glob, matching names or, for globs with a separator, relative paths"""
+    if "/" in file_pattern or os.sep in file_pattern:
+        return fnmatch.fnmatch(os.path.relpath(path, root), file_pattern)
+    return fnmatch.fnmatch(os.path.basename(path), file_pattern)
+
+
+def _match_expression(literals: List[str]) -> Optional[str]:
+    """Build an FTS5 query requiring every trigram of the given literals"""
+    trigrams = []
+    for literal in literals:
+        for i in range(len(literal) - 2):
+            trigram = literal[i:i + 3]
+            if trigram not in trigrams:
+                trigrams.append(trigram)
+    
+    if not trigrams:
+        return None
+    
+    # Evenly sample long literals; any subset still yields a superset of matches
+    if len(trigrams) > MAX_QUERY_TRIGRAMS:
+        step = len(trigrams) / MAX_QUERY_TRIGRAMS
+        trigrams = [trigrams[int(i * step)] for i in range(MAX_QUERY_TRIGRAMS)]
+    
+    return " AND ".join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams)
+
+
+def regex_literals(pattern: str) -> List[str]:
+    """Extract literal runs that every match of a regular expression contains
+    
+    Only the top-level sequence is inspected: alternations, optional parts
+    and character classes end the current run. Returning fewer literals
+    than possible is always safe, since it just widens the candidate set.
+    
+    Args:
+        pattern: Regular expression
+    
+    Returns:
+        Required literal strings
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    
+    literals = []
+    run = []
+    for op, arg in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(arg))
+            continue
+        if run:
+            literals.append("".join(run))
+            run = []
+    if run:
+        literals.append("".join(run))
+    return literals
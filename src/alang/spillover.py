@@ -0,0 +1,157 @@
+"""
+Output budgets for tool results, with the full text kept for later fetching
+"""
+
+import atexit
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+# Total size of spilled outputs kept on disk
+SPILL_MAX_BYTES = 256 * 1024 * 1024
+
+# Share of a budget spent on the head of an output; the rest goes to the tail
+HEAD_SHARE = 0.6
+
+# Line boundaries: real newlines only; a backslash followed by "n" is ordinary text
+LINE_BREAK = re.compile(r"(?<=\n)")
+
+REF_PATTERN = re.compile(r"out-[0-9a-f]{16}\Z")
+
+
+class SpilloverStore:
+    """Full tool outputs that were cut down before reaching the model
+    
+    Each output is written once to a temporary directory under a reference
+    derived from its content, so repeating a call reuses the same
+    reference. The oldest outputs are deleted past max_bytes, and the
+    directory is removed when the process exits.
+    """
+    
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = SPILL_MAX_BYTES):
+        """Initialize spillover store
+        
+        Args:
+            directory: Directory for spilled outputs; a temporary one is
+                created on first use if not given
+            max_bytes: Upper bound on the total size of spilled outputs
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def put(self, text: str) -> str:
+        """Store an output and return its reference"""
+        data = text.encode("utf-8")
+        ref = "out-" + hashlib.sha256(data).hexdigest()[:16]
+        with self._lock:
+            if ref in self._entries:
+                self._entries.move_to_end(ref)
+                return ref
+            
+            with open(self._path(ref), "wb") as f:
+                f.write(data)
+            self._entries[ref] = len(data)
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_ref, size = self._entries.popitem(last=False)
+                self._size -= size
+                try:
+                    os.remove(self._path(old_ref))
+                except OSError:
+                    pass
+        return ref
+    
+    def get(self, ref: str) -> Optional[str]:
+        """Get a stored output, or None if the reference is unknown or expired"""
+        with self._lock:
+            if not REF_PATTERN.match(ref) or ref not in self._entries:
+                return None
+            self._entries.move_to_end(ref)
+            path = self._path(ref)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _path(self, ref: str) -> str:
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="alang-spill-")
+            atexit.register(shutil.rmtree, self.directory, True)
+        return os.path.join(self.directory, ref + ".txt")
+
+
+def split_lines(text: str) -> List[str]:
+    """Split text into lines at newline characters, keeping the line breaks
+    
+    Unlike str.splitlines, carriage returns, form feeds and other Unicode
+    line boundaries stay inside their line.
+    """
+    lines = LINE_BREAK.split(text)
+    if lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def truncate_output(text: str, budget: int, ref: Optional[str] = None) -> Tuple[str, int, int]:
+    """Cut text to about budget characters, keeping whole lines from its head and tail
+    
+    Output made of a few huge lines, such as minified files, is cut by
+    characters instead.
+    
+    Args:
+        text: Output text
+        budget: Characters to keep
+        ref: Spillover reference to point at in the elision marker
+    
+    Returns:
+        The shortened text, the number of whole lines left out of it, and
+        the number of characters left out of it
+    """
+    if len(text) <= budget:
+        return text, 0, 0
+    
+    lines = split_lines(text)
+    head_budget = int(budget * HEAD_SHARE)
+    
+    head_count = head_size = 0
+    while head_count < len(lines) and head_size + len(lines[head_count]) <= head_budget:
+        head_size += len(lines[head_count])
+        head_count += 1
+    
+    tail_count = tail_size = 0
+    while (tail_count < len(lines) - head_count
+           and tail_size + len(lines[-1 - tail_count]) <= budget - head_size):
+        tail_size += len(lines[-1 - tail_count])
+        tail_count += 1
+    
+    elided = len(lines) - head_count - tail_count
+    if head_size + tail_size >= budget // 2:
+        head = "".join(lines[:head_count])
+        tail = "".join(lines[len(lines) - tail_count:])
+        what = f"{elided} lines"
+        offset = head_count + 1
+    else:
+        head = text[:head_budget]
+        tail = text[len(text) - (budget - head_budget):]
+        what = f"{len(text) - len(head) - len(tail)} characters"
+        offset = max(1, len(split_lines(head)))
+        # Only lines with no part in the head or the tail count as elided
+        elided = max(0, len(lines) - len(split_lines(head)) - len(split_lines(tail)))
+    
+    if ref:
+        marker = f"[... {what} elided; call fetchoutput with ref=\"{ref}\" and offset={offset} to read them ...]"
+    else:
+        marker = f"[... {what} elided; request a smaller window to read them ...]"
+    
+    separator = "" if head.endswith("\n") or not head else "\n"
+    return f"{head}{separator}{marker}\n{tail}", elided, len(text) - len(head) - len(tail)
@@ -2,18 +2,75 @@
 Tool system for Alang - File operations and utilities
 """
 
+import asyncio
+import codecs
+import inspect
+import mmap
 import os
+import re
 import shutil
-import subprocess
-import glob
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple, Union, get_args, get_origin, get_type_hints
 import json
 
+from .cache import ToolResultCache
+from .line_index import get_line_index, skip_lines
+from .search_index import MAX_INDEXED_SIZE, SearchIndex, matches_file_pattern, regex_literals
+from .spillover import SpilloverStore, split_lines, truncate_output
+from .walker import IgnoreRules, translate_glob, walk_files
+
+
+# Whole-file reads above this size return only the first READ_DEFAULT_LIMIT lines
+READ_FULL_MAX_SIZE = 1024 * 1024
+READ_DEFAULT_LIMIT = 2000
+
+# Shell command defaults: seconds before a kill, characters kept per stream
+COMMAND_TIMEOUT = 30.0
+COMMAND_OUTPUT_LIMIT = 64000
+COMMAND_READ_SIZE = 4096
+
+# Default cutoffs for search tools; the model rarely needs more than the first hits
+SEARCH_MAX_RESULTS = 200
+SEARCH_TIME_BUDGET = 10.0
+
+# Larger files are skipped by content search
+SEARCH_MAX_FILE_SIZE = MAX_INDEXED_SIZE
+
+# Threads reading and matching files at once
+SEARCH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Threads running independent tool calls from one model turn
+TOOL_WORKERS = 8
+
+# Total size of memoized read-only tool results
+TOOL_CACHE_BYTES = 8 * 1024 * 1024
+
+# Characters of a tool's output passed to the model; the middle of longer output is spilled
+TOOL_OUTPUT_BUDGET = 20000
+
+# Matching lines longer than this are clipped around the match
+MATCH_LINE_MAX = 300
+
+# Lines returned by fetchoutput when no limit is given
+FETCH_DEFAULT_LIMIT = 200
+
 
 class Tool:
     """Base class for all tools"""
     
+    # Tools that only inspect the machine; others change files or run commands
+    read_only = True
+    
+    # Characters of output the model sees; None passes output through whole
+    output_budget: Optional[int] = TOOL_OUTPUT_BUDGET
+    
+    # Keep the full text of cut output for fetchoutput
+    spill = True
+    
     def __init__(self):
         self.name = self.__class__.__name__.lower().replace('tool', '')
         self.description = self.__doc__ or "No description available"
@@ -25,13 +82,106 @@ class Tool:
             Dictionary with 'success', 'result', and 'error' keys
         """
         raise NotImplementedError("Tool must implement execute method")
+    
+    def invalidate(self) -> None:
+        """Forget state derived from files, after something may have changed them"""
+    
+    def execute_with_dependencies(self, **kwargs) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+        """Execute the tool and report the paths its result was computed from
+        
+        Returns:
+            The result, and the files and directories whose changes would
+            change it, or None if the result must not be reused
+        """
+        return self.execute(**kwargs), None
+    
+    def get_declaration(self) -> Dict[str, Any]:
+        """Describe the tool as a Gemini function declaration
+        
+        Parameters come from the signature of execute, and their
+        descriptions from the Args section of its docstring.
+        
+        Returns:
+            Function declaration dictionary
+        """
+        hints = get_type_hints(self.execute)
+        descriptions = _parse_arg_descriptions(self.execute.__doc__ or "")
+        properties = {}
+        required = []
+        
+        for name, parameter in inspect.signature(self.execute).parameters.items():
+            if parameter.kind in (parameter.VAR_KEYWORD, parameter.VAR_POSITIONAL):
+                continue
+            
+            schema = {"type": _schema_type(hints.get(name, str))}
+            if name in descriptions:
+                schema["description"] = descriptions[name]
+            properties[name] = schema
+            if parameter.default is parameter.empty:
+                required.append(name)
+        
+        return {
+            "name": self.name,
+            "description": self.description.strip(),
+            "parameters": {
+                "type": "OBJECT",
+                "properties": properties,
+                "required": required
+            }
+        }
+
+
+def _schema_type(annotation: Any) -> str:
+    """Map a Python annotation to a function declaration schema type"""
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    return {str: "STRING", int: "INTEGER", float: "NUMBER", bool: "BOOLEAN"}.get(annotation, "STRING")
+
+
+def _parse_arg_descriptions(docstring: str) -> Dict[str, str]:
+    """Read "name: description" lines from the Args section of a docstring"""
+    descriptions = {}
+    in_args = False
+    current = None
+    for line in docstring.splitlines():
+        stripped = line.strip()
+        if stripped == "Args:":
+            in_args = True
+            continue
+        if not in_args:
+            continue
+        if not stripped or (stripped.endswith(":") and " " not in stripped):
+            break
+        match = re.match(r"(\w+):\s*(.*)", stripped)
+        if match:
+            current = match.group(1)
+            descriptions[current] = match.group(2)
+        elif current:
+            descriptions[current] += " " + stripped
+    return descriptions
 
 
 class ReadFileTool(Tool):
     """Read the contents of a file"""
     
-    def execute(self, filename: str, **kwargs) -> Dict[str, Any]:
-        """Read file contents"""
+    # File contents are the main context the model gathers
+    output_budget = 2 * TOOL_OUTPUT_BUDGET
+    
+    def execute(self, filename: str, offset: Optional[int] = None, limit: Optional[int] = None,
+                start_byte: Optional[int] = None, end_byte: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+        """Read file contents, or a window of them
+        
+        Args:
+            filename: File to read
+            offset: First line to return, counting from 1
+            limit: Maximum number of lines to return
+            start_byte: Start of a byte range to return instead of lines
+            end_byte: End (exclusive) of the byte range
+        
+        Windows are served from a memory map, so reading a few lines of a
+        huge file takes constant memory. Whole files larger than
+        READ_FULL_MAX_SIZE are cut to their first READ_DEFAULT_LIMIT lines.
+        """
         try:
             if not os.path.exists(filename):
                 return {
@@ -39,28 +189,82 @@ class ReadFileTool(Tool):
                     "error": f"File '{filename}' not found"
                 }
             
-            with open(filename, 'r', encoding='utf-8') as f:
-                content = f.read()
+            ranged = offset is not None or limit is not None or start_byte is not None or end_byte is not None
+            if not ranged and os.path.getsize(filename) <= READ_FULL_MAX_SIZE:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                
+                return {
+                    "success": True,
+                    "result": content,
+                    "lines": content.count("\n") + (1 if content and not content.endswith("\n") else 0),
+                    "size": len(content)
+                }
             
-            return {
-                "success": True,
-                "result": content,
-                "lines": len(content.splitlines()),
-                "size": len(content)
-            }
+            return self._read_window(filename, offset, limit, start_byte, end_byte)
             
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Failed to read file '{filename}': {str(e)}"
             }
+    
+    def execute_with_dependencies(self, filename: str, **kwargs) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+        return self.execute(filename, **kwargs), [filename]
+    
+    def _read_window(self, filename: str, offset: Optional[int], limit: Optional[int],
+                     start_byte: Optional[int], end_byte: Optional[int]) -> Dict[str, Any]:
+        """Read a line or byte window of a file through mmap"""
+        with open(filename, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                return {"success": True, "result": "", "lines": 0, "size": 0, "total_lines": 0, "file_size": 0}
+            
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if start_byte is not None or end_byte is not None:
+                    start = max(0, start_byte or 0)
+                    end = min(stat.st_size, end_byte if end_byte is not None else stat.st_size)
+                    chunk = data[start:max(start, end)]
+                    result = {"start_byte": start, "end_byte": start + len(chunk)}
+                else:
+                    index = get_line_index(filename, data, stat)
+                    first_line = max(1, offset or 1)
+                    count = limit if limit is not None else READ_DEFAULT_LIMIT
+                    start = index.line_start(data, first_line - 1)
+                    end = skip_lines(data, start, max(0, count))
+                    chunk = data[start:end]
+                    last_line = min(index.total_lines, first_line + max(0, count) - 1)
+                    result = {
+                        "start_line": first_line,
+                        "end_line": max(first_line - 1, last_line),
+                        "total_lines": index.total_lines,
+                        "truncated": end < stat.st_size
+                    }
+        
+        # A window may cut through a multi-byte character at either edge
+        content = chunk.decode('utf-8', errors='replace')
+        result.update({
+            "success": True,
+            "result": content,
+            "lines": content.count("\n") + (1 if content and not content.endswith("\n") else 0),
+            "size": len(content),
+            "file_size": stat.st_size
+        })
+        return result
 
 
 class WriteFileTool(Tool):
     """Write content to a file"""
     
+    read_only = False
+    
     def execute(self, filename: str, content: str, **kwargs) -> Dict[str, Any]:
-        """Write content to file"""
+        """Write content to file
+        
+        Args:
+            filename: File to create or overwrite
+            content: Full new contents of the file
+        """
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(filename), exist_ok=True)
@@ -84,7 +288,12 @@ class ListFilesTool(Tool):
     """List files in a directory"""
     
     def execute(self, directory: str = ".", show_hidden: bool = False, **kwargs) -> Dict[str, Any]:
-        """List files in directory"""
+        """List files in directory
+        
+        Args:
+            directory: Directory to list
+            show_hidden: Include hidden and ignored entries
+        """
         try:
             if not os.path.exists(directory):
                 return {
@@ -94,18 +303,24 @@ class ListFilesTool(Tool):
             
             files = []
             directories = []
+            ignored = 0
             
-            for item in os.listdir(directory):
-                if not show_hidden and item.startswith('.'):
-                    continue
-                
-                item_path = os.path.join(directory, item)
-                
-                if os.path.isdir(item_path):
-                    directories.append(f"{item}/")
-                else:
-                    size = os.path.getsize(item_path)
-                    files.append(f"{item} ({size} bytes)")
+            # Hidden, .gitignore'd and build/dependency entries are left out unless asked for
+            rules = None if show_hidden else IgnoreRules.for_directory(directory)
+            
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    is_dir = entry.is_dir()
+                    if rules and rules.is_ignored(entry.path, is_dir):
+                        if not entry.name.startswith('.'):
+                            ignored += 1
+                        continue
+                    
+                    if is_dir:
+                        directories.append(f"{entry.name}/")
+                    else:
+                        size = entry.stat().st_size
+                        files.append(f"{entry.name} ({size} bytes)")
             
             result = []
             if directories:
@@ -118,11 +333,17 @@ class ListFilesTool(Tool):
                 result.append("📄 Files:")
                 result.extend(f"  {f}" for f in sorted(files))
             
+            if ignored:
+                if result:
+                    result.append("")
+                result.append(f"({ignored} ignored entries not shown; use show_hidden to include them)")
+            
             return {
                 "success": True,
-                "result": "\\n".join(result) if result else "Empty directory",
+                "result": "\n".join(result) if result else "Empty directory",
                 "files_count": len(files),
-                "directories_count": len(directories)
+                "directories_count": len(directories),
+                "ignored_count": ignored
             }
             
         except Exception as e:
@@ -130,21 +351,95 @@ class ListFilesTool(Tool):
                 "success": False,
                 "error": f"Failed to list directory '{directory}': {str(e)}"
             }
+    
+    def execute_with_dependencies(self, directory: str = ".", **kwargs) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+        result = self.execute(directory, **kwargs)
+        if not result["success"]:
+            return result, None
+        # The directory's mtime covers added and removed entries, the entries' own stats their sizes
+        try:
+            return result, [directory] + [os.path.join(directory, name) for name in os.listdir(directory)]
+        except OSError:
+            return result, None
 
 
 class SearchFilesTool(Tool):
     """Search for files matching a pattern"""
     
-    def execute(self, pattern: str, directory: str = ".", **kwargs) -> Dict[str, Any]:
-        """Search for files matching pattern"""
+    def iter_files(self, pattern: str, directory: str = ".", listed: Optional[List[str]] = None,
+                   deadline: Optional[float] = None) -> Iterator[str]:
+        """Yield files and directories matching a glob relative to directory as they are found
+        
+        "*" and "?" match within one path component and "**" spans any
+        number of directories. Ignored, hidden and dependency or build
+        directories are not walked, and patterns without "**" only walk as
+        deep as they have components. Walked directories are appended to
+        listed, if given. The walk stops at deadline, a time.monotonic()
+        value, even if nothing has matched yet.
+        """
+        regex = re.compile(translate_glob(pattern.lstrip("/")) + r"\Z")
+        max_depth = None if "**" in pattern else pattern.strip("/").count("/")
+        root = os.path.abspath(directory)
+        walk = walk_files(root, max_depth=max_depth, listed=listed, deadline=deadline, include_directories=True)
+        for path, _ in walk:
+            rel_path = os.path.relpath(path, root)
+            if regex.match(rel_path.replace(os.sep, "/")):
+                yield os.path.join(directory, rel_path)
+    
+    def execute(self, pattern: str, directory: str = ".", max_results: int = SEARCH_MAX_RESULTS,
+                time_budget: float = SEARCH_TIME_BUDGET, **kwargs) -> Dict[str, Any]:
+        """Search for files matching pattern, stopping after max_results or time_budget seconds
+        
+        Args:
+            pattern: Glob relative to directory, e.g. "**/*.py"
+            directory: Directory to search
+            max_results: Maximum number of files to return
+            time_budget: Seconds after which the search stops
+        """
+        return self._search(pattern, directory, max_results, time_budget)
+    
+    def execute_with_dependencies(self, pattern: str, directory: str = ".", max_results: int = SEARCH_MAX_RESULTS,
+                                  time_budget: float = SEARCH_TIME_BUDGET,
+                                  **kwargs) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+        listed: List[str] = []
+        result = self._search(pattern, directory, max_results, time_budget, listed)
+        # Which files a cut-short walk reaches first varies from run to run
+        if not result["success"] or result.get("truncated"):
+            return result, None
+        return result, listed + result.get("matches", [])
+    
+    def _search(self, pattern: str, directory: str, max_results: int, time_budget: float,
+                listed: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run a file search, recording walked directories in listed"""
         try:
-            search_pattern = os.path.join(directory, pattern)
-            matches = glob.glob(search_pattern, recursive=True)
+            deadline = time.monotonic() + time_budget if time_budget else None
+            matches = []
+            truncated = False
+            
+            files = self.iter_files(pattern, directory, listed, deadline)
+            try:
+                for match in files:
+                    if max_results and len(matches) >= max_results:
+                        truncated = True
+                        break
+                    matches.append(match)
+                    if deadline is not None and time.monotonic() > deadline:
+                        break
+            finally:
+                files.close()
+            
+            # The walk also ends at the deadline, matches or not
+            if deadline is not None and time.monotonic() > deadline:
+                truncated = True
             
             if not matches:
+                result = f"No files found matching pattern '{pattern}' in '{directory}'"
+                if truncated:
+                    result += " (search stopped at the time budget)"
                 return {
                     "success": True,
-                    "result": f"No files found matching pattern '{pattern}' in '{directory}'"
+                    "result": result,
+                    "truncated": truncated
                 }
             
             result = [f"Found {len(matches)} files matching '{pattern}':"]
@@ -154,11 +449,14 @@ class SearchFilesTool(Tool):
                     result.append(f"  📄 {match} ({size} bytes)")
                 else:
                     result.append(f"  📁 {match}/")
+            if truncated:
+                result.append("(search stopped early; narrow the pattern to see more)")
             
             return {
                 "success": True,
-                "result": "\\n".join(result),
-                "matches": matches
+                "result": "\n".join(result),
+                "matches": matches,
+                "truncated": truncated
             }
             
         except Exception as e:
@@ -171,53 +469,147 @@ class SearchFilesTool(Tool):
 class SearchInFilesTool(Tool):
     """Search for text within files"""
     
-    def execute(self, text: str, directory: str = ".", file_pattern: str = "*", **kwargs) -> Dict[str, Any]:
-        """Search for text within files"""
+    def __init__(self, index_path: Optional[str] = None):
+        """Initialize the tool
+        
+        Args:
+            index_path: SQLite file for the search index; defaults to
+                search_index.db in the default configuration's data directory
+        """
+        super().__init__()
+        self.index_path = index_path
+        self._index: Optional[SearchIndex] = None
+    
+    def _get_index(self) -> SearchIndex:
+        """Open the search index on first use"""
+        if self._index is None:
+            index_path = self.index_path
+            if index_path is None:
+                from .config import Config
+                index_path = Config.load().ensure_data_directory() / "search_index.db"
+            self._index = SearchIndex(index_path)
+        return self._index
+    
+    def invalidate(self) -> None:
+        """Make the next search re-check the tree for changed files"""
+        if self._index is not None:
+            self._index.invalidate()
+    
+    def iter_matches(self, text: str, directory: str = ".", file_pattern: str = "*", regex: bool = False,
+                     use_index: bool = True, deadline: Optional[float] = None) -> Iterator[Tuple[str, int, str]]:
+        """Yield matches as files are scanned
+        
+        With the index, it is brought up to date first and only files that
+        can contain the text, or changed since they were indexed, are
+        scanned. Without it, directories are walked
+        concurrently and each file is scanned as soon as it is found.
+        Candidate files are read and matched in a thread pool. Closing the
+        generator stops the search.
+        
+        Args:
+            text: Text, or a regular expression if regex is set
+            directory: Directory to search
+            file_pattern: Glob selecting which files to search
+            regex: Treat text as a regular expression
+            use_index: Narrow the search with the persistent index
+            deadline: time.monotonic() value at which to stop searching
+        
+        Yields:
+            Tuples of (path relative to directory, line number, stripped line)
+        """
+        pattern = re.compile(text if regex else re.escape(text), re.IGNORECASE)
+        root = os.path.abspath(directory)
+        
+        if use_index and self._get_index().enabled:
+            index = self._get_index()
+            index.update(root, deadline)
+            literals = regex_literals(text) if regex else [text]
+            paths = iter(index.candidates(root, literals, file_pattern))
+        else:
+            walk = walk_files(root, skip_binary=True, max_file_size=SEARCH_MAX_FILE_SIZE, deadline=deadline)
+            paths = (path for path, _ in walk if matches_file_pattern(path, root, file_pattern))
+        
+        for path, line_num, line in _scan_files(paths, pattern, deadline):
+            yield os.path.join(directory, os.path.relpath(path, root)), line_num, line
+    
+    def execute(self, text: str, directory: str = ".", file_pattern: str = "*", regex: bool = False,
+                max_results: int = SEARCH_MAX_RESULTS, time_budget: float = SEARCH_TIME_BUDGET,
+                use_index: bool = True, **kwargs) -> Dict[str, Any]:
+        """Search for text within files
+        
+        The search stops after max_results matching lines or time_budget
+        seconds, whichever comes first; most callers only need the first hits.
+        
+        Args:
+            text: Text to find, case-insensitively
+            directory: Directory to search
+            file_pattern: Glob selecting which files to search, e.g. "*.py"
+            regex: Treat text as a regular expression
+            max_results: Maximum number of matching lines to return
+            time_budget: Seconds after which the search stops
+            use_index: Narrow the search with the persistent index
+        """
         try:
-            import re
-            
-            search_pattern = os.path.join(directory, "**", file_pattern)
-            files = glob.glob(search_pattern, recursive=True)
+            if not os.path.isdir(directory):
+                return {
+                    "success": False,
+                    "error": f"Directory '{directory}' not found"
+                }
             
+            deadline = time.monotonic() + time_budget if time_budget else None
             matches = []
             total_matches = 0
+            truncated = False
+            current_file = None
             
-            for file_path in files:
-                if os.path.isfile(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            lines = f.readlines()
-                        
-                        file_matches = []
-                        for line_num, line in enumerate(lines, 1):
-                            if re.search(re.escape(text), line, re.IGNORECASE):
-                                file_matches.append(f"  Line {line_num}: {line.strip()}")
-                                total_matches += 1
-                        
-                        if file_matches:
-                            matches.append(f"📄 {file_path}:")
-                            matches.extend(file_matches)
-                            matches.append("")
+            found = self.iter_matches(text, directory, file_pattern, regex, use_index, deadline)
+            try:
+                for file_path, line_num, line in found:
+                    if max_results and total_matches >= max_results:
+                        truncated = True
+                        break
                     
-                    except (UnicodeDecodeError, PermissionError):
-                        # Skip binary files or files we can't read
-                        continue
+                    if file_path != current_file:
+                        if current_file is not None:
+                            matches.append("")
+                        matches.append(f"📄 {file_path}:")
+                        current_file = file_path
+                    matches.append(f"  Line {line_num}: {line}")
+                    total_matches += 1
+            finally:
+                found.close()
+            
+            if deadline is not None and time.monotonic() > deadline:
+                truncated = True
             
             if not matches:
+                result = f"No matches found for '{text}' in {directory}"
+                if truncated:
+                    result += " (search stopped at the time budget)"
                 return {
                     "success": True,
-                    "result": f"No matches found for '{text}' in {directory}"
+                    "result": result,
+                    "truncated": truncated
                 }
             
             result = [f"Found {total_matches} matches for '{text}':"]
             result.extend(matches)
+            result.append("")
+            if truncated:
+                result.append("(search stopped early; narrow the query or raise max_results to see more)")
             
             return {
                 "success": True,
-                "result": "\\n".join(result),
-                "total_matches": total_matches
+                "result": "\n".join(result),
+                "total_matches": total_matches,
+                "truncated": truncated
             }
             
+        except re.error as e:
+            return {
+                "success": False,
+                "error": f"Invalid regular expression '{text}': {str(e)}"
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -225,66 +617,315 @@ class SearchInFilesTool(Tool):
             }
 
 
+def _scan_file(path: str, pattern: re.Pattern) -> List[Tuple[int, str]]:
+    """Get the (line number, stripped line) pairs of a file that match a pattern"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [(line_num, _clip_line(line.strip(), pattern)) for line_num, line in enumerate(f, 1)
+                    if pattern.search(line)]
+    except (UnicodeDecodeError, OSError):
+        # Skip binary files or files we can't read
+        return []
+
+
+def _scan_files(paths: Iterator[str], pattern: re.Pattern,
+                deadline: Optional[float] = None) -> Iterator[Tuple[str, int, str]]:
+    """Scan files in a thread pool, yielding matches in the order paths arrive
+    
+    A bounded window of files is in flight at once, so memory stays flat and
+    closing the generator (or reaching the deadline) stops the scan quickly.
+    """
+    executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="alang-search")
+    window = deque()
+    try:
+        paths_done = False
+        while True:
+            while not paths_done and len(window) < SEARCH_WORKERS * 4:
+                path = next(paths, None)
+                if path is None:
+                    paths_done = True
+                else:
+                    window.append((path, executor.submit(_scan_file, path, pattern)))
+            
+            if not window or (deadline is not None and time.monotonic() > deadline):
+                return
+            
+            path, future = window.popleft()
+            for line_num, line in future.result():
+                yield path, line_num, line
+    finally:
+        for _, future in window:
+            future.cancel()
+        executor.shutdown(wait=False)
+        close = getattr(paths, "close", None)
+        if close:
+            close()
+
+
+class OutputBuffer:
+    """Bounded text buffer keeping the head and tail of a stream
+    
+    The first and last max_chars / 2 characters are kept and the middle is
+    counted and dropped, so a chatty build keeps both how it started and how
+    it ended in constant memory.
+    """
+    
+    def __init__(self, max_chars: int = COMMAND_OUTPUT_LIMIT):
+        self.max_chars = max_chars
+        self.head = ""
+        self.tail = ""
+        self.dropped = 0
+    
+    def write(self, text: str):
+        """Append text to the buffer"""
+        room = self.max_chars // 2 - len(self.head)
+        if room > 0:
+            self.head += text[:room]
+            text = text[room:]
+        if not text:
+            return
+        
+        self.tail += text
+        excess = len(self.tail) - (self.max_chars - self.max_chars // 2)
+        if excess > 0:
+            self.tail = self.tail[excess:]
+            self.dropped += excess
+    
+    def getvalue(self) -> str:
+        """Get the buffered text, marking where output was dropped"""
+        if not self.dropped:
+            return self.head + self.tail
+        return f"{self.head}\n... [{self.dropped} characters omitted] ...\n{self.tail}"
+
+
 class ExecuteCommandTool(Tool):
     """Execute shell commands"""
     
-    def execute(self, command: str, working_directory: str = ".", **kwargs) -> Dict[str, Any]:
-        """Execute shell command"""
+    read_only = False
+    
+    def __init__(self, timeout: float = COMMAND_TIMEOUT, max_output_chars: int = COMMAND_OUTPUT_LIMIT):
+        """Initialize the tool
+        
+        Args:
+            timeout: Default seconds before a command is killed
+            max_output_chars: Characters kept per stream; the middle of
+                longer output is dropped
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.max_output_chars = max_output_chars
+    
+    def execute(self, command: str, working_directory: str = ".", timeout: Optional[float] = None,
+                **kwargs) -> Dict[str, Any]:
+        """Execute shell command
+        
+        Blocks until the command finishes; call execute_async from a running
+        event loop.
+        
+        Args:
+            command: Shell command line
+            working_directory: Directory to run it in
+            timeout: Seconds before the command is killed
+        """
+        return asyncio.run(self.execute_async(command, working_directory, timeout))
+    
+    async def execute_async(self, command: str, working_directory: str = ".", timeout: Optional[float] = None,
+                            on_output: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Execute shell command without blocking the event loop
+        
+        Args:
+            command: Shell command line
+            working_directory: Directory to run it in
+            timeout: Seconds before the command is killed; defaults to the
+                tool's timeout, and 0 disables it
+            on_output: Called with ("stdout" or "stderr", text) as output
+                arrives
+        
+        Returns:
+            Result dictionary; output beyond max_output_chars per stream is
+            cut from the middle
+        """
+        timeout = self.timeout if timeout is None else timeout
+        stdout = OutputBuffer(self.max_output_chars)
+        stderr = OutputBuffer(self.max_output_chars)
+        
         try:
-            result = subprocess.run(
+            process = await asyncio.create_subprocess_shell(
                 command,
-                shell=True,
                 cwd=working_directory,
-                capture_output=True,
-                text=True,
-                timeout=30  # 30 second timeout
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                # Own process group, so a timeout also stops the command's children
+                start_new_session=os.name == "posix"
             )
-            
-            output = []
-            if result.stdout:
-                output.append("STDOUT:")
-                output.append(result.stdout)
-            
-            if result.stderr:
-                output.append("STDERR:")
-                output.append(result.stderr)
-            
-            output.append(f"Return code: {result.returncode}")
-            
-            return {
-                "success": result.returncode == 0,
-                "result": "\\n".join(output),
-                "return_code": result.returncode
-            }
-            
-        except subprocess.TimeoutExpired:
+        except Exception as e:
             return {
                 "success": False,
-                "error": f"Command timed out after 30 seconds: {command}"
+                "error": f"Failed to execute command '{command}': {str(e)}"
             }
-        except Exception as e:
+        
+        readers = [
+            asyncio.create_task(_pump_stream(process.stdout, "stdout", stdout, on_output)),
+            asyncio.create_task(_pump_stream(process.stderr, "stderr", stderr, on_output))
+        ]
+        try:
+            _, pending = await asyncio.wait(readers, timeout=timeout or None)
+            if pending:
+                _kill_process(process)
+                # Pipes close once the process group is gone
+                _, pending = await asyncio.wait(pending, timeout=5)
+                for reader in pending:
+                    reader.cancel()
+                await process.wait()
+                return {
+                    "success": False,
+                    "error": f"Command timed out after {timeout:g} seconds: {command}",
+                    "result": _format_output(stdout, stderr, None)
+                }
+            return_code = await process.wait()
+        except asyncio.CancelledError:
+            _kill_process(process)
+            for reader in readers:
+                reader.cancel()
+            raise
+        
+        return {
+            "success": return_code == 0,
+            "result": _format_output(stdout, stderr, return_code),
+            "return_code": return_code,
+            "truncated": bool(stdout.dropped or stderr.dropped)
+        }
+
+
+async def _pump_stream(stream: asyncio.StreamReader, name: str, buffer: OutputBuffer,
+                       on_output: Optional[Callable[[str, str], None]]):
+    """Copy a process pipe into a buffer, decoding incrementally"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    while True:
+        data = await stream.read(COMMAND_READ_SIZE)
+        text = decoder.decode(data, final=not data)
+        if text:
+            buffer.write(text)
+            if on_output:
+                on_output(name, text)
+        if not data:
+            break
+
+
+def _kill_process(process: asyncio.subprocess.Process):
+    """Kill a command and, on POSIX, everything it started"""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _clip_line(line: str, pattern: re.Pattern) -> str:
+    """Shorten a matching line to MATCH_LINE_MAX characters around its first match"""
+    if len(line) <= MATCH_LINE_MAX:
+        return line
+    match = pattern.search(line)
+    start = match.start() - MATCH_LINE_MAX // 3 if match else 0
+    start = max(0, min(start, len(line) - MATCH_LINE_MAX))
+    end = start + MATCH_LINE_MAX
+    return ("…" if start else "") + line[start:end] + ("…" if end < len(line) else "")
+
+
+class FetchOutputTool(Tool):
+    """Read part of a tool output that was too long to return in full"""
+    
+    # Fetched windows are cut without spilling them again
+    spill = False
+    
+    def __init__(self, store: SpilloverStore):
+        """Initialize the tool
+        
+        Args:
+            store: Store holding the full outputs
+        """
+        super().__init__()
+        self.store = store
+    
+    def execute(self, ref: str, offset: int = 1, limit: int = FETCH_DEFAULT_LIMIT, **kwargs) -> Dict[str, Any]:
+        """Fetch lines of a spilled output
+        
+        Args:
+            ref: Reference from the elision marker, e.g. "out-1a2b3c4d5e6f7a8b"
+            offset: First line to return, counting from 1
+            limit: Maximum number of lines to return
+        """
+        text = self.store.get(ref)
+        if text is None:
             return {
                 "success": False,
-                "error": f"Failed to execute command '{command}': {str(e)}"
+                "error": f"Output '{ref}' not found; it may have expired"
             }
+        
+        lines = split_lines(text)
+        first_line = max(1, offset)
+        window = lines[first_line - 1:first_line - 1 + max(0, limit)]
+        return {
+            "success": True,
+            "result": "".join(window),
+            "start_line": first_line,
+            "end_line": first_line + len(window) - 1,
+            "total_lines": len(lines)
+        }
+
+
+def _format_output(stdout: OutputBuffer, stderr: OutputBuffer, return_code: Optional[int]) -> str:
+    output = []
+    if stdout.head:
+        output.append("STDOUT:")
+        output.append(stdout.getvalue())
+    
+    if stderr.head:
+        output.append("STDERR:")
+        output.append(stderr.getvalue())
+    
+    if return_code is not None:
+        output.append(f"Return code: {return_code}")
+    
+    return "\n".join(output)
 
 
 class ToolRegistry:
     """Registry for managing tools"""
     
-    def __init__(self):
+    def __init__(self, cache_bytes: int = TOOL_CACHE_BYTES, spillover: Optional[SpilloverStore] = None,
+                 data_directory: Optional[Path] = None):
+        """Initialize the registry
+        
+        Args:
+            cache_bytes: Size bound for memoized read-only results; 0 disables memoization
+            spillover: Store for outputs over their tool's budget; a
+                temporary one is used if not given
+            data_directory: Alang data directory, holding the search index;
+                the default configuration's is used if not given
+        """
         self.tools = {}
+        self.result_cache = ToolResultCache(cache_bytes) if cache_bytes > 0 else None
+        self.spillover = spillover or SpilloverStore()
+        self.data_directory = Path(data_directory) if data_directory else None
         self._register_default_tools()
     
     def _register_default_tools(self):
         """Register default tools"""
+        index_path = self.data_directory / "search_index.db" if self.data_directory else None
         default_tools = [
             ReadFileTool(),
             WriteFileTool(),
             ListFilesTool(),
             SearchFilesTool(),
-            SearchInFilesTool(),
-            ExecuteCommandTool()
+            SearchInFilesTool(index_path),
+            ExecuteCommandTool(),
+            FetchOutputTool(self.spillover)
         ]
         
         for tool in default_tools:
@@ -308,8 +949,31 @@ class ToolRegistry:
             for name, tool in self.tools.items()
         ]
     
+    def get_declarations(self, mode: str = "read-only") -> List[Dict[str, Any]]:
+        """Get Gemini function declarations for the tools a mode allows
+        
+        Args:
+            mode: "read-only" for tools that only inspect, "all" for every
+                tool, or "off" for none
+        
+        Returns:
+            List of function declaration dictionaries
+        """
+        return [tool.get_declaration() for tool in self.tools.values() if self.is_allowed(tool.name, mode)]
+    
+    def is_allowed(self, name: str, mode: str) -> bool:
+        """Check whether a tool may run under a mode"""
+        tool = self.get_tool(name)
+        if not tool or mode == "off":
+            return False
+        return mode == "all" or tool.read_only
+    
     def execute_tool(self, name: str, **kwargs) -> Dict[str, Any]:
-        """Execute a tool by name"""
+        """Execute a tool by name
+        
+        Output over the tool's budget is cut to its head and tail; the full
+        text is kept in the spillover store for fetchoutput.
+        """
         tool = self.get_tool(name)
         if not tool:
             return {
@@ -317,7 +981,97 @@ class ToolRegistry:
                 "error": f"Tool '{name}' not found"
             }
         
-        return tool.execute(**kwargs)
+        return self._apply_budget(tool, self._execute(tool, kwargs))
+    
+    def _execute(self, tool: Tool, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a tool
+        
+        Successful read-only results are memoized by tool and arguments
+        until a file they were computed from changes or a tool with side
+        effects runs.
+        """
+        name = tool.name
+        try:
+            if not tool.read_only or not self.result_cache:
+                try:
+                    return tool.execute(**kwargs)
+                finally:
+                    if not tool.read_only:
+                        self.invalidate()
+            
+            key = self._cache_key(tool, kwargs)
+            if key is None:
+                return tool.execute(**kwargs)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return dict(cached)
+            
+            started_ns = time.time_ns()
+            result, paths = tool.execute_with_dependencies(**kwargs)
+            if paths is not None and result.get("success"):
+                self.result_cache.put(key, result, paths, started_ns)
+            return result
+        except TypeError as e:
+            # The model passed arguments that don't fit the signature
+            return {
+                "success": False,
+                "error": f"Invalid arguments for tool '{name}': {str(e)}"
+            }
+    
+    def invalidate(self) -> None:
+        """Drop memoized results and other file-derived state, after files may have changed"""
+        if self.result_cache:
+            self.result_cache.clear()
+        for tool in self.tools.values():
+            tool.invalidate()
+    
+    def _apply_budget(self, tool: Tool, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Cut a result's output to the tool's budget, spilling the full text"""
+        output = result.get("result")
+        if tool.output_budget is None or not isinstance(output, str) or len(output) <= tool.output_budget:
+            return result
+        
+        ref = None
+        if tool.spill:
+            try:
+                ref = self.spillover.put(output)
+            except OSError:
+                # Without a spill the output is still cut, just not fetchable
+                pass
+        output, elided_lines, elided_characters = truncate_output(output, tool.output_budget, ref)
+        result = dict(result, result=output, output_truncated=True, elided_lines=elided_lines,
+                      elided_characters=elided_characters)
+        if ref:
+            result["output_ref"] = ref
+        return result
+    
+    def _cache_key(self, tool: Tool, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Build the memoization key of a call, with defaults filled in so equivalent calls share it"""
+        try:
+            bound = inspect.signature(tool.execute).bind(**kwargs)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        return ToolResultCache.make_key(tool.name, bound.arguments)
+    
+    def execute_calls(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Execute a batch of tool calls, concurrently when that is safe
+        
+        Calls from one model turn are independent, so read-only calls run in
+        a thread pool. A batch containing a tool with side effects runs in
+        order instead, so a write is never raced by a read of the same file.
+        
+        Args:
+            calls: List of (tool name, arguments) pairs
+        
+        Returns:
+            Results in the same order as calls
+        """
+        if len(calls) <= 1 or not all(self.is_allowed(name, "read-only") for name, _ in calls):
+            return [self.execute_tool(name, **args) for name, args in calls]
+        
+        with ThreadPoolExecutor(max_workers=min(len(calls), TOOL_WORKERS), thread_name_prefix="alang-tool") as pool:
+            return list(pool.map(lambda call: self.execute_tool(call[0], **call[1]), calls))
 
 
 # Global tool registry instance
@@ -0,0 +1,322 @@
+"""
+Concurrent, ignore-aware directory walking for Alang tools
+"""
+
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+
+# Threads listing directories at once; stat calls dominate and release the GIL
+WALK_WORKERS = 8
+
+# Directories and files never worth walking into, ignore files or not
+DEFAULT_EXCLUDES = {
+    ".git", ".hg", ".svn",
+    "node_modules", "bower_components",
+    "__pycache__", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox",
+    ".venv", "venv", ".eggs",
+    "build", "dist", "target",
+    ".idea", ".vscode", ".DS_Store",
+}
+
+# Per-directory files whose patterns are honored
+IGNORE_FILES = (".gitignore", ".ignore")
+
+# Bytes read from the start of a file to decide whether it is binary
+BINARY_SNIFF_SIZE = 8192
+
+
+class IgnoreFile:
+    """Patterns from one .gitignore or .ignore file"""
+    
+    def __init__(self, base: str, lines: List[str]):
+        """Initialize from the lines of an ignore file
+        
+        Args:
+            base: Directory containing the ignore file
+            lines: Lines of the file
+        """
+        self.base = base
+        self.rules: List[Tuple[re.Pattern, bool, bool, bool]] = []
+        for line in lines:
+            rule = _parse_rule(line)
+            if rule:
+                self.rules.append(rule)
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["IgnoreFile"]:
+        """Load an ignore file, or return None if it does not exist or has no rules"""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                ignore_file = cls(os.path.dirname(path), f.read().splitlines())
+        except OSError:
+            return None
+        return ignore_file if ignore_file.rules else None
+    
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """Match a path relative to this file's directory
+        
+        Returns:
+            True if ignored, False if re-included by a negated pattern, or
+            None if no pattern applies
+        """
+        name = rel_path.rsplit("/", 1)[-1]
+        result = None
+        for regex, negated, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                result = not negated
+        return result
+
+
+class IgnoreRules:
+    """The ignore files that apply inside one directory, outermost first"""
+    
+    def __init__(self, files: Tuple[IgnoreFile, ...] = (), include_hidden: bool = False,
+                 use_default_excludes: bool = True):
+        self.files = files
+        self.include_hidden = include_hidden
+        self.use_default_excludes = use_default_excludes
+    
+    @classmethod
+    def for_directory(cls, directory: str, include_hidden: bool = False,
+                      use_default_excludes: bool = True) -> "IgnoreRules":
+        """Collect ignore files from the enclosing repository down to a directory
+        
+        Ignore files above the directory are read up to the nearest ancestor
+        holding a .git entry, the way git applies them.
+        
+        Args:
+            directory: Directory about to be listed or walked
+            include_hidden: Keep entries whose names start with a dot
+            use_default_excludes: Skip DEFAULT_EXCLUDES
+        """
+        directory = os.path.abspath(directory)
+        chain = [directory]
+        parent = directory
+        while not os.path.exists(os.path.join(parent, ".git")):
+            parent, child = os.path.dirname(parent), parent
+            if parent == child:
+                # Not in a repository: only the directory's own files apply
+                chain = [directory]
+                break
+            chain.append(parent)
+        
+        rules = cls((), include_hidden, use_default_excludes)
+        for path in reversed(chain):
+            rules = rules.child(path)
+        return rules
+    
+    def child(self, directory: str) -> "IgnoreRules":
+        """Get the rules for a subdirectory, adding its own ignore files"""
+        added = tuple(
+            ignore_file for ignore_file in (IgnoreFile.load(os.path.join(directory, name)) for name in IGNORE_FILES)
+            if ignore_file
+        )
+        if not added:
+            return self
+        return IgnoreRules(self.files + added, self.include_hidden, self.use_default_excludes)
+    
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """Check whether a directory entry should be skipped"""
+        name = os.path.basename(path)
+        if not self.include_hidden and name.startswith("."):
+            return True
+        if self.use_default_excludes and name in DEFAULT_EXCLUDES:
+            return True
+        
+        ignored = False
+        for ignore_file in self.files:
+            rel_path = os.path.relpath(path, ignore_file.base).replace(os.sep, "/")
+            result = ignore_file.match(rel_path, is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+
+def walk_files(root: str, workers: int = WALK_WORKERS, include_hidden: bool = False, respect_ignore: bool = True,
+               skip_binary: bool = False, max_file_size: Optional[int] = None,
+               max_depth: Optional[int] = None, listed: Optional[List[str]] = None,
+               deadline: Optional[float] = None,
+               include_directories: bool = False) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (path, stat) for every regular file below a directory
+    
+    Directories are listed concurrently and files are yielded as soon as
+    their directory has been read, in no particular order. Closing the
+    generator or reaching the deadline stops the walk; callers tell the two
+    endings apart by checking the clock themselves.
+    
+    Args:
+        root: Directory to walk
+        workers: Number of directories listed concurrently
+        include_hidden: Walk entries whose names start with a dot
+        respect_ignore: Honor .gitignore/.ignore files and DEFAULT_EXCLUDES
+        skip_binary: Skip files whose first bytes look binary
+        max_file_size: Skip files larger than this many bytes
+        max_depth: Deepest directory level to list, 0 being root itself
+        listed: List receiving every directory that was listed
+        deadline: time.monotonic() value at which to stop walking
+        include_directories: Also yield the subdirectories found, including
+            those below max_depth that are not listed themselves
+    
+    Yields:
+        Tuples of (path, stat result)
+    """
+    if respect_ignore:
+        rules = IgnoreRules.for_directory(root, include_hidden)
+    else:
+        rules = IgnoreRules((), include_hidden, use_default_excludes=False)
+    options = (respect_ignore, skip_binary, max_file_size)
+    
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alang-walk")
+    pending = {executor.submit(_scan_directory, root, rules, 0, *options)}
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            for future in done:
+                directory, files, directories, depth = future.result()
+                if listed is not None:
+                    listed.append(directory)
+                if max_depth is None or depth < max_depth:
+                    for subdirectory, subdirectory_rules in directories:
+                        pending.add(executor.submit(
+                            _scan_directory, subdirectory, subdirectory_rules, depth + 1, *options
+                        ))
+                yield from files
+                if include_directories:
+                    for subdirectory, _ in directories:
+                        try:
+                            yield subdirectory, os.stat(subdirectory)
+                        except OSError:
+                            continue
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def is_binary_file(path: str) -> bool:
+    """Check whether a file looks binary from its first BINARY_SNIFF_SIZE bytes"""
+    try:
+        with open(path, "rb") as f:
+            return looks_binary(f.read(BINARY_SNIFF_SIZE))
+    except OSError:
+        return False
+
+
+def looks_binary(data: bytes) -> bool:
+    """Check whether a chunk of file data looks binary
+    
+    Text files essentially never contain NUL bytes, while nearly every
+    binary format does within its first few kilobytes.
+    """
+    return b"\0" in data[:BINARY_SNIFF_SIZE]
+
+
+def _scan_directory(directory: str, rules: IgnoreRules, depth: int, respect_ignore: bool, skip_binary: bool,
+                    max_file_size: Optional[int]) -> Tuple[str, List, List, int]:
+    """List one directory
+    
+    Returns:
+        The directory, its files as (path, stat), its subdirectories as
+        (path, rules inherited by them), and its depth
+    """
+    if respect_ignore and depth:
+        rules = rules.child(directory)
+    
+    files = []
+    directories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if rules.is_ignored(entry.path, is_dir):
+                        continue
+                    if is_dir:
+                        directories.append((entry.path, rules))
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        if max_file_size is not None and stat.st_size > max_file_size:
+                            continue
+                        if skip_binary and is_binary_file(entry.path):
+                            continue
+                        files.append((entry.path, stat))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return directory, files, directories, depth
+
+
+def _parse_rule(line: str) -> Optional[Tuple[re.Pattern, bool, bool, bool]]:
+    """Translate one gitignore line into (regex, negated, dir_only, anchored)"""
+    line = line.rstrip("\n")
+    if not line.endswith("\\ "):
+        line = line.rstrip()
+    if not line or line.startswith("#"):
+        return None
+    
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    
+    # A slash anywhere but the end ties the pattern to the ignore file's directory
+    anchored = "/" in line
+    line = line.lstrip("/")
+    return re.compile(translate_glob(line) + r"\Z"), negated, dir_only, anchored
+
+
+def translate_glob(pattern: str) -> str:
+    """Translate a gitignore-style glob into a regular expression
+    
+    "*" and "?" stop at slashes, "**" spans any number of directories.
+    """
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape("["))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
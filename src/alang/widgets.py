@@ -2,13 +2,24 @@
 Custom widgets for Alang TUI
 """
 
-from textual.containers import Vertical, Horizontal
+from textual.containers import Vertical, Horizontal, VerticalScroll
 from textual.widgets import TextArea, Input, Static
 from textual.reactive import reactive
 from textual.message import Message
-from rich.markdown import Markdown
+from rich.console import Console, ConsoleOptions, Group
+from rich.segment import Segment
 from rich.text import Text
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 import asyncio
+import re
+
+
+# Opening run of a fenced code block; the closing run must be at least as long
+FENCE = re.compile(r"(`{3,}|~{3,})")
+
+# Reference-style link definition, e.g. "[docs]: https://example.com"
+LINK_DEFINITION = re.compile(r"^ {0,3}\[[^\]\n]+\]:[ \t]*\S[^\n]*$", re.MULTILINE)
 
 
 class MessageSubmitted(Message):
@@ -18,15 +29,184 @@ class MessageSubmitted(Message):
         self.message = message
 
 
+class MarkdownBlock:
+    """Renderable for one top-level markdown block
+    
+    Finished blocks never change, so their rendered lines are cached by
+    content hash and width; re-rendering a message while a reply streams in
+    only parses the block that is still open.
+    """
+    
+    # Rendered lines kept across all messages, keyed by (content hash, width)
+    CACHE_SIZE = 1024
+    _cache: "OrderedDict[Tuple[int, int], List[List[Segment]]]" = OrderedDict()
+    
+    def __init__(self, text: str, cache: bool = True):
+        self.text = text
+        self.cache = cache
+    
+    def __rich_console__(self, console: Console, options: ConsoleOptions):
+        options = options.update(height=None)
+        key = (hash(self.text), options.max_width)
+        lines = self._cache.get(key) if self.cache else None
+        if lines is None:
+            # Imported on first render; markdown-it adds noticeably to startup
+            from rich.markdown import Markdown
+            lines = _strip_blank_lines(console.render_lines(Markdown(self.text), options, pad=False))
+            if self.cache:
+                self._cache[key] = lines
+                while len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        
+        new_line = Segment.line()
+        for line in lines:
+            yield from line
+            yield new_line
+
+
+def _strip_blank_lines(lines: List[List[Segment]]) -> List[List[Segment]]:
+    """Drop the unstyled blank lines Markdown puts around a block"""
+    def is_blank(line: List[Segment]) -> bool:
+        return all(not segment.text.strip() and not (segment.style and segment.style.bgcolor) for segment in line)
+    
+    start, end = 0, len(lines)
+    while start < end and is_blank(lines[start]):
+        start += 1
+    while end > start and is_blank(lines[end - 1]):
+        end -= 1
+    return lines[start:end]
+
+
+def split_markdown_blocks(text: str) -> Tuple[List[str], str, bool]:
+    """Split finished top-level blocks off the front of streaming markdown
+    
+    A block is finished once a blank line outside a code fence is followed
+    by an unindented line; indented lines may still continue a list item,
+    and the last line may still be growing.
+    
+    Args:
+        text: Markdown received so far
+    
+    Returns:
+        The finished blocks, the open tail, and whether the tail ends inside
+        an unclosed code fence
+    """
+    lines = text.split("\n")
+    blocks = []
+    fence = None
+    block_start = 0
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if fence:
+            # Closed by a bare run of the same character, at least as long
+            if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                fence = None
+            continue
+        match = FENCE.match(stripped)
+        if match:
+            fence = match.group(1)
+            continue
+        
+        if i < len(lines) - 1 and not stripped and lines[i + 1][:1] not in ("", " ", "\t"):
+            block = "\n".join(lines[block_start:i]).strip("\n")
+            if block:
+                blocks.append(block)
+            block_start = i + 1
+    
+    tail = "\n".join(lines[block_start:]) if block_start else text
+    return blocks, tail, fence is not None
+
+
+def link_definitions(text: str) -> str:
+    """Get the reference-style link definitions in markdown, one per line"""
+    return "\n".join(match.group(0).strip() for match in LINK_DEFINITION.finditer(text))
+
+
+def with_link_definitions(block: str, definitions: str) -> Optional[str]:
+    """Prepare a block for rendering on its own
+    
+    Reference-style link definitions apply to a whole message, so they are
+    copied into every block that may use one.
+    
+    Args:
+        block: Markdown block
+        definitions: The message's link definitions, from link_definitions
+    
+    Returns:
+        Text to render, or None for a block of nothing but definitions
+    """
+    if not definitions:
+        return block
+    if not LINK_DEFINITION.sub("", block).strip():
+        return None
+    return f"{block}\n\n{definitions}" if "[" in block else block
+
+
 class MessageDisplay(Static):
     """Display a single message"""
     
     def __init__(self, role: str, content: str, **kwargs):
         super().__init__(**kwargs)
         self.role = role
-        self.content = content
+        self.raw_content = content
+        
+        # Assistant markdown is split into finished blocks and the open tail;
+        # link definitions in finished blocks are collected as they finish
+        self._blocks: List[str] = []
+        self._block_definitions: List[str] = []
+        self._tail = content
+        self._tail_fenced = False
+        self._split_blocks()
+        self._update_display()
+    
+    def append_content(self, chunk: str):
+        """Append a streamed chunk to the message and re-render it"""
+        self.raw_content += chunk
+        self._tail += chunk
+        self._split_blocks()
+        self._update_display()
+    
+    def set_content(self, content: str):
+        """Replace the message content and re-render it"""
+        self.raw_content = content
+        self._blocks = []
+        self._block_definitions = []
+        self._tail = content
+        self._split_blocks()
         self._update_display()
     
+    def _split_blocks(self):
+        """Move blocks that can no longer change from the tail into _blocks"""
+        blocks, self._tail, self._tail_fenced = split_markdown_blocks(self._tail)
+        self._blocks.extend(blocks)
+        for block in blocks:
+            definitions = link_definitions(block)
+            if definitions:
+                self._block_definitions.append(definitions)
+    
+    def _link_definitions(self) -> str:
+        """Get the message's link definitions, scanning only the open tail"""
+        return "\n".join(filter(None, [*self._block_definitions, link_definitions(self._tail)]))
+    
+    def _render_markdown(self) -> Group:
+        """Build the assistant renderable from cached blocks and the open tail"""
+        definitions = self._link_definitions()
+        renderables = []
+        for block in self._blocks:
+            text = with_link_definitions(block, definitions)
+            if text is not None:
+                renderables.append(MarkdownBlock(text))
+                renderables.append(Text())
+        # Definitions appended to an unclosed fence would show up as code
+        tail = self._tail if self._tail_fenced else with_link_definitions(self._tail, definitions)
+        if tail and tail.strip():
+            renderables.append(MarkdownBlock(tail, cache=False))
+        elif renderables:
+            renderables.pop()
+        return Group(*renderables)
+    
     def _update_display(self):
         """Update the display based on role and content"""
         if self.role == "user":
@@ -35,56 +215,237 @@ class MessageDisplay(Static):
             self.styles.padding = (1, 1)
             
             # Simple text display for user messages
-            self.update(f"👤 **You:**\n{self.content}")
+            self.update(f"👤 **You:**\n{self.raw_content}")
             
         elif self.role == "assistant":
             self.styles.background = "$primary"
             self.styles.margin = (1, 0)
             self.styles.padding = (1, 1)
             
-            # Render markdown for assistant messages
+            # Render markdown for assistant messages, re-parsing only the open block
             try:
-                markdown = Markdown(self.content)
-                self.update(markdown)
+                self.update(self._render_markdown())
             except:
-                self.update(f"🤖 **Alang:**\n{self.content}")
+                self.update(f"🤖 **Alang:**\n{self.raw_content}")
+                
+        elif self.role == "command":
+            self.styles.background = "$surface"
+            self.styles.margin = (1, 0)
+            self.styles.padding = (1, 1)
+            
+            # Command output is shown verbatim; it may contain markup-like brackets
+            self.update(Text(f"💻 {self.raw_content}"))
                 
         elif self.role == "system":
             self.styles.background = "$error"
             self.styles.margin = (1, 0)
             self.styles.padding = (1, 1)
-            self.update(f"🔧 **System:**\n{self.content}")
+            self.update(f"🔧 **System:**\n{self.raw_content}")
 
 
-class ChatContainer(Vertical):
-    """Container for chat messages"""
+class ChatContainer(VerticalScroll):
+    """Virtualized container for chat messages
+    
+    Every message is kept as a lightweight record, but only a sliding window
+    of records near the viewport is mounted as MessageDisplay widgets. Pages
+    are mounted as the user scrolls towards either edge and unmounted once
+    they fall outside the window, so layout and memory stay bounded no
+    matter how long the session grows.
+    """
+    
+    # Maximum number of MessageDisplay widgets mounted at once
+    WINDOW_SIZE = 60
+    # Records mounted or loaded per scroll step
+    PAGE_SIZE = 20
+    # Distance in lines from an edge that triggers paging
+    EDGE_THRESHOLD = 2
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.messages = []
+        self.records: List[Dict] = []
         self.thinking = reactive(False)
+        self._thinking_display = None
+        
+        # Mounted widgets cover records[_window_start:_window_start + len(_mounted)]
+        self._mounted: List[MessageDisplay] = []
+        self._window_start = 0
+        self._paging = False
+        
+        # Fetches records older than a message id from storage, oldest first
+        self._history_loader: Optional[Callable[[int], List[Dict]]] = None
     
-    def compose(self):
-        """Compose the chat container"""
-        yield Vertical(id="messages-container")
+    @property
+    def messages(self) -> List[Dict]:
+        """All message records, mounted or not"""
+        return self.records
     
-    def add_message(self, role: str, content: str):
-        """Add a new message to the chat"""
-        message_display = MessageDisplay(role, content)
-        self.messages.append(message_display)
+    def set_history_loader(self, loader: Optional[Callable[[int], List[Dict]]]):
+        """Set the callback used to fetch older messages on demand
         
-        # Add to container
-        container = self.query_one("#messages-container", Vertical)
-        container.mount(message_display)
+        Args:
+            loader: Called with the id of the oldest loaded message; returns
+                up to a page of older messages (dicts with id, role and
+                content) in chronological order, or an empty list when there
+                are none left
+        """
+        self._history_loader = loader
+    
+    def add_message(self, role: str, content: str, message_id: Optional[int] = None) -> Dict:
+        """Add a new message to the chat
+        
+        Returns:
+            The message's record, for append_to_message and update_message;
+            its widget may be unmounted and rebuilt as the user pages
+        """
+        record = {"id": message_id, "role": role, "content": content}
+        self.records.append(record)
+        
+        # New messages always bring the view back to the end of the transcript
+        if self._window_end < len(self.records) - 1:
+            self._reset_window()
+        else:
+            self._mount_records(len(self.records) - 1, len(self.records))
+            self._trim_window(keep_end=True)
         
         # Scroll to bottom
         self.scroll_end(animate=True)
+        
+        return record
+    
+    def append_to_message(self, record: Dict, chunk: str):
+        """Append a streamed chunk to a message already in the chat"""
+        record["content"] += chunk
+        message_display = self._display_for(record)
+        if message_display is not None:
+            message_display.append_content(chunk)
+            self.scroll_end(animate=False)
+    
+    def update_message(self, record: Dict, content: str):
+        """Replace the content of a message already in the chat"""
+        record["content"] = content
+        message_display = self._display_for(record)
+        if message_display is not None:
+            message_display.set_content(content)
+            self.scroll_end(animate=False)
     
     def clear_messages(self):
         """Clear all messages"""
-        container = self.query_one("#messages-container", Vertical)
-        container.remove_children()
-        self.messages = []
+        self.remove_children(self._mounted)
+        self._mounted = []
+        self._window_start = 0
+        self.records = []
+        self._history_loader = None
+    
+    @property
+    def _window_end(self) -> int:
+        return self._window_start + len(self._mounted)
+    
+    def _display_for(self, record: Dict) -> Optional[MessageDisplay]:
+        """Get the mounted widget showing a record, or None if it is paged out"""
+        for message_display in reversed(self._mounted):
+            if message_display.record is record:
+                return message_display
+        return None
+    
+    def _create_display(self, record: Dict) -> MessageDisplay:
+        message_display = MessageDisplay(record["role"], record["content"])
+        message_display.record = record
+        return message_display
+    
+    def _mount_records(self, start: int, end: int, before: bool = False):
+        """Mount records[start:end] at the top or bottom of the window"""
+        displays = [self._create_display(record) for record in self.records[start:end]]
+        if not displays:
+            return
+        
+        if before and self._mounted:
+            self.mount_all(displays, before=self._mounted[0])
+            self._mounted[:0] = displays
+            self._window_start = start
+        else:
+            if not self._mounted:
+                self._window_start = start
+            anchor = {"before": self._thinking_display} if self._thinking_display is not None else {}
+            self.mount_all(displays, **anchor)
+            self._mounted.extend(displays)
+    
+    def _trim_window(self, keep_end: bool):
+        """Unmount widgets beyond WINDOW_SIZE from the edge away from the viewport"""
+        excess = len(self._mounted) - self.WINDOW_SIZE
+        if excess <= 0:
+            return
+        
+        if keep_end:
+            removed, self._mounted = self._mounted[:excess], self._mounted[excess:]
+            self._window_start += excess
+        else:
+            removed, self._mounted = self._mounted[-excess:], self._mounted[:-excess]
+        self.remove_children(removed)
+    
+    def _reset_window(self):
+        """Remount the window so it ends at the newest record"""
+        self.remove_children(self._mounted)
+        self._mounted = []
+        start = max(0, len(self.records) - self.WINDOW_SIZE)
+        self._mount_records(start, len(self.records))
+    
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        if self._paging or not self._mounted:
+            return
+        
+        if new_value < old_value and new_value <= self.EDGE_THRESHOLD:
+            self._page_up()
+        elif new_value > old_value and new_value >= self.max_scroll_y - self.EDGE_THRESHOLD:
+            self._page_down()
+    
+    def _page_up(self):
+        """Mount the page above the window, loading it from storage if needed"""
+        if self._window_start == 0 and not self._load_older():
+            return
+        
+        anchor = self._mounted[0]
+        old_y = anchor.virtual_region.y
+        start = max(0, self._window_start - self.PAGE_SIZE)
+        self._paging = True
+        self._mount_records(start, self._window_start, before=True)
+        self._trim_window(keep_end=False)
+        self.call_after_refresh(self._restore_anchor, anchor, old_y)
+    
+    def _page_down(self):
+        """Mount the page below the window"""
+        if self._window_end >= len(self.records):
+            return
+        
+        anchor = self._mounted[-1]
+        old_y = anchor.virtual_region.y
+        end = min(len(self.records), self._window_end + self.PAGE_SIZE)
+        self._paging = True
+        self._mount_records(self._window_end, end)
+        self._trim_window(keep_end=True)
+        self.call_after_refresh(self._restore_anchor, anchor, old_y)
+    
+    def _restore_anchor(self, anchor: MessageDisplay, old_y: int):
+        """Keep the anchor widget at the same screen position after paging"""
+        self.scroll_to(y=self.scroll_y + anchor.virtual_region.y - old_y, animate=False)
+        self._paging = False
+    
+    def _load_older(self) -> bool:
+        """Prepend the next page of older messages from the history loader"""
+        if self._history_loader is None or not self.records or self.records[0]["id"] is None:
+            return False
+        
+        older = self._history_loader(self.records[0]["id"])
+        if not older:
+            self._history_loader = None
+            return False
+        
+        self.records[:0] = [
+            {"id": msg["id"], "role": msg["role"], "content": msg["content"]}
+            for msg in older
+        ]
+        self._window_start += len(older)
+        return True
     
     def set_thinking(self, is_thinking: bool):
         """Set thinking state"""
@@ -92,16 +453,15 @@ class ChatContainer(Vertical):
         
         if is_thinking:
             # Add thinking indicator
-            thinking_msg = MessageDisplay("system", "🤔 *Thinking...*")
-            container = self.query_one("#messages-container", Vertical)
-            container.mount(thinking_msg)
-            self.scroll_end(animate=True)
+            if self._thinking_display is None:
+                self._thinking_display = MessageDisplay("system", "🤔 *Thinking...*")
+                self.mount(self._thinking_display)
+                self.scroll_end(animate=True)
         else:
             # Remove thinking indicator
-            container = self.query_one("#messages-container", Vertical)
-            children = container.children
-            if children and "Thinking..." in str(children[-1]):
-                children[-1].remove()
+            if self._thinking_display is not None:
+                self._thinking_display.remove()
+                self._thinking_display = None
     
     def watch_thinking(self, is_thinking: bool):
         """Watch for thinking state changes"""
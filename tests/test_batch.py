@@ -0,0 +1,48 @@
+"""
+Tests for headless batch mode
+"""
+
+import asyncio
+import io
+import json
+
+from alang.batch import read_prompts, run_batch
+
+
+class EchoClient:
+    """Client answering each prompt with its upper-cased text"""
+    
+    async def agenerate_response(self, message, history=None, raise_errors=False):
+        if message == "fail":
+            raise RuntimeError("model failed")
+        return message.upper()
+
+
+def run(lines, concurrency=2):
+    output = io.StringIO()
+    summary = asyncio.run(run_batch(EchoClient(), io.StringIO("\n".join(lines) + "\n"), output, concurrency))
+    return summary, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_read_prompts_accepts_objects_and_strings():
+    records = list(read_prompts(io.StringIO('"hi"\n\n{"prompt": "a", "id": "x"}\n{"message": "b"}\n')))
+    assert records == [
+        (0, {"id": 0, "prompt": "hi"}),
+        (1, {"id": "x", "prompt": "a"}),
+        (2, {"id": 2, "prompt": "b"})
+    ]
+
+
+def test_invalid_lines_become_error_records_in_order():
+    summary, results = run(['"hi"', "5", "[1, 2]", '{"id": "no-prompt"}', "{bad", '{"prompt": "fail"}', '"bye"'])
+    
+    assert [result["index"] for result in results] == list(range(7))
+    assert results[0]["response"] == "HI"
+    assert "expected a JSON object or string" in results[1]["error"]
+    assert "expected a JSON object or string" in results[2]["error"]
+    assert results[3]["id"] == "no-prompt" and "'prompt'" in results[3]["error"]
+    assert "invalid JSON" in results[4]["error"]
+    assert results[5]["error"] == "model failed"
+    assert results[6]["response"] == "BYE"
+    assert summary["requests"] == 7
+    assert summary["errors"] == 5
@@ -0,0 +1,160 @@
+"""
+Tests for the background daemon and its socket protocol
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from alang import daemon
+from alang.config import Config
+
+
+def text_response(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+
+def call_response(name, args):
+    part = types.Part(function_call=types.FunctionCall(name=name, args=args, id="call-0"))
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))])
+
+
+class StubAsyncModels:
+    """Streams "echo: <message>", calling listfiles first when asked to"""
+    
+    async def generate_content_stream(self, model, contents, config):
+        last = contents[-1]["parts"][0]
+        
+        async def chunks():
+            if last.get("text") == "use a tool":
+                yield call_response("listfiles", {"directory": "."})
+            elif "function_response" in last:
+                yield text_response("listed")
+            else:
+                yield text_response("echo: ")
+                yield text_response(last["text"])
+        return chunks()
+
+
+class StubDaemon(daemon.AlangDaemon):
+    def initialize(self):
+        super().initialize()
+        
+        async def aclose():
+            pass
+        self.client.client = SimpleNamespace(aio=SimpleNamespace(models=StubAsyncModels(), aclose=aclose))
+
+
+@pytest.fixture
+def config():
+    # Unix socket paths are limited to about 100 characters, so stay short
+    directory = tempfile.mkdtemp(prefix="alang-")
+    config = Config()
+    config.gemini_api_key = "test-key"
+    config.data_directory = directory
+    yield config
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def running(config):
+    server = StubDaemon(config)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve(),))
+    thread.start()
+    for _ in range(100):
+        if daemon.ping(config.socket_path()):
+            break
+        thread.join(0.05)
+    else:
+        pytest.fail("daemon did not come up")
+    
+    yield server
+    
+    daemon.stop(config.socket_path())
+    thread.join(5)
+    # Let the shutdown request's own connection finish closing
+    pending = asyncio.all_tasks(loop)
+    if pending:
+        loop.run_until_complete(asyncio.wait(pending))
+    loop.close()
+
+
+def events(config, request):
+    async def collect():
+        found = []
+        try:
+            async for event in daemon.request_events(config.socket_path(), request):
+                found.append(event)
+        except RuntimeError as e:
+            found.append({"error": str(e)})
+        return found
+    return asyncio.run(collect())
+
+
+def test_socket_is_owner_only(running, config):
+    assert stat.S_IMODE(os.stat(config.socket_path()).st_mode) == 0o600
+
+
+def test_ping_reports_context(running, config):
+    status = daemon.ping(config.socket_path())
+    assert status["pid"] == os.getpid()
+    assert status["working_directory"] == os.path.realpath(os.getcwd())
+    assert status["tools"] == "read-only"
+    assert status["model"] == config.model
+
+
+def test_ask_streams_chunks_then_done(running, config):
+    request = {"op": "ask", "message": "hello", **daemon.client_context(config)}
+    found = events(config, request)
+    assert found == [{"chunk": "echo: "}, {"chunk": "hello"}, {"done": True, "response": "echo: hello"}]
+
+
+def test_ask_reports_tool_calls(running, config):
+    request = {"op": "ask", "message": "use a tool", **daemon.client_context(config)}
+    found = events(config, request)
+    assert [event.get("tool") for event in found if "tool" in event] == ["listfiles"]
+    assert found[-1] == {"done": True, "response": "listed"}
+
+
+def test_mismatched_context_is_refused(running, config):
+    request = {"op": "ask", "message": "hello", **daemon.client_context(config), "working_directory": "/elsewhere"}
+    [event] = events(config, request)
+    assert "working_directory is '/elsewhere' here" in event["error"]
+    
+    other = Config()
+    other.data_directory = config.data_directory
+    other.tools = "all"
+    assert daemon.attach(other) is None
+
+
+def test_unknown_op_is_an_error(running, config):
+    assert events(config, {"op": "nope"}) == [{"error": "Unknown op 'nope'"}]
+
+
+def test_remote_client_keeps_history(running, config):
+    client = daemon.attach(config)
+    assert isinstance(client, daemon.RemoteGeminiClient)
+    
+    assert "".join(client.stream_response("first")) == "echo: first"
+    assert "".join(client.stream_response("second")) == "echo: second"
+    assert [message["content"] for message in client.history.messages] == [
+        "first", "echo: first", "second", "echo: second"
+    ]
+
+
+def test_ask_without_daemon_runs_in_process(config, monkeypatch):
+    monkeypatch.setattr(daemon, "AlangDaemon", StubDaemon)
+    output = io.StringIO()
+    assert asyncio.run(daemon.ask(config, "local", output=output))
+    assert output.getvalue() == "echo: local\n"
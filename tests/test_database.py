@@ -0,0 +1,237 @@
+"""
+Tests for the SQLite database and its background writer
+"""
+
+import sqlite3
+
+import pytest
+
+from alang.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    db = Database(tmp_path / "alang.db")
+    yield db
+    db.close()
+
+
+def test_unwaited_write_failures_are_reported(database):
+    errors = []
+    database.on_write_error = lambda description, error: errors.append((description, str(error)))
+    
+    assert database.save_message(999, "user", "lost", wait=False) is None
+    database.save_tool_execution(999, "readfile", {}, {"success": True}, True, wait=False)
+    database.flush()
+    
+    assert errors == [
+        ("user message for session 999", "FOREIGN KEY constraint failed"),
+        ("readfile call for session 999", "FOREIGN KEY constraint failed")
+    ]
+
+
+def test_unwaited_writes_commit(database):
+    errors = []
+    database.on_write_error = lambda description, error: errors.append(description)
+    session_id = database.create_session("test")
+    
+    database.save_message(session_id, "user", "hello", wait=False)
+    database.flush()
+    
+    assert [message["content"] for message in database.get_messages(session_id)] == ["hello"]
+    assert errors == []
+
+
+def age_session(database, session_id, minutes):
+    """Make a session look idle for the given number of minutes"""
+    database.writer.submit(lambda conn: conn.execute(
+        "UPDATE sessions SET updated_at = datetime('now', ?) WHERE id = ?", (f"-{minutes} minutes", session_id)
+    )).result()
+
+
+def test_compact_keeps_recent_empty_sessions(database):
+    live = database.create_session("opened by another instance")
+    stale = database.create_session("left empty long ago")
+    age_session(database, stale, 24 * 60)
+    
+    stats = database.compact(vacuum=False)
+    
+    assert stats["sessions_removed"] == 1
+    assert database.get_session(live) is not None
+    assert database.get_session(stale) is None
+    database.save_message(live, "user", "still saved")
+    assert [message["content"] for message in database.get_messages(live)] == ["still saved"]
+
+
+def test_compact_archives_removed_sessions(database, tmp_path):
+    kept = database.create_session("kept")
+    old = database.create_session("old")
+    database.save_message(old, "user", "archive me")
+    database.save_message(kept, "user", "keep me")
+    age_session(database, old, 30 * 24 * 60)
+    
+    stats = database.compact(max_age_days=7, archive_path=tmp_path / "archive.db", vacuum=False)
+    
+    assert stats["sessions_removed"] == 1
+    assert stats["sessions_archived"] == 1
+    assert database.get_session(old) is None
+    archive = sqlite3.connect(tmp_path / "archive.db")
+    assert archive.execute("SELECT content FROM messages").fetchall() == [("archive me",)]
+    archive.close()
+    assert [row["name"] for row in database.conn.execute("PRAGMA database_list")] == ["main"]
+
+
+def test_compact_failure_rolls_back_everything(database, tmp_path):
+    old = database.create_session("old")
+    database.save_message(old, "user", "archive me")
+    age_session(database, old, 30 * 24 * 60)
+    database.save_cached_response("key", "cached")
+    database.writer.submit(
+        lambda conn: conn.execute("UPDATE response_cache SET created_at = datetime('now', '-30 days')")
+    ).result()
+    
+    # An archive whose messages table can't take the rows makes the copy fail midway
+    archive = sqlite3.connect(tmp_path / "archive.db")
+    archive.execute("CREATE TABLE messages (id INTEGER)")
+    archive.close()
+    
+    with pytest.raises(sqlite3.OperationalError):
+        database.compact(max_age_days=7, archive_path=tmp_path / "archive.db", vacuum=False)
+    
+    assert database.get_session(old) is not None
+    assert database.get_cached_response("key") == "cached"
+    archive = sqlite3.connect(tmp_path / "archive.db")
+    assert archive.execute("SELECT name FROM sqlite_master").fetchall() == [("messages",)]
+    archive.close()
+    assert [row["name"] for row in database.conn.execute("PRAGMA database_list")] == ["main"]
+
+
+def test_compact_reports_attach_errors(database, tmp_path):
+    with pytest.raises(sqlite3.OperationalError, match="unable to open"):
+        database.compact(archive_path=tmp_path / "missing" / "archive.db", vacuum=False)
+
+
+def test_claim_empty_session_skips_recent_and_used_sessions(database):
+    assert database.claim_empty_session() is None
+    
+    fresh = database.create_session("fresh")
+    used = database.create_session("used")
+    database.save_message(used, "user", "hi")
+    age_session(database, used, 24 * 60)
+    assert database.claim_empty_session() is None
+    
+    age_session(database, fresh, 24 * 60)
+    assert database.claim_empty_session() == fresh
+
+
+def test_claimed_session_is_not_claimed_twice(database, tmp_path):
+    session_id = database.create_session("left empty")
+    age_session(database, session_id, 24 * 60)
+    other = Database(tmp_path / "alang.db")
+    try:
+        assert database.claim_empty_session() == session_id
+        # The claim stamped the session, so a second instance starts its own
+        assert other.claim_empty_session() is None
+    finally:
+        other.close()
+
+
+def test_plain_connection_can_write_and_delete_messages(database):
+    session_id = database.create_session("test")
+    database.save_message(session_id, "user", "compressed " * 1000)
+    database.close()
+    
+    conn = sqlite3.connect(database.db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("INSERT INTO messages (session_id, role, content) VALUES (?, 'user', 'from another client')",
+                 (session_id,))
+    conn.commit()
+    
+    reopened = Database(database.db_path)
+    try:
+        assert [result["snippet"] for result in reopened.search_messages("client")] == ["from another **client**"]
+    finally:
+        reopened.close()
+    
+    conn.execute("DELETE FROM messages")
+    conn.execute("DELETE FROM sessions")
+    conn.commit()
+    assert conn.execute("SELECT count(*) FROM messages_fts").fetchone()[0] == 0
+    conn.close()
+
+
+def test_compressed_messages_are_searchable(tmp_path):
+    database = Database(tmp_path / "alang.db", compress_threshold=16)
+    try:
+        session_id = database.create_session("test")
+        database.save_message(session_id, "assistant", "a long answer about sqlite triggers")
+        assert database.conn.execute("SELECT encoding FROM messages").fetchone()[0] is not None
+        
+        results = database.search_messages("triggers")
+        assert len(results) == 1
+        assert "**triggers**" in results[0]["snippet"]
+        
+        database.delete_session(session_id)
+        assert database.search_messages("triggers") == []
+    finally:
+        database.close()
+
+
+def test_search_index_migrates_from_external_content(tmp_path):
+    path = tmp_path / "alang.db"
+    database = Database(path, compress_threshold=16)
+    session_id = database.create_session("test")
+    database.save_message(session_id, "user", "short")
+    database.save_message(session_id, "assistant", "compressed answer mentioning migrations")
+    database.close()
+    
+    # Recreate the index the way older versions did
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        DROP TRIGGER messages_fts_insert;
+        DROP TRIGGER messages_fts_delete;
+        DROP TRIGGER messages_fts_update;
+        DROP TABLE messages_fts;
+        CREATE VIEW messages_text AS SELECT id, content FROM messages;
+        CREATE VIRTUAL TABLE messages_fts USING fts5(content, content = 'messages_text', content_rowid = 'id');
+    """)
+    conn.close()
+    
+    database = Database(path)
+    try:
+        assert len(database.search_messages("migrations")) == 1
+        assert len(database.search_messages("short")) == 1
+        assert database.conn.execute("SELECT count(*) FROM sqlite_master WHERE name = 'messages_text'").fetchone()[0] == 0
+    finally:
+        database.close()
+
+
+def test_get_messages_limit_returns_newest_in_order(database):
+    session_id = database.create_session("test")
+    for i in range(10):
+        database.save_message(session_id, "user", f"message {i}")
+    
+    assert [m["content"] for m in database.get_messages(session_id, limit=3)] == ["message 7", "message 8", "message 9"]
+    assert [m["content"] for m in database.get_messages(session_id)] == [f"message {i}" for i in range(10)]
+
+
+def test_messages_with_equal_timestamps_keep_insertion_order(database):
+    session_id = database.create_session("test")
+    ids = [database.save_message(session_id, "user", f"message {i}") for i in range(5)]
+    database.writer.submit(lambda conn: conn.execute("UPDATE messages SET timestamp = '2024-01-01 00:00:00'")).result()
+    
+    assert [m["id"] for m in database.get_messages(session_id)] == ids
+    assert [m["id"] for m in database.get_messages(session_id, limit=2)] == ids[-2:]
+
+
+def test_iter_messages_visits_every_row_once(database):
+    session_id = database.create_session("test")
+    other = database.create_session("other")
+    ids = []
+    for i in range(23):
+        ids.append(database.save_message(session_id, "user", f"message {i}"))
+        database.save_message(other, "user", f"other {i}")
+    
+    for page_size in (1, 5, 23, 100):
+        assert [m["id"] for m in database.iter_messages(session_id, page_size=page_size)] == ids[::-1]
+    assert [m["id"] for m in database.iter_messages(session_id, before_id=ids[10], page_size=4)] == ids[9::-1]
@@ -0,0 +1,141 @@
+"""
+Tests for the function-calling loop in GeminiClient
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from alang.gemini_client import TOOL_LIMIT_MESSAGE, GeminiClient
+from alang.tools import ToolRegistry
+
+
+def call_response(*calls):
+    parts = [types.Part(function_call=types.FunctionCall(name=name, args=args, id=f"call-{i}"))
+             for i, (name, args) in enumerate(calls)]
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=parts))])
+
+
+def text_response(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+
+class StubModels:
+    """Answers each request with the next scripted response, recording what was sent"""
+    
+    def __init__(self, script):
+        self.script = script
+        self.requests = []
+    
+    def _next(self, contents, config):
+        self.requests.append((list(contents), config))
+        return self.script(config)
+    
+    def generate_content(self, model, contents, config):
+        return self._next(contents, config)
+    
+    def generate_content_stream(self, model, contents, config):
+        return iter([self._next(contents, config)])
+
+
+class StubAsyncModels:
+    def __init__(self, models):
+        self.models = models
+    
+    async def generate_content(self, **kwargs):
+        return self.models.generate_content(**kwargs)
+    
+    async def generate_content_stream(self, **kwargs):
+        async def chunks():
+            for chunk in self.models.generate_content_stream(**kwargs):
+                yield chunk
+        return chunks()
+
+
+def make_client(script, tmp_path, max_tool_rounds=8):
+    client = GeminiClient("test-key", tool_registry=ToolRegistry(data_directory=tmp_path),
+                          max_tool_rounds=max_tool_rounds)
+    models = StubModels(script)
+    client.client = SimpleNamespace(models=models, aio=SimpleNamespace(models=StubAsyncModels(models)))
+    return client, models
+
+
+def scripted(*responses):
+    remaining = list(responses)
+    return lambda config: remaining.pop(0)
+
+
+def calls_forever(config):
+    if config.get("tool_config"):
+        return text_response("summary of what I found")
+    return call_response(("listfiles", {"directory": "."}))
+
+
+def test_tool_calls_run_and_results_go_back_in_one_turn(tmp_path):
+    (tmp_path / "notes.txt").write_text("hello")
+    target = tmp_path / "written.txt"
+    client, models = make_client(scripted(
+        call_response(("listfiles", {"directory": str(tmp_path)}),
+                      ("writefile", {"filename": str(target), "content": "no"})),
+        text_response("done")
+    ), tmp_path)
+    recorded = []
+    client.on_tool_execution = lambda name, args, result: recorded.append((name, result["success"]))
+    
+    assert client.generate_response("look around") == "done"
+    
+    # Read-only mode declares and runs only tools without side effects
+    assert recorded == [("listfiles", True), ("writefile", False)]
+    assert not target.exists()
+    
+    contents, _ = models.requests[1]
+    responses = [part["function_response"] for part in contents[-1]["parts"]]
+    assert [response["id"] for response in responses] == ["call-0", "call-1"]
+    assert "notes.txt" in responses[0]["response"]["result"]
+    assert responses[1]["response"] == {"success": False, "error": "Tool 'writefile' is not available"}
+    assert client.history.messages[-1]["content"] == "done"
+
+
+def test_unknown_tool_is_reported_to_the_model(tmp_path):
+    client, models = make_client(scripted(call_response(("rm_rf", {})), text_response("ok")), tmp_path)
+    assert client.generate_response("go") == "ok"
+    response = models.requests[1][0][-1]["parts"][0]["function_response"]["response"]
+    assert response == {"success": False, "error": "Tool 'rm_rf' is not available"}
+
+
+def test_last_round_forbids_tool_calls(tmp_path):
+    client, models = make_client(calls_forever, tmp_path, max_tool_rounds=2)
+    
+    assert client.generate_response("keep looking") == "summary of what I found"
+    assert [config.get("tool_config") for _, config in models.requests] == [
+        None, None, {"function_calling_config": {"mode": "NONE"}}
+    ]
+
+
+def test_calls_past_the_limit_get_an_explicit_answer(tmp_path):
+    client, models = make_client(lambda config: call_response(("listfiles", {})), tmp_path, max_tool_rounds=1)
+    expected = TOOL_LIMIT_MESSAGE.format(rounds=1)
+    
+    assert client.generate_response("one") == expected
+    assert list(client.stream_response("two")) == [expected]
+    assert asyncio.run(client.agenerate_response("three")) == expected
+    assert len(models.requests) == 6
+
+
+@pytest.mark.parametrize("limit_reached", [False, True])
+def test_async_stream_runs_tools_between_rounds(tmp_path, limit_reached):
+    script = (lambda config: call_response(("listfiles", {}))) if limit_reached else scripted(
+        call_response(("listfiles", {})), text_response("streamed")
+    )
+    client, models = make_client(script, tmp_path, max_tool_rounds=1)
+    
+    async def collect():
+        return [chunk async for chunk in client.astream_response("hi")]
+    
+    chunks = asyncio.run(collect())
+    assert chunks == ([TOOL_LIMIT_MESSAGE.format(rounds=1)] if limit_reached else ["streamed"])
+    assert len(models.requests) == 2
@@ -0,0 +1,82 @@
+"""
+Tests for token-budgeted conversation history
+"""
+
+from alang.gemini_client import ConversationHistory, GeminiClient
+
+
+def turn(i, size=40):
+    return f"question {i} ".ljust(size, "q"), f"answer {i} ".ljust(size, "a")
+
+
+def roles(history):
+    return [msg["role"] for msg in history.messages]
+
+
+def test_history_within_budget_is_kept():
+    history = ConversationHistory(max_tokens=1000)
+    for i in range(3):
+        history.add_turn(*turn(i))
+    assert len(history.messages) == 6
+    assert history.token_count() == sum(ConversationHistory.estimate_tokens(msg["content"]) for msg in history.messages)
+
+
+def test_trimming_keeps_opening_and_latest_exchanges():
+    history = ConversationHistory(max_tokens=60)
+    for i in range(10):
+        history.add_turn(*turn(i))
+    
+    contents = [msg["content"] for msg in history.messages]
+    assert contents[:2] == list(turn(0))
+    assert contents[-2:] == list(turn(9))
+    assert history.token_count() <= 60
+
+
+def test_trimming_removes_whole_exchanges():
+    history = ConversationHistory(max_tokens=100)
+    for i in range(20):
+        history.add_turn(*turn(i))
+        assert roles(history) == ["user", "assistant"] * (len(history.messages) // 2)
+        assert history.token_count() <= 100
+    
+    kept = [int(msg["content"].split()[1]) for msg in history.messages[::2]]
+    assert kept[0] == 0
+    assert kept[1:] == list(range(kept[1], 20))
+
+
+def test_latest_exchange_is_kept_even_over_budget():
+    history = ConversationHistory(max_tokens=10)
+    history.add_turn(*turn(0))
+    history.add_turn(*turn(1, size=400))
+    assert [msg["content"] for msg in history.messages] == [*turn(0), *turn(1, size=400)]
+
+
+def test_load_drops_orphaned_model_turn_first():
+    history = ConversationHistory(max_tokens=40)
+    stored = [{"role": "assistant", "content": "a" * 40}, {"role": "system", "content": "ignored"}]
+    for i in range(4):
+        user, model = turn(i)
+        stored += [{"role": "user", "content": user}, {"role": "assistant", "content": model}]
+    history.load(stored)
+    
+    assert roles(history)[0] == "user"
+    assert "system" not in roles(history)
+    assert history.token_count() <= 40
+
+
+def test_pinned_context_survives_trimming(tmp_path, monkeypatch):
+    # Keep the pinned context inline instead of creating a server-side cache
+    monkeypatch.setattr(GeminiClient, "_refresh_context_cache", lambda self: None)
+    pinned = tmp_path / "notes.md"
+    pinned.write_text("pinned notes")
+    client = GeminiClient("test-key", max_history_tokens=60)
+    client.pin_file(str(pinned))
+    for i in range(10):
+        client.history.add_turn(*turn(i))
+    
+    contents = client._build_contents("next")
+    texts = [part["text"] for content in contents for part in content["parts"]]
+    assert any("pinned notes" in text for text in texts)
+    assert texts[-1] == "next"
+    assert len(client.history.messages) < 20
+    assert client.history.token_count() <= 60
@@ -0,0 +1,130 @@
+"""
+Tests for the sparse line-offset index and ranged file reads
+"""
+
+import mmap
+
+import pytest
+
+from alang import line_index
+from alang.line_index import LineIndex, get_line_index, skip_lines
+from alang.tools import ReadFileTool
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Use tiny chunks so checkpoints fall before, on and after newlines"""
+    monkeypatch.setattr(line_index, "CHUNK_SIZE", 8)
+    line_index._cache.clear()
+    yield
+    line_index._cache.clear()
+
+
+def mapped(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def expected_starts(data: bytes):
+    starts = [0]
+    for i, byte in enumerate(data):
+        if byte == ord("\n"):
+            starts.append(i + 1)
+    return starts
+
+
+# Line lengths chosen so newlines land exactly on, just before and just after
+# 8-byte checkpoints, including an empty line spanning one
+CONTENTS = [
+    b"1234567\n" b"abc\n" b"defghij\n" b"\n" b"k\n" b"lmnopqrstuvwxyz0123\n" b"end\n",
+    b"no trailing newline\nlast",
+    b"\n\n\n\n\n\n\n\n\n",
+    b"x" * 40,
+]
+
+
+@pytest.mark.parametrize("content", CONTENTS)
+def test_line_start_matches_a_full_scan(tmp_path, content):
+    path = tmp_path / "file.txt"
+    path.write_bytes(content)
+    data = mapped(path)
+    try:
+        index = LineIndex(data)
+        starts = expected_starts(content)
+        if content.endswith(b"\n"):
+            starts.pop()
+        
+        assert index.total_lines == len(starts)
+        for line, start in enumerate(starts):
+            assert index.line_start(data, line) == start, line
+        assert index.line_start(data, len(starts) + 5) == len(content)
+    finally:
+        data.close()
+
+
+def test_skip_lines_stops_at_end_of_data(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"a\nb\nc")
+    data = mapped(path)
+    try:
+        assert skip_lines(data, 0, 1) == 2
+        assert skip_lines(data, 0, 2) == 4
+        assert skip_lines(data, 0, 10) == 5
+    finally:
+        data.close()
+
+
+def test_cached_index_is_rebuilt_when_file_changes(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"one\ntwo\n")
+    data = mapped(path)
+    first = get_line_index(str(path), data, path.stat())
+    assert get_line_index(str(path), data, path.stat()) is first
+    data.close()
+    
+    path.write_bytes(b"one\ntwo\nthree\nfour\n")
+    data = mapped(path)
+    try:
+        second = get_line_index(str(path), data, path.stat())
+        assert second is not first
+        assert second.total_lines == 4
+    finally:
+        data.close()
+
+
+@pytest.fixture
+def numbered_file(tmp_path):
+    path = tmp_path / "numbered.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 101)))
+    return path
+
+
+@pytest.mark.parametrize("offset, limit", [(1, 3), (9, 2), (50, 10), (98, 10), (100, 1)])
+def test_read_file_line_windows(numbered_file, offset, limit):
+    result = ReadFileTool().execute(str(numbered_file), offset=offset, limit=limit)
+    last = min(100, offset + limit - 1)
+    assert result["result"] == "".join(f"line {i}\n" for i in range(offset, last + 1))
+    assert (result["start_line"], result["end_line"], result["total_lines"]) == (offset, last, 100)
+    assert result["truncated"] is (last < 100)
+
+
+def test_read_file_window_past_end_is_empty(numbered_file):
+    result = ReadFileTool().execute(str(numbered_file), offset=150, limit=5)
+    assert result["result"] == ""
+    assert not result["truncated"]
+
+
+def test_read_file_byte_windows(numbered_file):
+    content = numbered_file.read_bytes()
+    for start, end in [(0, 8), (7, 9), (8, 16), (500, 10_000)]:
+        result = ReadFileTool().execute(str(numbered_file), start_byte=start, end_byte=end)
+        assert result["result"] == content[start:end].decode("utf-8")
+        assert result["start_byte"] == start
+        assert result["end_byte"] == min(end, len(content))
+
+
+def test_read_file_byte_window_splitting_a_character(tmp_path):
+    path = tmp_path / "utf8.txt"
+    path.write_text("aé b", encoding="utf-8")
+    result = ReadFileTool().execute(str(path), start_byte=0, end_byte=2)
+    assert result["result"] == "a�"
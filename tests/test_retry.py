@@ -0,0 +1,135 @@
+"""
+Tests for retry backoff and rate limiting
+"""
+
+import asyncio
+
+import pytest
+
+from alang import retry
+from alang.retry import RateLimiter, RetryPolicy
+
+
+class APIError(Exception):
+    """Stand-in for an SDK error carrying an HTTP status code"""
+    
+    def __init__(self, code, headers=None, details=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.details = details
+        if headers is not None:
+            self.response = type("Response", (), {"headers": headers})()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record delays instead of sleeping"""
+    recorded = []
+    monkeypatch.setattr(retry.time, "sleep", recorded.append)
+    
+    async def fake_sleep(delay):
+        recorded.append(delay)
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    return recorded
+
+
+def flaky(errors, result="ok"):
+    """Build a function that raises the given errors in turn, then returns result"""
+    calls = []
+    
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    func.calls = calls
+    return func
+
+
+@pytest.mark.parametrize("error", [
+    APIError(429), APIError(500), APIError(503), APIError(408),
+    ConnectionError("reset"), TimeoutError("slow")
+])
+def test_transient_errors_are_retryable(error):
+    assert RetryPolicy().is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [APIError(400), APIError(401), APIError(404), ValueError("bad"), KeyError("x")])
+def test_permanent_errors_are_not_retryable(error):
+    assert not RetryPolicy().is_retryable(error)
+
+
+def test_backoff_window_grows_exponentially_and_is_capped(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    assert [policy.get_delay(attempt, APIError(503)) for attempt in range(6)] == [1, 2, 4, 8, 10, 10]
+
+
+def test_backoff_is_jittered_within_window():
+    policy = RetryPolicy(base_delay=2.0, max_delay=60.0)
+    delays = [policy.get_delay(3, APIError(503)) for _ in range(200)]
+    assert all(0 <= delay <= 16 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_after_header_overrides_backoff():
+    policy = RetryPolicy(max_delay=30.0)
+    assert policy.get_delay(0, APIError(429, headers={"retry-after": "7"})) == 7
+    assert policy.get_delay(0, APIError(429, headers={"retry-after": "120"})) == 30
+
+
+def test_retry_info_detail_overrides_backoff():
+    details = {"error": {"details": [{"@type": "RetryInfo", "retryDelay": "17s"}]}}
+    assert RetryPolicy().get_delay(0, APIError(429, details=details)) == 17
+
+
+def test_call_retries_transient_errors_until_success(sleeps):
+    func = flaky([APIError(503), ConnectionError("reset")])
+    assert RetryPolicy(max_retries=3).call(func) == "ok"
+    assert len(func.calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_call_gives_up_after_max_retries(sleeps):
+    func = flaky([APIError(503)] * 5)
+    with pytest.raises(APIError):
+        RetryPolicy(max_retries=2).call(func)
+    assert len(func.calls) == 3
+
+
+def test_call_does_not_retry_permanent_errors(sleeps):
+    func = flaky([APIError(400)])
+    with pytest.raises(APIError):
+        RetryPolicy().call(func)
+    assert len(func.calls) == 1
+    assert sleeps == []
+
+
+def test_acall_retries_transient_errors(sleeps):
+    errors = [APIError(429), APIError(502)]
+    calls = []
+    
+    async def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    
+    assert asyncio.run(RetryPolicy().acall(func)) == "ok"
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_rate_limiter_allows_burst_then_spaces_requests(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retry.time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(requests_per_minute=60, burst=2)
+    
+    assert limiter._reserve() == 0
+    assert limiter._reserve() == 0
+    assert limiter._reserve() == pytest.approx(1.0)
+    # Each waiter reserves its own slot behind the previous one
+    assert limiter._reserve() == pytest.approx(2.0)
+    
+    now[0] += 10
+    assert limiter._reserve() == 0
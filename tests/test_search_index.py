@@ -0,0 +1,71 @@
+"""
+Tests for the trigram search index
+"""
+
+import pytest
+
+from alang.search_index import SearchIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    search_index = SearchIndex(tmp_path / "index" / "search_index.db")
+    yield search_index
+    search_index.close()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    root.mkdir()
+    (root / "a.py").write_text("alpha = 1\n")
+    (root / "b.py").write_text("beta = 2\n")
+    return root
+
+
+def test_candidates_narrow_to_files_with_the_literal(index, tree):
+    index.update(str(tree))
+    assert index.candidates(str(tree), ["alpha"]) == [str(tree / "a.py")]
+
+
+def test_changes_within_the_interval_are_still_found(index, tree):
+    assert index.update(str(tree))["indexed"] == 2
+    
+    # An editor save and a new file, moments after the tree was indexed
+    (tree / "b.py").write_text("beta = alpha\n")
+    (tree / "c.py").write_text("alpha = 3\n")
+    stats = index.update(str(tree))
+    assert stats["scanned"] == 3
+    assert stats["indexed"] == 0
+    assert stats["deferred"] == 2
+    assert index.candidates(str(tree), ["alpha"]) == [str(tree / "a.py"), str(tree / "b.py"), str(tree / "c.py")]
+    
+    # Unread files are noted once, not again on every query
+    assert index.update(str(tree))["deferred"] == 0
+
+
+def test_deleted_files_drop_out_within_the_interval(index, tree):
+    index.update(str(tree))
+    (tree / "a.py").unlink()
+    assert index.update(str(tree))["removed"] == 1
+    assert index.candidates(str(tree), ["alpha"]) == []
+
+
+def test_unread_files_are_indexed_after_the_interval(index, tree):
+    index.update(str(tree))
+    (tree / "c.py").write_text("gamma = 3\n")
+    index.update(str(tree))
+    
+    stats = index.update(str(tree), max_age=0)
+    assert stats["indexed"] == 1
+    assert index.candidates(str(tree), ["alpha"]) == [str(tree / "a.py")]
+
+
+def test_invalidate_reads_changes_at_once(index, tree):
+    index.update(str(tree))
+    (tree / "c.py").write_text("alpha = 3\n")
+    index.invalidate()
+    stats = index.update(str(tree))
+    assert stats["indexed"] == 1
+    assert stats["deferred"] == 0
+    assert index.candidates(str(tree), ["alpha"]) == [str(tree / "a.py"), str(tree / "c.py")]
@@ -0,0 +1,91 @@
+"""
+Tests for tool output budgets and spilled output fetching
+"""
+
+from alang.spillover import SpilloverStore, split_lines, truncate_output
+from alang.tools import FetchOutputTool, ListFilesTool
+
+
+def test_split_lines_keeps_line_breaks():
+    assert split_lines("a\nb\n") == ["a\n", "b\n"]
+    assert split_lines("a\nb") == ["a\n", "b"]
+    assert split_lines("") == []
+
+
+def test_split_lines_ignores_escaped_newlines():
+    text = 'print("one\\ntwo")\nsecond\n'
+    assert split_lines(text) == ['print("one\\ntwo")\n', "second\n"]
+
+
+def test_split_lines_only_breaks_on_newline_characters():
+    assert split_lines("a\rb\x0cc\n") == ["a\rb\x0cc\n"]
+
+
+def test_truncate_output_keeps_short_text():
+    assert truncate_output("short\n", 100) == ("short\n", 0, 0)
+
+
+def test_truncate_output_keeps_whole_lines():
+    text = "".join(f"line {i:03d}\n" for i in range(100))
+    cut, elided, characters = truncate_output(text, 200, ref="out-0123456789abcdef")
+    
+    kept = cut.splitlines(keepends=True)
+    marker_at = next(i for i, line in enumerate(kept) if line.startswith("[..."))
+    head, tail = kept[:marker_at], kept[marker_at + 1:]
+    
+    assert head == [f"line {i:03d}\n" for i in range(len(head))]
+    assert tail == [f"line {i:03d}\n" for i in range(100 - len(tail), 100)]
+    assert len(head) + elided + len(tail) == 100
+    assert characters == elided * len("line 000\n")
+    assert f"{elided} lines elided" in kept[marker_at]
+    assert f"offset={len(head) + 1}" in kept[marker_at]
+
+
+def test_truncate_output_does_not_split_escaped_newlines():
+    line = 'x = "' + "\\n" * 40 + '"\n'
+    text = line * 20
+    cut, elided, _ = truncate_output(text, 400)
+    assert elided > 0
+    for kept in cut.splitlines(keepends=True):
+        assert kept == line or kept.startswith("[...")
+
+
+def test_truncate_output_inside_a_single_line():
+    text = "x" * 1000
+    cut, elided, characters = truncate_output(text, 100)
+    assert elided == 0
+    assert characters == 900
+    assert "900 characters elided" in cut
+
+
+def test_truncate_output_counts_whole_lines_between_cuts():
+    text = "a" * 500 + "\n" + "b" * 500 + "\n" + "c" * 500 + "\n"
+    _, elided, characters = truncate_output(text, 100)
+    assert elided == 1
+    assert characters == len(text) - 100
+
+
+def test_fetch_output_returns_elided_lines(tmp_path):
+    store = SpilloverStore(directory=str(tmp_path))
+    text = "".join(f"row {i}\\n escaped\n" for i in range(10))
+    ref = store.put(text)
+    
+    result = FetchOutputTool(store).execute(ref=ref, offset=3, limit=2)
+    assert result["success"]
+    assert result["result"] == "row 2\\n escaped\nrow 3\\n escaped\n"
+    assert result["total_lines"] == 10
+
+
+def test_fetch_output_unknown_ref(tmp_path):
+    result = FetchOutputTool(SpilloverStore(directory=str(tmp_path))).execute(ref="out-0000000000000000")
+    assert not result["success"]
+
+
+def test_list_files_joins_with_newlines(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    
+    result = ListFilesTool().execute(directory=str(tmp_path))
+    assert result["success"]
+    assert "\\n" not in result["result"]
+    assert result["result"].split("\n")[1:] == ["  a.txt (1 bytes)", "  b.txt (1 bytes)"]
@@ -0,0 +1,96 @@
+"""
+Tests for memoized read-only tool results
+"""
+
+import os
+
+import pytest
+
+from alang.tools import ToolRegistry
+
+# Files must look settled, or results computed from them are not cached
+PAST = 1_000_000_000
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ToolRegistry(data_directory=tmp_path / "data")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    root.mkdir()
+    (root / "notes.txt").write_text("first version\n")
+    settle(root / "notes.txt", root)
+    return root
+
+
+def settle(*paths):
+    for path in paths:
+        os.utime(path, (PAST, PAST))
+
+
+def read(registry, path):
+    return registry.execute_tool("readfile", filename=str(path))
+
+
+def test_repeated_read_is_served_from_cache(registry, tree):
+    first = read(registry, tree / "notes.txt")
+    assert read(registry, tree / "notes.txt") == first
+    assert registry.result_cache.get_stats()["hits"] == 1
+
+
+def test_read_is_invalidated_by_mtime_change(registry, tree):
+    read(registry, tree / "notes.txt")
+    assert registry.result_cache.get_stats()["entries"] == 1
+    os.utime(tree / "notes.txt", (PAST + 5, PAST + 5))
+    
+    read(registry, tree / "notes.txt")
+    assert registry.result_cache.get_stats()["hits"] == 0
+
+
+def test_read_is_invalidated_by_size_change_with_same_mtime(registry, tree):
+    read(registry, tree / "notes.txt")
+    assert registry.result_cache.get_stats()["entries"] == 1
+    (tree / "notes.txt").write_text("second, longer version\n")
+    settle(tree / "notes.txt")
+    
+    result = read(registry, tree / "notes.txt")
+    assert "second, longer version" in result["result"]
+    assert registry.result_cache.get_stats()["hits"] == 0
+
+
+def test_listing_is_invalidated_by_new_file(registry, tree):
+    first = registry.execute_tool("listfiles", directory=str(tree))
+    assert "new.txt" not in first["result"]
+    assert registry.result_cache.get_stats()["entries"] == 1
+    
+    (tree / "new.txt").write_text("new\n")
+    listing = registry.execute_tool("listfiles", directory=str(tree))
+    assert "new.txt" in listing["result"]
+    assert registry.result_cache.get_stats()["hits"] == 0
+
+
+def test_listing_is_invalidated_by_size_change_of_an_entry(registry, tree):
+    registry.execute_tool("listfiles", directory=str(tree))
+    assert registry.result_cache.get_stats()["entries"] == 1
+    (tree / "notes.txt").write_text("grown to a different size\n")
+    settle(tree / "notes.txt", tree)
+    
+    listing = registry.execute_tool("listfiles", directory=str(tree))
+    assert f"notes.txt ({len('grown to a different size') + 1} bytes)" in listing["result"]
+    assert registry.result_cache.get_stats()["hits"] == 0
+
+
+def test_recently_modified_files_are_not_cached(registry, tree):
+    (tree / "fresh.txt").write_text("just written\n")
+    read(registry, tree / "fresh.txt")
+    read(registry, tree / "fresh.txt")
+    assert registry.result_cache.get_stats()["hits"] == 0
+
+
+def test_side_effect_tools_clear_the_cache(registry, tree):
+    read(registry, tree / "notes.txt")
+    registry.execute_tool("writefile", filename=str(tree / "other.txt"), content="x")
+    assert registry.result_cache.get_stats()["entries"] == 0
@@ -0,0 +1,46 @@
+"""
+Tests for the file tools
+"""
+
+import pytest
+
+from alang.tools import SearchFilesTool
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in range(20):
+        (tmp_path / f"dir{d}").mkdir()
+        (tmp_path / f"dir{d}" / "module.py").write_text("x = 1\n")
+    return tmp_path
+
+
+def test_search_files_finds_matches(tree):
+    result = SearchFilesTool().execute("**/*.py", str(tree))
+    assert len(result["matches"]) == 20
+    assert not result["truncated"]
+
+
+def test_search_files_stops_at_time_budget_without_matches(tree):
+    result = SearchFilesTool().execute("**/*.nomatch", str(tree), time_budget=1e-9)
+    assert result["success"]
+    assert result["truncated"]
+    assert "time budget" in result["result"]
+
+
+def test_search_files_stops_at_max_results(tree):
+    result = SearchFilesTool().execute("**/*.py", str(tree), max_results=5)
+    assert len(result["matches"]) == 5
+    assert result["truncated"]
+
+
+def test_search_files_matches_directories(tree):
+    (tree / "dir3" / "tests").mkdir()
+    (tree / "node_modules" / "tests").mkdir(parents=True)
+    
+    result = SearchFilesTool().execute("dir1*", str(tree))
+    assert sorted(result["matches"]) == sorted(str(tree / name) for name in ["dir1"] + [f"dir1{d}" for d in range(10)])
+    assert f"📁 {tree / 'dir1'}/" in result["result"]
+    
+    # Ignored directories are neither walked nor matched
+    assert SearchFilesTool().execute("**/tests", str(tree))["matches"] == [str(tree / "dir3" / "tests")]
@@ -0,0 +1,129 @@
+"""
+Tests for ignore-aware directory walking
+"""
+
+import os
+import re
+
+import pytest
+
+from alang.walker import IgnoreFile, IgnoreRules, looks_binary, translate_glob, walk_files
+
+
+def ignore(lines, base="/repo"):
+    return IgnoreFile(base, lines)
+
+
+@pytest.mark.parametrize("pattern, path, matches", [
+    ("*.py", "a.py", True),
+    ("*.py", "dir/a.py", False),
+    ("a?c", "abc", True),
+    ("a?c", "a/c", False),
+    ("**/build", "build", True),
+    ("**/build", "x/y/build", True),
+    ("docs/**", "docs/a/b.md", True),
+    ("a/**/b", "a/b", True),
+    ("a/**/b", "a/x/y/b", True),
+    ("[abc].txt", "b.txt", True),
+    ("[!abc].txt", "b.txt", False),
+    ("[!abc].txt", "d.txt", True),
+    ("\\*.txt", "*.txt", True),
+    ("\\*.txt", "a.txt", False),
+])
+def test_translate_glob(pattern, path, matches):
+    assert bool(re.match(translate_glob(pattern) + r"\Z", path)) is matches
+
+
+def test_unanchored_pattern_matches_name_at_any_depth():
+    rules = ignore(["*.log"])
+    assert rules.match("debug.log", False) is True
+    assert rules.match("deep/dir/debug.log", False) is True
+    assert rules.match("debug.log.txt", False) is None
+
+
+def test_slash_anchors_pattern_to_ignore_file_directory():
+    leading = ignore(["/build"])
+    assert leading.match("build", True) is True
+    assert leading.match("src/build", True) is None
+    
+    middle = ignore(["docs/out"])
+    assert middle.match("docs/out", True) is True
+    assert middle.match("src/docs/out", True) is None
+
+
+def test_trailing_slash_matches_directories_only():
+    rules = ignore(["cache/"])
+    assert rules.match("cache", True) is True
+    assert rules.match("cache", False) is None
+
+
+def test_negation_reincludes_and_last_match_wins():
+    rules = ignore(["*.log", "!keep.log"])
+    assert rules.match("debug.log", False) is True
+    assert rules.match("keep.log", False) is False
+    
+    reignored = ignore(["*.log", "!keep.log", "keep.log"])
+    assert reignored.match("keep.log", False) is True
+
+
+def test_comments_blanks_and_escapes():
+    rules = ignore(["# comment", "", "   ", "\\#notes", "\\!important"])
+    assert rules.match("# comment", False) is None
+    assert rules.match("#notes", False) is True
+    assert rules.match("!important", False) is True
+
+
+def test_nested_ignore_file_overrides_parent(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("*.tmp\n")
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / ".gitignore").write_text("!keep.tmp\n")
+    
+    rules = IgnoreRules.for_directory(str(sub))
+    assert rules.is_ignored(str(sub / "drop.tmp"), False)
+    assert not rules.is_ignored(str(sub / "keep.tmp"), False)
+
+
+def test_ignore_files_above_repository_root_do_not_apply(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.py\n")
+    repo = tmp_path / "repo"
+    (repo / ".git").mkdir(parents=True)
+    
+    assert not IgnoreRules.for_directory(str(repo)).is_ignored(str(repo / "a.py"), False)
+
+
+def test_walk_honors_ignores_hidden_and_default_excludes(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("generated/\n*.log\n!important.log\n")
+    for rel in ["src/a.py", "src/debug.log", "src/important.log", "generated/out.py",
+                "node_modules/pkg/index.js", ".hidden/x.py", "src/blob.bin"]:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"\0\1" if rel.endswith(".bin") else b"text\n")
+    
+    found = {os.path.relpath(path, tmp_path) for path, _ in walk_files(str(tmp_path), skip_binary=True)}
+    assert found == {os.path.join("src", "a.py"), os.path.join("src", "important.log")}
+    
+    everything = {os.path.relpath(path, tmp_path) for path, _ in walk_files(str(tmp_path), respect_ignore=False)}
+    assert os.path.join("generated", "out.py") in everything
+    assert os.path.join("node_modules", "pkg", "index.js") in everything
+
+
+def test_looks_binary():
+    assert looks_binary(b"PK\x03\x04\x00")
+    assert not looks_binary("plain text ✓".encode("utf-8"))
+
+
+def test_walk_yields_directories_on_request(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "c.txt").write_text("c")
+    (tmp_path / "build").mkdir()
+    
+    def walk(**kwargs):
+        return {os.path.relpath(path, tmp_path) for path, _ in walk_files(str(tmp_path), **kwargs)}
+    
+    assert walk() == {os.path.join("a", "b", "c.txt")}
+    assert walk(include_directories=True) == {"a", os.path.join("a", "b"), os.path.join("a", "b", "c.txt")}
+    # Directories one level below max_depth are found though not listed
+    assert walk(include_directories=True, max_depth=0) == {"a"}
@@ -0,0 +1,150 @@
+"""
+Tests for incremental markdown block splitting and the chat window
+"""
+
+import asyncio
+
+import pytest
+from rich.console import Console
+from rich.text import Text
+from textual.app import App
+
+from alang import widgets
+from alang.widgets import (ChatContainer, MarkdownBlock, MessageDisplay, link_definitions, split_markdown_blocks,
+                           with_link_definitions)
+
+
+def split_streamed(text, chunk_size=1):
+    """Split text the way a streamed reply is split, chunk by chunk"""
+    blocks = []
+    tail = ""
+    for start in range(0, len(text), chunk_size):
+        tail += text[start:start + chunk_size]
+        finished, tail, _ = split_markdown_blocks(tail)
+        blocks.extend(finished)
+    return blocks, tail
+
+
+def render(text):
+    console = Console(width=60, color_system=None)
+    with console.capture() as capture:
+        console.print(MarkdownBlock(text, cache=False))
+    return capture.get()
+
+
+def test_paragraphs_split_on_blank_lines():
+    assert split_markdown_blocks("One\n\nTwo\n\nThree") == (["One", "Two"], "Three", False)
+
+
+def test_indented_continuation_keeps_list_item_open():
+    blocks, tail, _ = split_markdown_blocks("- item\n\n  more of the item\n\nnext\n")
+    assert blocks == ["- item\n\n  more of the item"]
+    assert tail == "next\n"
+
+
+CODE_WITH_BLANK_LINES = "Intro\n\n```python\ndef f():\n\n    return 1\n\nx = f()\n```\n\nAfter\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(CODE_WITH_BLANK_LINES)])
+def test_fenced_code_with_blank_lines_stays_one_block(chunk_size):
+    blocks, tail = split_streamed(CODE_WITH_BLANK_LINES, chunk_size)
+    assert blocks == ["Intro", "```python\ndef f():\n\n    return 1\n\nx = f()\n```"]
+    assert tail == "After\n"
+
+
+def test_longer_fence_is_not_closed_by_shorter_run():
+    text = "````\n```\n\nstill code\n````\n\nend\n"
+    assert split_markdown_blocks(text) == (["````\n```\n\nstill code\n````"], "end\n", False)
+
+
+def test_tilde_fence_is_not_closed_by_backticks():
+    text = "~~~\n```\n\nstill code\n~~~\n\nend"
+    assert split_markdown_blocks(text) == (["~~~\n```\n\nstill code\n~~~"], "end", False)
+
+
+def test_unclosed_fence_is_reported():
+    blocks, tail, fenced = split_markdown_blocks("Intro\n\n```\ncode\n\nmore")
+    assert blocks == ["Intro"]
+    assert tail == "```\ncode\n\nmore"
+    assert fenced
+
+
+def test_link_definitions_are_shared_with_blocks_that_use_them():
+    text = "See [the docs][d].\n\nMore\n\n[d]: https://example.com\n"
+    blocks, tail, _ = split_markdown_blocks(text)
+    definitions = link_definitions(text)
+    
+    assert definitions == "[d]: https://example.com"
+    assert with_link_definitions(blocks[0], definitions) == "See [the docs][d].\n\n[d]: https://example.com"
+    assert with_link_definitions(blocks[1], definitions) == "More"
+    assert with_link_definitions(tail, definitions) is None
+
+
+def test_reference_link_renders_in_a_separate_block():
+    text = "See [the docs][d].\n\n[d]: https://example.com\n"
+    blocks, _, _ = split_markdown_blocks(text)
+    
+    assert "[d]" in render(blocks[0])
+    rendered = render(with_link_definitions(blocks[0], link_definitions(text)))
+    assert "See the docs." in rendered
+    assert "[d]" not in rendered
+
+
+def test_text_without_definitions_is_unchanged():
+    assert with_link_definitions("[not a link]", "") == "[not a link]"
+
+
+class ChatApp(App):
+    def compose(self):
+        yield ChatContainer()
+
+
+@pytest.fixture
+def plain_displays(monkeypatch):
+    """Skip role styling, which the installed Textual rejects outside the app's theme"""
+    monkeypatch.setattr(MessageDisplay, "_update_display", lambda self: self.update(Text(self.raw_content)))
+    monkeypatch.setattr(ChatContainer, "WINDOW_SIZE", 6)
+    monkeypatch.setattr(ChatContainer, "PAGE_SIZE", 3)
+
+
+def test_streaming_reaches_the_message_after_paging(plain_displays):
+    async def run():
+        async with ChatApp().run_test(size=(40, 10)) as pilot:
+            chat = pilot.app.query_one(ChatContainer)
+            for i in range(12):
+                chat.add_message("user", f"message {i}")
+            reply = chat.add_message("assistant", "start")
+            await pilot.pause()
+            
+            # Page up until the streaming reply is unmounted
+            while chat._display_for(reply) is not None:
+                chat._page_up()
+                await pilot.pause()
+            chat.append_to_message(reply, "+A")
+            
+            while chat._display_for(reply) is None:
+                chat._page_down()
+                await pilot.pause()
+            chat.append_to_message(reply, "+B")
+            await pilot.pause()
+            
+            displays = [display for display in chat.query(MessageDisplay) if display.record is reply]
+            assert reply["content"] == "start+A+B"
+            assert [display.raw_content for display in displays] == ["start+A+B"]
+    
+    asyncio.run(run())
+
+
+def test_streamed_link_definitions_scan_only_the_tail(monkeypatch):
+    monkeypatch.setattr(MessageDisplay, "_update_display", lambda self: None)
+    text = "".join(f"Paragraph {i} cites [ref{i}].\n\n[ref{i}]: https://example.com/{i}\n\n" for i in range(40))
+    display = MessageDisplay("assistant", "")
+    
+    scanned = []
+    monkeypatch.setattr(widgets, "link_definitions", lambda text: scanned.append(len(text)) or link_definitions(text))
+    for char in text:
+        display.append_content(char)
+        display._render_markdown()
+    
+    assert max(scanned) < 100
+    assert display._link_definitions() == link_definitions(text)